@@ -0,0 +1,67 @@
+"""
+Бенчмарк logs.save_monthly_stats: три прохода по count синтетическим клиентам
+на файловой базе во временном каталоге.
+
+    python bench/bench_monthly_stats.py [--baseline REV] [count ...]
+
+С --baseline та же нагрузка выполняется и на src/logs.py из ревизии REV
+(например, c457674^ — до пакетной записи), а содержимое monthly_stats обеих
+версий сравнивается.
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from common import load_module
+from fixtures import monthly_logs
+
+import config  # pylint: disable=wrong-import-order
+
+PASSES = (0, 100, 250)  # прирост счётчиков на каждом проходе
+
+
+def run(count, revision=None):
+    """Время трёх проходов и итоговое содержимое monthly_stats."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "openvpn_logs.db")
+    config.Config.LOGS_DATABASE_PATH = db_path
+    logs = load_module("src/logs.py", f"logs_{revision or 'tree'}_{count}", revision)
+    logs.DB_PATH = db_path
+    logs.initialize_database()
+    batches = [monthly_logs(count, bump) for bump in PASSES]
+
+    started = time.perf_counter()
+    for batch in batches:
+        logs.save_monthly_stats(batch)
+    elapsed = time.perf_counter() - started
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            """
+            SELECT client_name, ip_address, month, total_bytes_received, total_bytes_sent,
+                   total_connections, last_connected
+            FROM monthly_stats ORDER BY 1, 2, 3
+            """
+        ).fetchall()
+    return elapsed, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", help="ревизия git для сравнения")
+    parser.add_argument("counts", nargs="*", type=int, default=[5000, 50000])
+    args = parser.parse_args()
+
+    for count in args.counts:
+        elapsed, rows = run(count)
+        line = f"{count:>6} клиентов x{len(PASSES)}: {elapsed:.2f} с"
+        if args.baseline:
+            baseline, baseline_rows = run(count, args.baseline)
+            same = "совпадает" if rows == baseline_rows else "РАСХОДИТСЯ"
+            line += f" | {args.baseline}: {baseline:.2f} с ({baseline / elapsed:.1f}x), monthly_stats {same}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Бенчмарк разбора статус-файла OpenVPN: StatusCache.get на новом поколении
+файла (ovpn_status.parse_status) и подготовка записей logs.py
+(parse_log_file) для count синтетических клиентов.
+
+    python bench/bench_status_parse.py [--version 2|3] [--baseline REV] [count ...]
+
+С --baseline тот же файл разбирается и src/ovpn_status.py из ревизии REV
+(например, 32f9d59^ — до разбора по столбцам), и для каждого размера
+печатаются оба времени. Импорты старого модуля берутся из рабочего дерева.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+
+from common import best_of, load_module
+from fixtures import status_file
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import logs
+from src.ovpn_status import StatusCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--version", type=int, choices=(2, 3), default=2)
+    parser.add_argument("--baseline", help="ревизия git для сравнения")
+    parser.add_argument("counts", nargs="*", type=int, default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        baseline = load_module("src/ovpn_status.py", "ovpn_status_baseline", args.baseline)
+
+    directory = tempfile.mkdtemp(prefix="bench-")
+    for count in args.counts:
+        path = status_file(os.path.join(directory, f"status_{count}.log"), count, args.version)
+        repeat = 9 if count < 100000 else 5
+
+        def parse(cache_class=StatusCache):
+            # Новый кэш: каждый запуск разбирает файл заново (parse_status)
+            return cache_class().get(path, "VPN-UDP")
+
+        status = parse()
+        assert len(status.clients) == count and status.error is None
+        parsed = best_of(parse, repeat)
+
+        def records():
+            # parse_log_file печатает строку на клиента — вывод отбрасывается
+            with contextlib.redirect_stdout(io.StringIO()):
+                logs.parse_log_file(status)
+
+        line = f"{count:>7} клиентов: разбор {parsed * 1000:8.1f} мс"
+        if baseline is not None:
+            old = parse(baseline.StatusCache)
+            assert len(old.clients) == count and old.error is None
+            old_parsed = best_of(lambda: parse(baseline.StatusCache), repeat)
+            line += f" | {args.baseline}: {old_parsed * 1000:8.1f} мс ({old_parsed / parsed:.1f}x)"
+        print(f"{line} | записи logs.py {best_of(records, repeat) * 1000:8.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Бенчмарк тика wg_stats.py: время записи одного установившегося тика (после
+первого, заполняющего базу) для count синтетических пиров на файловой базе.
+
+    python bench/bench_wg_stats.py [--baseline REV] [--ticks N] [count ...]
+
+Число fsync/fdatasync на тик выводится, если процесс запущен со счётчиком
+bench/fsync_count.so (см. fsync_count.c). С --baseline тот же тик выполняется
+и на src/wg_stats.py из ревизии REV (например, d9f0e5d^ — запись по пиру с
+фиксацией на каждом).
+"""
+
+import argparse
+import ctypes
+import os
+import shutil
+import tempfile
+import time
+
+from common import ROOT, load_module
+from fixtures import wg_snapshot
+
+import config  # pylint: disable=wrong-import-order
+
+BENCH_DIR = os.path.join(ROOT, "bench")
+
+
+def fsync_counter():
+    """fsync_count() из LD_PRELOAD-библиотеки или None."""
+    function = getattr(ctypes.CDLL(None), "fsync_count", None)
+    if function is not None:
+        function.restype = ctypes.c_long
+    return function
+
+
+def run(count, ticks, revision=None):
+    """Среднее время тика, секунды, и число fsync на тик (или None)."""
+    # База на диске рядом с репозиторием: /tmp часто tmpfs, где fsync ничего не стоит
+    directory = tempfile.mkdtemp(prefix="bench-", dir=BENCH_DIR)
+    try:
+        config.Config.WG_STATS_PATH = os.path.join(directory, "wireguard_stats.db")
+        wg_stats = load_module("src/wg_stats.py", f"wg_stats_{revision or 'tree'}_{count}", revision)
+        wg_stats.get_client_mapping = dict
+        tick = [0]
+        wg_stats.get_wireguard_stats = lambda: wg_snapshot(count, tick[0])
+
+        if hasattr(wg_stats, "save_stats"):
+            save = wg_stats.save_stats
+        else:
+            # До пакетной записи тик состоял из двух функций, а новые пиры
+            # добавлялись отдельно
+            wg_stats.sync_new_peers()
+
+            def save():
+                wg_stats.save_daily_stats()
+                wg_stats.save_wg_stats()
+
+        save()  # первый тик заполняет базу
+        tick[0] += 1
+        counter = fsync_counter()
+        synced = counter() if counter else 0
+        started = time.perf_counter()
+        for _ in range(ticks):
+            save()
+            tick[0] += 1
+        elapsed = (time.perf_counter() - started) / ticks
+        syncs = (counter() - synced) / ticks if counter else None
+        return elapsed, syncs
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def describe(elapsed, syncs):
+    text = f"{elapsed * 1000:8.1f} мс/тик"
+    return text if syncs is None else f"{text}, {syncs:.2f} fsync/тик"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", help="ревизия git для сравнения")
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("counts", nargs="*", type=int, default=[500, 5000])
+    args = parser.parse_args()
+
+    if fsync_counter() is None:
+        print("fsync не считаются: запустите с LD_PRELOAD=bench/fsync_count.so")
+    for count in args.counts:
+        line = f"{count:>6} пиров: {describe(*run(count, args.ticks))}"
+        if args.baseline:
+            # Старый код фиксирует каждый пир отдельно — хватает пары тиков
+            line += f" | {args.baseline}: {describe(*run(count, 2, args.baseline))}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Общие части бенчмарков: пути импорта, загрузка модуля из рабочего дерева
+или из ревизии git (для сравнения «до/после») и замер лучшего времени.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Скрипты src импортируют config напрямую, модули — как src.X
+sys.path[:0] = [os.path.join(ROOT, "src"), ROOT]
+
+# pylint: disable=wrong-import-position
+from src import db
+
+# Замер не должен прерываться печатью «медленных» запросов
+db.SLOW_QUERY_MS = float("inf")
+
+
+def load_module(relative_path, name, revision=None):
+    """
+    Загружает модуль из файла рабочего дерева или, если задана revision,
+    из этой ревизии git (`git show REV:путь`). Импорты модуля берутся из
+    рабочего дерева.
+    """
+    path = os.path.join(ROOT, relative_path)
+    if revision:
+        source = subprocess.run(
+            ["git", "-C", ROOT, "show", f"{revision}:{relative_path}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        directory = tempfile.mkdtemp(prefix="bench-")
+        path = os.path.join(directory, os.path.basename(relative_path))
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_of(function, repeat):
+    """Лучшее время из repeat запусков, секунды."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
@@ -0,0 +1,105 @@
+"""
+Синтетические данные для бенчмарков. Генераторы детерминированы (seed), чтобы
+прогоны разных ревизий получали одинаковый вход.
+"""
+
+import random
+
+from datetime import datetime
+
+
+def monthly_logs(count, bump=0, seed=1):
+    """
+    Записи parse_log_file для save_monthly_stats/save_connection_logs:
+    count клиентов текущего месяца; bump прибавляется к счётчикам, имитируя
+    следующий проход с ростом трафика.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    logs = []
+    for i in range(count):
+        # Каждый третий клиент переподключался: другое время начала сеанса
+        since = now.replace(day=1, hour=2 if i % 3 == 0 else 1, minute=0, second=0, microsecond=0)
+        logs.append(
+            {
+                "client_name": f"client{i}",
+                "local_ip": f"10.8.{i // 250 % 250}.{i % 250}",
+                "real_ip": f"198.51.{rng.randrange(256)}.{rng.randrange(256)}",
+                "bytes_received": 1000 * i + bump,
+                "bytes_sent": 500 * i + bump,
+                "connected_since": since.isoformat(),
+                "duration": "",
+                "protocol": "VPN-UDP",
+            }
+        )
+    return logs
+
+
+def status_file(path, count, version=2, seed=1):
+    """
+    Статус-файл OpenVPN status-version 2 (запятые) или 3 (табуляция) с count
+    клиентами и таблицей маршрутов.
+    """
+    rng = random.Random(seed)
+    separator = "," if version == 2 else "\t"
+    now = int(datetime(2026, 10, 17, 10, 0, 0).timestamp())
+    lines = [
+        ["TITLE", "OpenVPN 2.6.12 x86_64-pc-linux-gnu"],
+        ["TIME", datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"), str(now)],
+        [
+            "HEADER", "CLIENT_LIST", "Common Name", "Real Address", "Virtual Address",
+            "Virtual IPv6 Address", "Bytes Received", "Bytes Sent", "Connected Since",
+            "Connected Since (time_t)", "Username", "Client ID", "Peer ID", "Data Channel Cipher",
+        ],
+    ]
+    for i in range(count):
+        since = now - rng.randrange(3 * 86400)
+        lines.append(
+            [
+                "CLIENT_LIST", f"client{i}", f"198.51.{i % 250}.{i // 250 % 250}:{1024 + i % 50000}",
+                f"10.8.{i // 250 % 250}.{i % 250}", "", str(rng.randrange(10**10)),
+                str(rng.randrange(10**10)), datetime.fromtimestamp(since).strftime("%Y-%m-%d %H:%M:%S"),
+                str(since), "UNDEF", str(i), str(i), "AES-256-GCM",
+            ]
+        )
+    lines.append(
+        ["HEADER", "ROUTING_TABLE", "Virtual Address", "Common Name", "Real Address", "Last Ref", "Last Ref (time_t)"]
+    )
+    for i in range(count):
+        lines.append(
+            [
+                "ROUTING_TABLE", f"10.8.{i // 250 % 250}.{i % 250}", f"client{i}",
+                f"198.51.{i % 250}.{i // 250 % 250}:{1024 + i % 50000}",
+                datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"), str(now),
+            ]
+        )
+    lines.append(["GLOBAL_STATS", "Max bcast/mcast queue length", "0"])
+    lines.append(["END"])
+    with open(path, "w", encoding="utf-8") as file:
+        file.writelines(separator.join(line) + "\n" for line in lines)
+    return path
+
+
+def wg_snapshot(count, tick, interface="wg0"):
+    """
+    Снимок WireGuard с count пирами на тике tick: счётчики растут с каждым
+    тиком, рукопожатие — в момент снимка.
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.wg_reader import WgPeer, WgSnapshot
+
+    taken_at = 1760000000 + 30 * tick
+    peers = tuple(
+        WgPeer(
+            interface=interface,
+            public_key=f"peer{i:05d}",
+            endpoint=None,
+            allowed_ips=(f"10.9.{i // 250 % 250}.{i % 250}/32",),
+            latest_handshake=taken_at,
+            rx_bytes=1000 * tick + i,
+            tx_bytes=2000 * tick + i,
+            persistent_keepalive=0,
+        )
+        for i in range(count)
+    )
+    return WgSnapshot((), peers, taken_at)
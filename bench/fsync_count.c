@@ -0,0 +1,27 @@
+/*
+ * Счётчик вызовов fsync/fdatasync для bench/bench_wg_stats.py.
+ *
+ *   cc -shared -fPIC -o bench/fsync_count.so bench/fsync_count.c -ldl
+ *   LD_PRELOAD=bench/fsync_count.so python bench/bench_wg_stats.py
+ */
+#define _GNU_SOURCE
+#include <dlfcn.h>
+#include <unistd.h>
+
+static long calls = 0;
+
+long fsync_count(void) { return calls; }
+
+int fsync(int fd) {
+    static int (*real)(int);
+    if (!real) real = dlsym(RTLD_NEXT, "fsync");
+    calls++;
+    return real(fd);
+}
+
+int fdatasync(int fd) {
+    static int (*real)(int);
+    if (!real) real = dlsym(RTLD_NEXT, "fdatasync");
+    calls++;
+    return real(fd);
+}
@@ -1,20 +1,15 @@
-import csv
+import base64
+import hashlib
 import sqlite3
-import requests
 import os
-import re
 import threading
 import random
 import time
 import string
-import psutil
-import socket
 import subprocess
 import json
 
-from statistics import mean
 from threading import Lock
-from tzlocal import get_localzone
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -25,6 +20,7 @@ from flask_login import (
 )
 from flask import (
     Flask,
+    Response,
     make_response,
     render_template,
     url_for,
@@ -32,14 +28,43 @@ from flask import (
     request,
     jsonify,
     session,
+    stream_with_context,
 )
 
 from src.forms import LoginForm
 from src.config import Config
+from src.db import get_connection, open_connection, query_stats
+from src.file_watch import file_signature
+from src.migrations import migrate
+from src.ovpn_sources import get_status_sources
+from src.ovpn_status import read_all, source_report
+from src.queries import (
+    CONNECTION_HISTORY,
+    CONNECTION_HISTORY_LIVE,
+    MONTHLY_STATS_BY_MONTH,
+    SYSTEM_ROLLUP_SERIES,
+    USER_BY_ID,
+    USER_BY_USERNAME,
+    WG_DAILY_STATS_BY_DATE,
+)
+from src.server_info import get_server_info
+from src.stream_hub import stream_hub
+from src.traffic_accounting import interval_start, next_interval_start
+from src.wg_clients import client_index, get_client_mapping
+from src.wg_history import MAX_POINTS as WG_HISTORY_MAX_POINTS, peer_history
+from src.wg_reader import EMPTY_SNAPSHOT, WireGuardError, read_wireguard
+from src.collector import (
+    DB_SAVE_INTERVAL,
+    HISTORY_INTERVAL,
+    ROLLUP_TABLES,
+    bucket_start,
+    collector_request,
+    start_in_background,
+)
 from flask_bcrypt import Bcrypt
 from datetime import date, datetime, timezone, timedelta
+from bisect import bisect_left, bisect_right
 from zoneinfo._common import ZoneInfoNotFoundError
-from collections import defaultdict
 
 
 class ScriptNameMiddleware:
@@ -76,23 +101,15 @@ app.wsgi_app = ScriptNameMiddleware(app.wsgi_app)
 bcrypt = Bcrypt(app)
 loginManager = LoginManager(app)
 loginManager.login_view = "login"
-# Получаем LOG_FILES из конфигурации
-LOG_FILES = Config.LOG_FILES
-
-# Переменная для хранения кэшированных данных
-cached_system_info = None
-last_fetch_time = 0
-CACHE_DURATION = 10  # обновление кэша каждые 10 секунд
-cpu_history = []
-ram_history = []
-MAX_CPU_HISTORY = 60 * 12  # хранить 12 часов с шагом 1 минута
-DB_SAVE_INTERVAL = 300  # запись в БД каждые 5 минут
-last_db_save = 0
-
-SAMPLE_INTERVAL = 10  # текущая частота сбора
-MAX_HISTORY_SECONDS = 7 * 24 * 3600  # сколько секунд хранить в памяти
+
 LIVE_POINTS = 60
-last_collect = 0
+# Cache-Control: max-age для опрашиваемых API — по периоду обновления их данных
+SYSTEM_INFO_MAX_AGE = max(1, int(Config.SAMPLE_INTERVAL))
+WG_STATS_MAX_AGE = max(1, int(Config.STREAM_INTERVAL))
+WG_HISTORY_DEFAULT_POINTS = 100
+WG_HISTORY_DEFAULT_RANGE = 7 * 24 * 3600  # секунды
+VNSTAT_MAX_AGE = 60  # vnstatd сохраняет базу раз в несколько минут
+VNSTAT_DB_PATH = os.path.join(Config.VNSTAT_DB_DIR, "vnstat.db")
 BOT_RESTART_LOCK = Lock()
 BOT_SERVICE_NAME = "telegram-bot"
 
@@ -374,39 +391,21 @@ def get_telegram_bot_status():
     except Exception:
         return False
 
-# Функция для подлючения к базе данных SQLite
+# Функция для подлючения к базе данных SQLite (соединение потока, см. src.db)
 def get_db_connection():
-    conn = sqlite3.connect(app.config["DATABASE_PATH"])
-    conn.row_factory = sqlite3.Row  # Для получения результатов в виде словаря
-    return conn
-
-
-# Создаем таблицу для пользователей (один раз при старте)
-def create_users_table():
-    conn = get_db_connection()
-    conn.execute(
-        """CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            role  TEXT NOT NULL,
-            password TEXT NOT NULL
-        )
-    """
-    )
-    conn.commit()
-    conn.close()
+    # Для получения результатов в виде словаря
+    return get_connection(app.config["DATABASE_PATH"], row_factory=sqlite3.Row)
 
 
-# Вызываем функцию для создания таблицы при запуске приложения
-create_users_table()
+# Схема базы пользователей: новые миграции применяются один раз при старте
+migrate(get_db_connection(), "users")
 
 
 # Flask-Login: Загрузка пользователей по его ID
 @loginManager.user_loader
 def load_user(user_id):
     conn = get_db_connection()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
+    user = conn.execute(USER_BY_ID, (user_id,)).fetchone()
     if user:
         return User(
             user_id=user["id"],
@@ -430,21 +429,17 @@ class User(UserMixin):
 def add_user(username, role, password):
     conn = get_db_connection()
     # Проверяем, существует ли пользователь с таким именем
-    existing_user = conn.execute(
-        "SELECT * FROM users WHERE username = ?", (username,)
-    ).fetchone()
+    existing_user = conn.execute(USER_BY_USERNAME, (username,)).fetchone()
     
     if existing_user:
         print(f"Пользователь уже существует.")
-        conn.close()
         return
     hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
-    conn.execute(
-        "INSERT INTO users (username, role, password) VALUES (?, ?, ?)",
-        (username, role, hashed_password),
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            "INSERT INTO users (username, role, password) VALUES (?, ?, ?)",
+            (username, role, hashed_password),
+        )
     print(password)
     return
 
@@ -468,7 +463,6 @@ def add_admin():
         add_user("admin", "admin", passw)
         # print(f"Пароль администратора: {passw}")
 
-    conn.close()
     return passw
 
 
@@ -480,18 +474,16 @@ def change_admin_password():
 
     if not admin_user:
         print("Администратор не найден.")
-        conn.close()
         return
 
     passw = get_random_pass()  # Генерация нового пароля
     hashed_password = bcrypt.generate_password_hash(passw).decode("utf-8")
 
-    conn.execute(
-        "UPDATE users SET password = ? WHERE username = ? AND role = 'admin'",
-        (hashed_password, "admin"),
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            "UPDATE users SET password = ? WHERE username = ? AND role = 'admin'",
+            (hashed_password, "admin"),
+        )
 
     print(f"{passw}")
 
@@ -510,19 +502,17 @@ def change_admin_password_2(new_password):
 
     if not admin_user:
         print("Администратор не найден.")
-        conn.close()
         return
 
     # Хешируем новый пароль
     hashed_password = bcrypt.generate_password_hash(new_password).decode("utf-8")
 
     # Обновляем пароль администратора
-    conn.execute(
-        "UPDATE users SET password = ? WHERE username = ? AND role = 'admin'",
-        (hashed_password, "admin"),
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            "UPDATE users SET password = ? WHERE username = ? AND role = 'admin'",
+            (hashed_password, "admin"),
+        )
 
     print(f"Пароль администратора успешно изменён: {new_password}")
 
@@ -531,132 +521,56 @@ def change_admin_password_2(new_password):
 # Функция для получения данных WireGuard
 def get_wireguard_stats():
     try:
-        result = subprocess.run(
-            ["/usr/bin/wg", "show"], capture_output=True, text=True, check=True
-        )
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"Команда wg show завершилась с ошибкой: {e.stderr}")
-        return f"Ошибка выполнения команды: {e.stderr}"
-    except FileNotFoundError:
-        print(
-            "Команда wg не найдена. Убедитесь, что WireGuard установлен и доступен в системе."
-        )
-        return "Команда wg не найдена."
-
-
-def format_handshake_time(handshake_string):
-    time_units = re.findall(r"(\d+)\s+(\w+)", handshake_string)
-
-    # Словарь для перевода единиц времени в сокращения
-    abbreviations = {
-        "year": "г.",
-        "years": "г.",
-        "month": "мес.",
-        "months": "мес.",
-        "week": "нед.",
-        "weeks": "нед.",
-        "day": "дн.",
-        "days": "дн.",
-        "hour": "ч.",
-        "hours": "ч.",
-        "minute": "мин.",
-        "minutes": "мин.",
-        "second": "сек.",
-        "seconds": "сек.",
-    }
-
-    # Формируем сокращенную строку
-    formatted_time = " ".join(
-        f"{value} {abbreviations[unit]}" for value, unit in time_units
-    )
-
-    return formatted_time
-
-
-def is_peer_online(last_handshake):
-    if not last_handshake:
-        return False
-    return datetime.now() - last_handshake < timedelta(minutes=3)
+        return read_wireguard(app.config["WG_BACKEND"])
+    except WireGuardError as e:
+        print(e)
+        return EMPTY_SNAPSHOT
 
 
-def parse_relative_time(relative_time):
-    """Преобразует строку с днями, часами, минутами и секундами в абсолютное время."""
-    now = datetime.now()
-    time_deltas = {"days": 0, "hours": 0, "minutes": 0, "seconds": 0}
-
-    # Разбиваем строку на части
-    parts = relative_time.split()
-    i = 0
-    while i < len(parts):
-        try:
-            value = int(parts[i])  # Извлекаем число
-            unit = parts[i + 1]  # Следующее слово — это единица времени
-            if "д" in unit or "day" in unit:
-                time_deltas["days"] += value
-            elif "ч" in unit or "hour" in unit:
-                time_deltas["hours"] += value
-            elif "мин" in unit or "minute" in unit:
-                time_deltas["minutes"] += value
-            elif "сек" in unit or "second" in unit:
-                time_deltas["seconds"] += value
-            i += 2  # Пропускаем число и единицу времени
-        except (ValueError, IndexError):
-            break  # Если данные некорректны, прерываем
-
-    # Вычисляем итоговую разницу времени
-    delta = timedelta(
-        days=time_deltas["days"],
-        hours=time_deltas["hours"],
-        minutes=time_deltas["minutes"],
-        seconds=time_deltas["seconds"],
-    )
-
-    return now - delta
-
-
-def read_wg_config(file_path):
-    """Считывает клиентские данные из конфигурационного файла WireGuard."""
-    client_mapping = {}
-
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            current_client_name = None
-
-            for line in file:
-                line = line.strip()
-
-                # Если строка начинается с # Client =, то сохраняем имя клиента
-                if line.startswith("# Client ="):
-                    current_client_name = line.split("=", 1)[1].strip()
-
-                # Если строка начинается с [Peer], сбрасываем имя клиента
-                elif line.startswith("[Peer]"):
-                    # Проверяем, есть ли имя клиента, если нет, то оставляем 'N/A'
-                    current_client_name = current_client_name or "N/A"
+class DailyStatsCache:
+    """
+    Сегодняшние строки wg_daily_stats в памяти процесса. Соединение только для
+    чтения остаётся открытым: PRAGMA data_version на нём меняется после каждой
+    фиксации wg_stats.py, и лишь тогда строки перечитываются.
+    """
 
-                # Если строка начинается с PublicKey =, сохраняем публичный ключ с именем клиента
-                elif line.startswith("PublicKey =") and current_client_name:
-                    public_key = line.split("=", 1)[1].strip()
-                    client_mapping[public_key] = current_client_name
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        self.conn = None
+        self.key = None  # (дата, data_version) загруженных строк
+        self.rows = {}
+
+    def get(self):
+        """{(peer, interface): (client, received, sent)} за сегодня."""
+        today = date.today().isoformat()
+        with self.lock:
+            try:
+                if self.conn is None:
+                    self.conn = open_connection(
+                        self.path, readonly=True, check_same_thread=False
+                    )
+                version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+                if self.key != (today, version):
+                    rows = self.conn.execute(WG_DAILY_STATS_BY_DATE, (today,)).fetchall()
+                    self.rows = {(row[0], row[1]): row[2:] for row in rows}
+                    self.key = (today, version)
+            except sqlite3.Error as e:
+                print(f"[DB ERROR] wg_daily_stats: {e}")
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                self.key = None
+                self.rows = {}
+            return self.rows
 
-    except FileNotFoundError:
-        print(f"Конфигурационный файл {file_path} не найден.")
 
-    # print(client_mapping)
-    return client_mapping
+wg_daily_cache = DailyStatsCache(Config.WG_STATS_PATH)
 
 
 def get_daily_stats_map():
     """Получение ежедневной статистики WG"""
-    today = datetime.now().strftime("%Y-%m-%d")
-    conn = sqlite3.connect(app.config["WG_STATS_PATH"])
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM wg_daily_stats WHERE date = ?", (today,))
-    rows = cursor.fetchall()
-    conn.close()
-    return {(row["peer"], row["interface"]): row for row in rows}
+    return wg_daily_cache.get()
 
 
 def humanize_bytes(num, suffix="B"):
@@ -668,156 +582,93 @@ def humanize_bytes(num, suffix="B"):
     return f"{num:.1f} P{suffix}"
 
 
-def parse_wireguard_output(output):
-    """Парсинг вывода команды wg show."""
-    stats = []
-    lines = output.strip().splitlines()
-    interface_data = {}
+def wg_stats_version(snapshot):
+    """Версия ответа parse_wireguard_output для ETag и канала wg."""
+    # Пиры — это счётчики и время рукопожатия в секундах эпохи; возраст
+    # рукопожатия считает браузер (wg_page.js), поэтому с ходом времени версия
+    # меняется только при смене признака онлайна
+    return (
+        snapshot.interfaces,
+        snapshot.peers,
+        tuple(peer.is_online(snapshot.taken_at) for peer in snapshot.peers),
+        db_signature(app.config["WG_STATS_PATH"]),
+        client_index.version(),
+    )
 
-    vpn_mapping = read_wg_config("/etc/wireguard/vpn.conf")
-    antizapret_mapping = read_wg_config("/etc/wireguard/antizapret.conf")
-    client_mapping = {**vpn_mapping, **antizapret_mapping}
-    daily_stats_map = get_daily_stats_map()
 
-    for line in lines:
-        line = line.strip()
-        if line.startswith("interface:"):
-            if interface_data:
-                stats.append(interface_data)
-                interface_data = {}
-            interface_data["interface"] = line.split(": ")[1]
-        elif line.startswith("public key:"):
-            public_key = line.split(": ")[1]
-            interface_data["public_key"] = public_key
-        elif line.startswith("listening port:"):
-            interface_data["listening_port"] = line.split(": ")[1]
-        elif line.startswith("peer:"):
-            if "peers" not in interface_data:
-                interface_data["peers"] = []
-            peer_data = {"peer": line.split(": ")[1].strip()}
-            masked_peer = peer_data["peer"][:4] + "..." + peer_data["peer"][-4:]
-            peer_data["masked_peer"] = masked_peer
-            peer_data["client"] = client_mapping.get(peer_data["peer"], "N/A")
-
-            daily_row = daily_stats_map.get(
-                (peer_data["peer"], interface_data["interface"])
-            )
-            if daily_row:
-                peer_data["daily_received"] = humanize_bytes(daily_row["received"])
-                peer_data["daily_sent"] = humanize_bytes(daily_row["sent"])
-                try:
-                    total = parse_bytes(peer_data["received"]) + parse_bytes(
-                        peer_data["sent"]
-                    )
-                    daily_total = daily_row["received"] + daily_row["sent"]
-                    round_res = round((daily_total / total * 100) if total > 0 else 0)
-                    peer_data["daily_traffic_percentage"] = round_res
-                except Exception:
-                    peer_data["daily_traffic_percentage"] = 0
-            else:
-                peer_data["daily_received"] = "0 B"
-                peer_data["daily_sent"] = "0 B"
-                peer_data["daily_traffic_percentage"] = 0
-            interface_data["peers"].append(peer_data)
-        elif line.startswith("endpoint:"):
-            peer_data["endpoint"] = mask_ip(line.split(": ")[1].strip())
-        elif line.startswith("allowed ips:"):
-            allowed_ips = line.split(": ")[1].split(", ")
-            peer_data["allowed_ips"] = allowed_ips
-            peer_data["visible_ips"] = allowed_ips[:1]
-            peer_data["hidden_ips"] = allowed_ips[1:]
-        elif line.startswith("latest handshake:"):
-            handshake_time = line.split(": ")[1].strip()
-
-            if handshake_time.lower() == "now":
-                formatted_handshake_time = datetime.now()
-                peer_data["latest_handshake"] = "Now"
-                peer_data["online"] = True
-
-            elif any(
-                unit in handshake_time
-                for unit in ["мин", "час", "сек", "minute", "hour", "second", "day", "week"]
-            ):
-                formatted_handshake_time = parse_relative_time(handshake_time)
-                peer_data["latest_handshake"] = format_handshake_time(handshake_time)
-                peer_data["online"] = is_peer_online(formatted_handshake_time)
+def parse_wireguard_output(snapshot):
+    """Подготовка снимка WireGuard к отображению."""
+    client_mapping = get_client_mapping()
+    daily_stats_map = get_daily_stats_map()
 
-            else:
-                formatted_handshake_time = datetime.strptime(
-                    handshake_time, "%Y-%m-%d %H:%M:%S"
-                )
-                peer_data["latest_handshake"] = format_handshake_time(handshake_time)
-                peer_data["online"] = is_peer_online(formatted_handshake_time)
-        
-        elif line.startswith("latest handshake:"):
-            handshake_time = line.split(": ")[1].strip()
-            if any(
-                unit in handshake_time
-                for unit in ["мин", "час", "сек", "minute", "hour", "second"]
-            ):
-                formatted_handshake_time = parse_relative_time(handshake_time)
-            else:
-                formatted_handshake_time = datetime.strptime(
-                    handshake_time, "%Y-%m-%d %H:%M:%S"
-                )
-            peer_data["latest_handshake"] = format_handshake_time(handshake_time)
-            peer_data["online"] = is_peer_online(formatted_handshake_time)
-        elif line.startswith("transfer:"):
-            transfer_data = line.split(":")[1].strip().split(", ")
-            received = transfer_data[0].replace(" received", "").strip()
-            sent = transfer_data[1].replace(" sent", "").strip()
-
-            received_str = transfer_data[0].replace(" received", "").strip()
-            sent_str = transfer_data[1].replace(" sent", "").strip()
-
-            # Конвертируем строки в байты
-            peer_data["received_bytes"] = (
-                parse_bytes(received_str) if received_str else 0
-            )
-            peer_data["sent_bytes"] = parse_bytes(sent_str) if sent_str else 0
+    stats = []
+    interfaces = {}
+    for interface in snapshot.interfaces:
+        interfaces[interface.name] = {
+            "interface": interface.name,
+            "public_key": interface.public_key,
+            "listening_port": str(interface.listen_port),
+            "peers": [],
+        }
+        stats.append(interfaces[interface.name])
 
-            peer_data["received"] = received if received else "0 B"
-            peer_data["sent"] = sent if sent else "0 B"
+    for peer in snapshot.peers:
+        interface_data = interfaces.get(peer.interface)
+        if interface_data is None:
+            continue
 
-            total_bytes = peer_data["received_bytes"] + peer_data["sent_bytes"]
-            peer_data["received_percentage"] = (
-                round((peer_data["received_bytes"] / total_bytes * 100), 2)
-                if total_bytes > 0
-                else 0
-            )
-            peer_data["sent_percentage"] = (
-                round((peer_data["sent_bytes"] / total_bytes * 100), 2)
-                if total_bytes > 0
-                else 0
+        received_bytes, sent_bytes = peer.rx_bytes, peer.tx_bytes
+        total_bytes = received_bytes + sent_bytes
+        peer_data = {
+            "peer": peer.public_key,
+            "masked_peer": peer.public_key[:4] + "..." + peer.public_key[-4:],
+            "client": client_mapping.get(peer.public_key, "N/A"),
+            "allowed_ips": list(peer.allowed_ips),
+            "visible_ips": list(peer.allowed_ips[:1]),
+            "hidden_ips": list(peer.allowed_ips[1:]),
+            "online": peer.is_online(snapshot.taken_at),
+            "received_bytes": received_bytes,
+            "sent_bytes": sent_bytes,
+            "received": humanize_bytes(received_bytes),
+            "sent": humanize_bytes(sent_bytes),
+            "received_percentage": (
+                round(received_bytes / total_bytes * 100, 2) if total_bytes > 0 else 0
+            ),
+            "sent_percentage": (
+                round(sent_bytes / total_bytes * 100, 2) if total_bytes > 0 else 0
+            ),
+        }
+        if peer.endpoint:
+            peer_data["endpoint"] = mask_ip(peer.endpoint)
+        if peer.latest_handshake:
+            # Секунды эпохи; «сколько времени назад» выводит wg_page.js
+            peer_data["latest_handshake_at"] = peer.latest_handshake
+
+        daily_row = daily_stats_map.get((peer.public_key, peer.interface))
+        if daily_row:
+            _, daily_received, daily_sent = daily_row
+            daily_total = daily_received + daily_sent
+            peer_data["daily_received"] = humanize_bytes(daily_received)
+            peer_data["daily_sent"] = humanize_bytes(daily_sent)
+            peer_data["daily_traffic_percentage"] = (
+                round(daily_total / total_bytes * 100) if total_bytes > 0 else 0
             )
-
-    if interface_data:
-        stats.append(interface_data)
+        else:
+            peer_data["daily_received"] = "0 B"
+            peer_data["daily_sent"] = "0 B"
+            peer_data["daily_traffic_percentage"] = 0
+        interface_data["peers"].append(peer_data)
 
     return stats
 
 
 def get_daily_stats():
     """Получение ежедневной статистики"""
-    conn = sqlite3.connect(app.config["WG_STATS_PATH"])
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    date_today = date.today().isoformat()
-
-    cursor.execute(
-        "SELECT interface, client, received, sent FROM wg_daily_stats WHERE date = ?",
-        (date_today,),
-    )
-    rows = cursor.fetchall()
-    conn.close()
-
     stats = {}
-    for row in rows:
-        iface = row["interface"]
-        client = row["client"]
+    for (_, iface), (client, received, sent) in get_daily_stats_map().items():
         if iface not in stats:
             stats[iface] = {}
-        stats[iface][client] = {"received": row["received"], "sent": row["sent"]}
+        stats[iface][client] = {"received": received, "sent": sent}
 
     return stats
 
@@ -832,22 +683,6 @@ def format_bytes(size):
     return f"{size:.2f} TB"
 
 
-def parse_bytes(value):
-    """Преобразует строку с размером данных в байты."""
-    size, unit = value.split(" ")
-    size = float(size)
-    unit = unit.lower()
-    if unit == "kb":
-        return size * 1024
-    elif unit == "mb":
-        return size * 1024**2
-    elif unit == "gb":
-        return size * 1024**3
-    elif unit == "tb":
-        return size * 1024**4
-    return size
-
-
 # Функция для склонения слова "клиент"
 def pluralize_clients(count):
 
@@ -861,28 +696,10 @@ def pluralize_clients(count):
         return f"{count} клиентов"
 
 
-# Функция для получения внешнего IP-адреса
-def get_external_ip():
-    try:
-        response = requests.get("https://api.ipify.org", timeout=10)
-        if response.status_code == 200:
-            return response.text
-        return "IP не найден"
-    except requests.Timeout:
-        return "Ошибка: запрос превысил время ожидания."
-    except requests.ConnectionError:
-        return "Ошибка: нет подключения к интернету."
-    except requests.RequestException as e:
-        return f"Ошибка при запросе: {e}"
-
-
 # Преобразование даты
-def format_date(date_string):
-    date_obj = datetime.strptime(date_string, "%Y-%m-%d %H:%M:%S")
-    server_timezone = get_localzone()
-    localized_date = date_obj.replace(tzinfo=server_timezone)
-    utc_date = localized_date.astimezone(timezone.utc)
-    return utc_date.isoformat()
+def format_date(epoch):
+    """Время подключения (секунды эпохи) в ISO-строке UTC."""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
 
 
 # Маскируем IP-адрес
@@ -927,137 +744,66 @@ def format_duration(start_time):
         return f"{seconds} сек."
 
 
-client_cache = defaultdict(lambda: {"received": 0, "sent": 0, "timestamp": None})
+def get_ovpn_rates(history=False):
+    """
+    Скорости подключений OpenVPN от сборщика:
+    {(имя, реальный адрес, время подключения): запись}.
+    """
+    rows = collector_request("ovpn_rates", *(["history"] if history else [])) or []
+    return {(r["name"], r["real_address"], r["connected_since"]): r for r in rows}
 
 
-# Чтение данных из CSV и обработка
-def read_csv(file_path, protocol):
+# Строки таблицы клиентов из снимка статус-файла
+def read_csv(status, rates=None):
     data = []
     total_received, total_sent = 0, 0
-    current_time = datetime.now()
-
-    if not os.path.exists(file_path):
-        return [], 0, 0, None
-
-    with open(file_path, newline="", encoding="utf-8") as csvfile:
-        reader = csv.reader(csvfile)
-        next(reader)
-
-        for row in reader:
-            if row[0] == "CLIENT_LIST":
-                client_name = row[1]
-                received = int(row[5])
-                sent = int(row[6])
-                total_received += received
-                total_sent += sent
-
-                start_date = datetime.strptime(row[7], "%Y-%m-%d %H:%M:%S")
-                duration = format_duration(start_date)
-
-                # Получение предыдущих данных из кэша
-                previous_data = client_cache.get(
-                    client_name, {"received": 0, "sent": 0, "timestamp": current_time}
-                )
-                previous_received = previous_data["received"]
-                previous_sent = previous_data["sent"]
-                previous_time = previous_data["timestamp"]
-
-                # Рассчитываем скорость только при валидной разнице времени
-                time_diff = (current_time - previous_time).total_seconds()
-                if time_diff >= 30:  # Учитываем фиксированный интервал обновления логов
-                    download_speed = (
-                        (received - previous_received) / time_diff
-                        if received >= previous_received
-                        else 0
-                    )
-                    upload_speed = (
-                        (sent - previous_sent) / time_diff
-                        if sent >= previous_sent
-                        else 0
-                    )
-                else:
-                    download_speed = 0
-                    upload_speed = 0
-
-                # Обновляем кэш
-                client_cache[client_name] = {
-                    "received": received,
-                    "sent": sent,
-                    "timestamp": current_time,
-                }
-
-                # Добавляем данные клиента
-                data.append(
-                    [
-                        client_name,
-                        mask_ip(row[2]),
-                        row[3],
-                        format_bytes(received),
-                        format_bytes(sent),
-                        f"{format_bytes(max(download_speed, 0))}/s",
-                        f"{format_bytes(max(upload_speed, 0))}/s",
-                        format_date(row[7]),
-                        duration,
-                        protocol,
-                    ]
-                )
-
-    return data, total_received, total_sent, None
-
+    rates = rates or {}
+    protocol = status.protocol
 
-# ---------Метрики----------
-def ensure_db():
-    """Создает таблицу system_stats, если она не существует."""
-
-    conn = sqlite3.connect(app.config["SYSTEM_STATS_PATH"])
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS system_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME,
-            cpu_percent REAL,
-            ram_percent REAL
-        )
-    """
-    )
+    if status.error:
+        return [], 0, 0, status.error
 
-    conn.commit()
-    conn.close()
+    for client in status.clients:
+        client_name = client.name
+        received = client.bytes_received
+        sent = client.bytes_sent
+        total_received += received
+        total_sent += sent
 
+        start_date = datetime.fromtimestamp(client.connected_since_epoch)
+        duration = format_duration(start_date)
 
-def save_minute_average_to_db():
-    """Сохраняет средние значения CPU и RAM за последний интервал в БД."""
-    now = datetime.now()
-    cutoff = now - timedelta(seconds=DB_SAVE_INTERVAL)
-    to_avg = [p for p in cpu_history if p["timestamp"] >= cutoff]
-    if not to_avg:
-        return
-    cpu_avg = mean([p["cpu"] for p in to_avg])
-    ram_avg = mean([p["ram"] for p in to_avg])
-
-    try:
-        conn = sqlite3.connect(app.config["SYSTEM_STATS_PATH"])
-        cur = conn.cursor()
-        # записываем timestamp = now (local)
-        cur.execute(
-            "INSERT INTO system_stats (timestamp, cpu_percent, ram_percent) VALUES (?, ?, ?)",
-            (now.strftime("%Y-%m-%d %H:%M:%S"), round(cpu_avg, 3), round(ram_avg, 3)),
+        # Сглаженная скорость подключения, посчитанная сборщиком
+        rate = rates.get(
+            (client_name, client.real_address, client.connected_since_epoch), {}
         )
+        download_speed = rate.get("rx_rate", 0)
+        upload_speed = rate.get("tx_rate", 0)
 
-        # Очищаем старые записи старше 7 дней
-        cutoff_db = now - timedelta(days=7)
-        cur.execute(
-            "DELETE FROM system_stats WHERE timestamp < ?",
-            (cutoff_db.strftime("%Y-%m-%d %H:%M:%S"),),
+        # Добавляем данные клиента
+        data.append(
+            [
+                client_name,
+                mask_ip(client.real_address),
+                client.virtual_address,
+                format_bytes(received),
+                format_bytes(sent),
+                f"{format_bytes(max(download_speed, 0))}/s",
+                f"{format_bytes(max(upload_speed, 0))}/s",
+                format_date(client.connected_since_epoch),
+                duration,
+                protocol,
+                # Исходные значения для сортировки (в шаблоне не выводятся)
+                received,
+                sent,
+                client.connected_since_epoch,
+            ]
         )
 
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print("[DB ERROR] save_minute_average_to_db:", e)
+    return data, total_received, total_sent, None
 
 
+# ---------Метрики----------
 def group_rows(rows, interval="minute"):
     """Группирует ряды по интервалу и усредняет значения CPU и RAM."""
 
@@ -1114,263 +860,26 @@ def resample_to_n(data, n):
     return out
 
 
-def update_system_info_loop():
-    global last_db_save, last_collect
-    ensure_db()
-
-    while True:
-        now = time.time()
-        if now - last_collect >= SAMPLE_INTERVAL:
-            # psutil: non-blocking
-            cpu = psutil.cpu_percent(interval=None)
-            ram = psutil.virtual_memory().percent
-            ts = datetime.now()
-            cpu_history.append({"timestamp": ts, "cpu": cpu, "ram": ram})
-            # trim by time (keep at most MAX_HISTORY_SECONDS seconds)
-            cutoff = datetime.now() - timedelta(seconds=MAX_HISTORY_SECONDS)
-            # remove from start while older than cutoff
-            while cpu_history and cpu_history[0]["timestamp"] < cutoff:
-                cpu_history.pop(0)
-            last_collect = now
-
-        # сохранить среднее в БД каждые DB_SAVE_INTERVAL
-        if now - last_db_save >= DB_SAVE_INTERVAL:
-            save_minute_average_to_db()
-            last_db_save = now
-
-        time.sleep(1)
-
-
-def get_default_interface():
-    try:
-        result = subprocess.run(
-            ["/usr/bin/ip", "route"], capture_output=True, text=True, check=True
-        )
-        for line in result.stdout.splitlines():
-            if "default" in line:
-                return line.split()[4]
-    except Exception as e:
-        print(f"Ошибка: {e}")
-    return None
-
-
-def get_network_stats(interface):
-    try:
-        with open(
-            f"/sys/class/net/{interface}/statistics/rx_bytes", "r", encoding="utf-8"
-        ) as f:
-            rx_bytes = int(f.read().strip())
-        with open(
-            f"/sys/class/net/{interface}/statistics/tx_bytes", "r", encoding="utf-8"
-        ) as f:
-            tx_bytes = int(f.read().strip())
-        return {"interface": interface, "rx": rx_bytes, "tx": tx_bytes}
-    except FileNotFoundError:
-        return None  # Если интерфейс не найден
-
-
-def get_network_load():
-    net_io_start = psutil.net_io_counters(pernic=True)
-    time.sleep(1)
-    net_io_end = psutil.net_io_counters(pernic=True)
-
-    network_data = {}
-    for interface in net_io_start:
-        if interface.startswith(("lo", "docker", "veth", "br-")):
-            continue
-
-        sent_start, recv_start = (
-            net_io_start[interface].bytes_sent,
-            net_io_start[interface].bytes_recv,
-        )
-        sent_end, recv_end = (
-            net_io_end[interface].bytes_sent,
-            net_io_end[interface].bytes_recv,
-        )
-
-        sent_speed = (sent_end - sent_start) * 8 / 1e6
-        recv_speed = (recv_end - recv_start) * 8 / 1e6
-
-        if sent_speed > 0 or recv_speed > 0:
-            network_data[interface] = {
-                "sent_speed": round(sent_speed, 2),
-                "recv_speed": round(recv_speed, 2),
-            }
-
-    return network_data
-
-
-def get_uptime():
-    try:
-        uptime = (
-            subprocess.check_output("/usr/bin/uptime -p", shell=True).decode().strip()
-        )
-    except subprocess.CalledProcessError:
-        uptime = "Не удалось получить время работы"
-    return uptime
-
-
-def format_uptime(uptime_string):
-    # Регулярное выражение с учетом лет, месяцев, недель, дней, часов и минут
-    pattern = r"(?:(\d+)\s*years?|(\d+)\s*months?|(\d+)\s*weeks?|(\d+)\s*days?|(\d+)\s*hours?|(\d+)\s*minutes?)"
-
-    years = 0
-    months = 0
-    weeks = 0
-    days = 0
-    hours = 0
-    minutes = 0
-
-    matches = re.findall(pattern, uptime_string)
-
-    for match in matches:
-        if match[0]:  # Годы
-            years = int(match[0])
-        elif match[1]:  # Месяцы
-            months = int(match[1])
-        elif match[2]:  # Недели
-            weeks = int(match[2])
-        elif match[3]:  # Дни
-            days = int(match[3])
-        elif match[4]:  # Часы
-            hours = int(match[4])
-        elif match[5]:  # Минуты
-            minutes = int(match[5])
-
-    # Итоговая строка
-    result = []
-    if years > 0:
-        result.append(f"{years} г.")
-    if months > 0:
-        result.append(f"{months} мес.")
-    if weeks > 0:
-        result.append(f"{weeks} нед.")
-    if days > 0:
-        result.append(f"{days} дн.")
-    if hours > 0:
-        result.append(f"{hours} ч.")
-    if minutes > 0:
-        result.append(f"{minutes} мин.")
-
-    return " ".join(result)
-
-
-def count_online_clients(file_paths):
-    total_openvpn = 0
-    results = {}
-
-    # Подсчёт WireGuard
-#    try:
-#        wg_output = subprocess.check_output(["/usr/bin/wg", "show"], text=True)
-#        wg_latest_handshakes = re.findall(r"latest handshake: (.+)", wg_output)
-
-#        online_wg = 0
-#        for handshake in wg_latest_handshakes:
-#            handshake_str = handshake.strip()
-#            if handshake_str == "0 seconds ago":
-#                online_wg += 1
-#            else:
-#                try:
-                    # Используем parse_relative_time и is_peer_online для определения онлайн-статуса
-#                    handshake_time = parse_relative_time(handshake_str)
-#                    if is_peer_online(handshake_time):
-#                        online_wg += 1
-#                except Exception:
-#                    continue
-#        results["WireGuard"] = online_wg
-#    except Exception:
-#        results["WireGuard"] = 0  # или f"Ошибка: {e}" по желанию
-
-    # Подсчёт OpenVPN
-    for path, _ in file_paths:
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.startswith("CLIENT_LIST"):
-                        total_openvpn += 1
-        except:
-            continue
-
-    results["OpenVPN"] = total_openvpn
-    return results
-
-
 def get_system_info():
-    global cached_system_info
-    return cached_system_info
-
-
-def update_system_info():
-    global cached_system_info, last_fetch_time, cpu_history, last_db_save
-
-    while True:
-        current_time = time.time()
-        if not cached_system_info or (current_time - last_fetch_time >= CACHE_DURATION):
-            cpu_percent = psutil.cpu_percent(interval=1)
-            ram_percent = psutil.virtual_memory().percent
-            timestamp = datetime.now()
-
-            # Обновление live истории в памяти
-            cpu_history.append(
-                {"timestamp": timestamp, "cpu": cpu_percent, "ram": ram_percent}
-            )
-            if len(cpu_history) > MAX_CPU_HISTORY:
-                cpu_history.pop(0)  # удаляем старые записи
-
-            interface = get_default_interface()
-            # Проверяем, чтобы интерфейс не начинался с lo, docker, veth, br-
-            if interface and not interface.startswith(("lo", "docker", "veth", "br-")):
-                network_stats = get_network_stats(interface) if interface else None
-            else:
-                network_stats = None
-            vpn_clients = count_online_clients(LOG_FILES)
-
-            cached_system_info = {
-                "cpu_load": cpu_percent,
-                "memory_used": psutil.virtual_memory().used // (1024**2),
-                "memory_total": psutil.virtual_memory().total // (1024**2),
-                "disk_used": psutil.disk_usage("/").used // (1024**3),
-                "disk_total": psutil.disk_usage("/").total // (1024**3),
-                "network_load": get_network_load(),
-                "uptime": format_uptime(get_uptime()),
-                "network_interface": interface or "Не найдено",
-                "rx_bytes": format_bytes(network_stats["rx"]) if network_stats else 0,
-                "tx_bytes": format_bytes(network_stats["tx"]) if network_stats else 0,
-                "vpn_clients": vpn_clients,
-            }
-
-            last_fetch_time = current_time
-
-        time.sleep(CACHE_DURATION)
-
+    """Последний снимок системных метрик от сборщика (None, если он недоступен)."""
+    return collector_request("system_info")
 
-# Запуск фоновой задачи
-threading.Thread(target=update_system_info, daemon=True).start()
-threading.Thread(target=update_system_info_loop, daemon=True).start()
-
-def get_vnstat_interfaces():
-    try:
-        result = subprocess.run(
-            ["/usr/bin/vnstat", "--json"], capture_output=True, text=True, check=True
-        )
-        data = json.loads(result.stdout)
 
-        interfaces = []
-        for iface in data.get("interfaces", []):
-            name = iface.get("name")
-            traffic = iface.get("traffic", {}).get("total", {})
-            rx = traffic.get("rx", 0)
-            tx = traffic.get("tx", 0)
+def get_cpu_series(limit=None, since=None):
+    """История загрузки ЦП/ОЗУ из памяти сборщика по столбцам."""
+    args = [limit or 0] + ([since.timestamp()] if since else [])
+    series = collector_request("cpu_history", *args)
+    return series or {"timestamp": [], "cpu": [], "ram": []}
 
-            # Добавляем только если есть трафик
-            if (rx + tx) > 0:
-                interfaces.append(name)
 
-        return interfaces
+def get_cpu_history(limit=None, since=None):
+    """История загрузки ЦП/ОЗУ из памяти сборщика по строкам."""
+    series = get_cpu_series(limit, since)
+    return [
+        {"timestamp": datetime.fromtimestamp(ts), "cpu": cpu, "ram": ram}
+        for ts, cpu, ram in zip(series["timestamp"], series["cpu"], series["ram"])
+    ]
 
-    except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
-        print(f"Ошибка при получении интерфейсов: {e}")
-        return []
 
 # Маршрут для выхода из системы
 @app.route("/logout", methods=["GET", "POST"])
@@ -1400,10 +909,7 @@ def login():
 
     if form.validate_on_submit():
         conn = get_db_connection()
-        user = conn.execute(
-            "SELECT * FROM users WHERE username = ?", (form.username.data,)
-        ).fetchone()
-        conn.close()
+        user = conn.execute(USER_BY_USERNAME, (form.username.data,)).fetchone()
 
         if user and bcrypt.check_password_hash(user["password"], form.password.data):
             user_obj = User(
@@ -1430,28 +936,11 @@ def login():
     return resp
 
 
-def get_git_version():
-    try:
-        version = (
-            subprocess.check_output(
-                ["/usr/bin/git", "describe", "--tags", "--abbrev=0"],
-                stderr=subprocess.DEVNULL,
-            )
-            .strip()
-            .decode()
-        )
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        version = "unknown"
-    return version
-
-
 @app.context_processor
 def inject_info():
     app_name = read_settings().get("app_name", "StatusOpenVPN")
     return {
-        "hostname": socket.gethostname(),
-        "server_ip": get_external_ip(),
-        "version": get_git_version(),
+        **get_server_info(),
         "base_path": request.script_root or "",
         "app_name": app_name,
     }
@@ -1460,9 +949,10 @@ def inject_info():
 @app.route("/")
 @login_required
 def home():
-    server_ip = get_external_ip()
+    info = get_server_info()
+    server_ip = info["server_ip"]
     system_info = get_system_info()
-    hostname = socket.gethostname()
+    hostname = info["hostname"]
 
     return render_template(
         "index.html",
@@ -1671,11 +1161,77 @@ def api_admins_remove():
     return jsonify(response), 200
 
 
+# ---------Условные запросы----------
+def db_signature(path):
+    """Сигнатура базы SQLite вместе с WAL-файлом: меняется при каждой записи."""
+    signature = file_signature(path)
+    if signature is None:
+        return None
+    return signature, file_signature(path + "-wal")
+
+
+def make_etag(version):
+    return hashlib.blake2b(repr(version).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def with_cache_headers(response, etag, max_age):
+    if etag is not None:
+        response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def not_modified(version, max_age):
+    """Ответ 304, если у клиента уже есть данные этой версии, иначе None."""
+    if version is None:
+        return None
+    etag = make_etag(version)
+    if not request.if_none_match.contains(etag):
+        return None
+    return with_cache_headers(app.response_class(status=304), etag, max_age)
+
+
+def conditional_json(version, max_age, build):
+    """
+    JSON-ответ со строгим ETag от версии данных: при совпадении If-None-Match
+    возвращается 304, а build() не вызывается. version=None — без ETag.
+    """
+    response = not_modified(version, max_age)
+    if response is not None:
+        return response
+    etag = make_etag(version) if version is not None else None
+    return with_cache_headers(jsonify(build()), etag, max_age)
+
+
 @app.route("/api/system_info")
 @login_required
 def api_system_info():
     system_info = get_system_info()
-    return jsonify(system_info)
+    version = system_info["version"] if system_info else None
+    return conditional_json(version, SYSTEM_INFO_MAX_AGE, lambda: system_info)
+
+
+@app.route("/api/ovpn/rates")
+@login_required
+def api_ovpn_rates():
+    """Скорости подключений OpenVPN (байт/с); ?history=1 добавляет историю."""
+    history = request.args.get("history") == "1"
+    return jsonify(list(get_ovpn_rates(history).values()))
+
+
+@app.route("/api/ovpn/sources")
+@login_required
+def api_ovpn_sources():
+    """Экземпляры OpenVPN: число клиентов, время разбора (мс) и свежесть статуса."""
+    return jsonify([source_report(status) for status in read_all(get_status_sources())])
+
+
+@app.route("/api/db/queries")
+@login_required
+def api_db_queries():
+    """Время запросов SQLite этого воркера (см. src.db.query_stats)."""
+    return jsonify({"pid": os.getpid(), "queries": query_stats.report()})
 
 
 @app.route("/wg")
@@ -1691,12 +1247,53 @@ def wg():
 @login_required
 def api_wg_stats():
     try:
-        stats = parse_wireguard_output(get_wireguard_stats())
-        return jsonify(stats)
+        snapshot = get_wireguard_stats()
+        return conditional_json(
+            wg_stats_version(snapshot), WG_STATS_MAX_AGE, lambda: parse_wireguard_output(snapshot)
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/wg/peer/<path:public_key>/history")
+@login_required
+def api_wg_peer_history(public_key):
+    """
+    История трафика пира: ?from=&to= (секунды эпохи, по умолчанию последние
+    7 дней), ?points= (не больше WG_HISTORY_MAX_POINTS), ?interface=.
+    Разрешение (hour/day/month) выбирается по сроку хранения для from.
+    """
+    try:
+        # Правая граница по умолчанию — конец текущего часа, чтобы ETag не менялся каждую секунду
+        end = request.args.get("to")
+        end = int(end) if end else next_interval_start(interval_start(time.time(), "hour"), "hour")
+        start = int(request.args.get("from") or end - WG_HISTORY_DEFAULT_RANGE)
+        points = int(request.args.get("points", WG_HISTORY_DEFAULT_POINTS))
+    except ValueError:
+        return jsonify({"error": "Некорректные параметры from, to или points"}), 400
+    if start >= end or not 0 < points <= WG_HISTORY_MAX_POINTS:
+        return jsonify({"error": "Некорректные параметры from, to или points"}), 400
+    interface = request.args.get("interface") or None
+
+    def build():
+        conn = get_connection(app.config["WG_STATS_PATH"], readonly=True)
+        history = peer_history(conn, public_key, start, end, points, interface)
+        return {"peer": public_key, "from": start, "to": end, **history}
+
+    version = (
+        db_signature(app.config["WG_STATS_PATH"]),
+        public_key,
+        interface,
+        start,
+        end,
+        points,
+    )
+    try:
+        return conditional_json(version, WG_STATS_MAX_AGE, build)
+    except sqlite3.Error as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/ovpn")
 @login_required
 def ovpn():
@@ -1706,10 +1303,12 @@ def ovpn():
         total_received, total_sent = 0, 0
         errors = []
 
-        for file_path, protocol in LOG_FILES:
-            file_data, received, sent, error = read_csv(file_path, protocol)
+        rates = get_ovpn_rates()
+        # Экземпляры OpenVPN разбираются параллельно (см. ovpn_status.read_all)
+        for status in read_all(get_status_sources()):
+            file_data, received, sent, error = read_csv(status, rates)
             if error:
-                errors.append(f"Ошибка в файле {file_path}: {error}")
+                errors.append(f"Ошибка в файле {status.path}: {error}")
             else:
                 clients.extend(file_data)
                 total_received += received
@@ -1727,13 +1326,14 @@ def ovpn():
         elif sort_by == "localIp":
             clients.sort(key=lambda x: x[2], reverse=reverse_order)
         elif sort_by == "sent":
-            clients.sort(key=lambda x: parse_bytes(x[3]), reverse=reverse_order)
+            # Столбец «Передано» — байты, принятые сервером от клиента (x[3])
+            clients.sort(key=lambda x: x[10], reverse=reverse_order)
         elif sort_by == "received":
-            clients.sort(key=lambda x: parse_bytes(x[4]), reverse=reverse_order)
+            clients.sort(key=lambda x: x[11], reverse=reverse_order)
         elif sort_by == "connection-time":
-            clients.sort(key=lambda x: x[7], reverse=reverse_order)
+            clients.sort(key=lambda x: x[12], reverse=reverse_order)
         elif sort_by == "duration":
-            clients.sort(key=lambda x: x[7], reverse=reverse_order)
+            clients.sort(key=lambda x: x[12], reverse=not reverse_order)
         elif sort_by == "protocol":
             clients.sort(key=lambda x: x[9], reverse=reverse_order)
 
@@ -1765,29 +1365,231 @@ def ovpn():
         return render_template("ovpn.html", error_message=error_message), 500
 
 
-@app.route("/ovpn/history")
+OVPN_CLIENT_FIELDS = (
+    "name",
+    "real_address",
+    "virtual_address",
+    "bytes_received",
+    "bytes_sent",
+    "rx_rate",
+    "tx_rate",
+    "connected_since",
+    "protocol",
+    "instance",
+)
+# Числовые поля; остальные поля клиента — строки
+OVPN_CLIENT_NUMERIC_FIELDS = {"bytes_received", "bytes_sent", "rx_rate", "tx_rate", "connected_since"}
+OVPN_CLIENTS_DEFAULT_LIMIT = 100
+OVPN_CLIENTS_MAX_LIMIT = 1000
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def is_cursor_value(value, numeric):
+    if numeric:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, str)
+
+
+def decode_cursor(cursor, sort_by):
+    """
+    Ключ сортировки (поле sort_by, name, real_address, connected_since) из
+    курсора. ValueError, если типы значений не совпадают с ключом: иначе
+    сравнение в bisect бросило бы TypeError.
+    """
+    key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii"))))
+    numeric = (sort_by in OVPN_CLIENT_NUMERIC_FIELDS, False, False, True)
+    if len(key) != len(numeric) or not all(map(is_cursor_value, key, numeric)):
+        raise ValueError("курсор не соответствует полю сортировки")
+    return key
+
+
+def get_ovpn_clients(statuses=None):
+    """Клиенты OpenVPN из снимков статус-файлов с числовыми полями и скоростями."""
+    if statuses is None:
+        statuses = read_all(get_status_sources())
+    rates = get_ovpn_rates()
+    clients = []
+    for status in statuses:
+        for client in status.clients:
+            if client.name == "UNDEF":
+                continue
+            rate = rates.get(
+                (client.name, client.real_address, client.connected_since_epoch), {}
+            )
+            clients.append(
+                {
+                    "name": client.name,
+                    "real_address": client.real_address,
+                    "virtual_address": client.virtual_address,
+                    "bytes_received": client.bytes_received,
+                    "bytes_sent": client.bytes_sent,
+                    "rx_rate": round(rate.get("rx_rate", 0.0), 1),
+                    "tx_rate": round(rate.get("tx_rate", 0.0), 1),
+                    "connected_since": client.connected_since_epoch,
+                    "protocol": client.protocol,
+                    "instance": client.instance,
+                }
+            )
+    return clients, [status.version for status in statuses]
+
+
+@app.route("/api/ovpn/clients")
 @login_required
-def ovpn_history():
+def api_ovpn_clients():
+    """
+    Клиенты OpenVPN: ?sort=<поле>&order=asc|desc, ?name= и ?ip= (фильтр по
+    префиксу), ?fields=a,b (проекция), ?limit=, постранично через ?cursor=
+    (из next_cursor предыдущего ответа) или ?offset=.
+    """
+    sort_by = request.args.get("sort", "name")
+    if sort_by not in OVPN_CLIENT_FIELDS:
+        return jsonify({"error": f"Недопустимое поле сортировки: {sort_by}"}), 400
+    descending = request.args.get("order", "asc") == "desc"
+    fields = [
+        f for f in request.args.get("fields", "").split(",") if f in OVPN_CLIENT_FIELDS
+    ] or list(OVPN_CLIENT_FIELDS)
     try:
-        logs = []
-        conn_logs = sqlite3.connect(app.config["LOGS_DATABASE_PATH"])
-        logs_reader = conn_logs.execute("SELECT * from connection_logs").fetchall()
-        conn_logs.close()
+        limit = min(
+            int(request.args.get("limit", OVPN_CLIENTS_DEFAULT_LIMIT)),
+            OVPN_CLIENTS_MAX_LIMIT,
+        )
+        offset = int(request.args.get("offset", 0))
+        cursor = request.args.get("cursor")
+        cursor_key = decode_cursor(cursor, sort_by) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({"error": "Некорректные параметры постраничного вывода"}), 400
+    if limit <= 0 or offset < 0:
+        return jsonify({"error": "Некорректные параметры постраничного вывода"}), 400
+
+    clients, versions = get_ovpn_clients()
+
+    name_prefix = request.args.get("name", "").lower()
+    ip_prefix = request.args.get("ip", "")
+    if name_prefix:
+        clients = [c for c in clients if c["name"].lower().startswith(name_prefix)]
+    if ip_prefix:
+        clients = [
+            c
+            for c in clients
+            if c["real_address"].startswith(ip_prefix)
+            or c["virtual_address"].startswith(ip_prefix)
+        ]
 
-        logs = sorted(
-            [
+    # Ключ с уникальным хвостом, чтобы курсор однозначно задавал позицию
+    def sort_key(c):
+        return (c[sort_by], c["name"], c["real_address"], c["connected_since"])
+
+    clients.sort(key=sort_key)
+    if cursor_key is not None:
+        keys = [sort_key(c) for c in clients]
+        if descending:
+            end = bisect_left(keys, cursor_key)
+            page = clients[max(0, end - limit):end][::-1]
+            has_more = end - limit > 0
+        else:
+            start = bisect_right(keys, cursor_key)
+            page = clients[start:start + limit]
+            has_more = start + limit < len(clients)
+    else:
+        if descending:
+            clients.reverse()
+        page = clients[offset:offset + limit]
+        has_more = offset + limit < len(clients)
+
+    return jsonify(
+        {
+            "clients": [
                 {
-                    "client_name": row[1],
-                    "real_ip": mask_ip(row[3]),
-                    "local_ip": row[2],
-                    "connection_since": row[4],
-                    "protocol": row[7],
+                    f: mask_ip(c[f]) if f == "real_address" else c[f]
+                    for f in fields
                 }
-                for row in logs_reader
+                for c in page
             ],
-            key=lambda x: x["connection_since"],
-            reverse=True,  # Сортировка по убыванию
-        )
+            "total": len(clients),
+            "version": versions,
+            "next_cursor": encode_cursor(sort_key(page[-1])) if page and has_more else None,
+        }
+    )
+
+
+# ---------Server-Sent Events----------
+def system_channel(known):
+    """Канал system: снимок сборщика, версия — его номер."""
+    info = get_system_info()
+    if not info or info["version"] == known:
+        return None
+    return info["version"], info
+
+
+def ovpn_channel(known):
+    """Канал ovpn: клиенты всех экземпляров, версия — версии снимков статуса."""
+    statuses = read_all(get_status_sources())
+    versions = tuple(status.version for status in statuses)
+    if versions == known:
+        return None
+    clients, _ = get_ovpn_clients(statuses)
+    for client in clients:
+        client["real_address"] = mask_ip(client["real_address"])
+    return versions, clients
+
+
+def wg_channel(known):
+    """Канал wg: таблица пиров; снимок сравнивается так же, как ETag /api/wg/stats."""
+    snapshot = get_wireguard_stats()
+    version = wg_stats_version(snapshot)
+    if version == known:
+        return None
+    return version, parse_wireguard_output(snapshot)
+
+
+stream_hub.register("system", system_channel)
+stream_hub.register("ovpn", ovpn_channel)
+stream_hub.register("wg", wg_channel)
+
+
+@app.route("/api/stream")
+@login_required
+def api_stream():
+    """
+    Поток обновлений (text/event-stream): ?channels=system,ovpn,wg. Событие
+    приходит только при изменении снимка канала.
+    """
+    channels = request.args.get("channels", "system").split(",")
+    return Response(
+        stream_with_context(stream_hub.subscribe(channels)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/ovpn/history")
+@login_required
+def ovpn_history():
+    try:
+        logs = []
+        conn_logs = get_connection(app.config["LOGS_DATABASE_PATH"], readonly=True)
+        has_archive = conn_logs.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'connection_logs_archive'"
+        ).fetchone()
+        # Архив содержит записи, вытесненные из connection_logs при ротации
+        logs_reader = conn_logs.execute(
+            CONNECTION_HISTORY if has_archive else CONNECTION_HISTORY_LIVE,
+            (app.config["HISTORY_DISPLAY_LIMIT"],),
+        ).fetchall()
+
+        logs = [
+            {
+                "client_name": row[1],
+                "real_ip": mask_ip(row[3]),
+                "local_ip": row[2],
+                "connection_since": row[4],
+                "protocol": row[7],
+            }
+            for row in logs_reader
+        ]
 
         return render_template(
             "ovpn_history.html",
@@ -1827,18 +1629,9 @@ def ovpn_stats():
         month_stats = {}
         total_received, total_sent = 0, 0
 
-        with sqlite3.connect(app.config["LOGS_DATABASE_PATH"]) as conn:
+        with get_connection(app.config["LOGS_DATABASE_PATH"], readonly=True) as conn:
             for month in [current_month, previous_month]:
-                query = f"""
-                    SELECT client_name,
-                           SUM(total_bytes_sent),
-                           SUM(total_bytes_received),
-                           MAX(last_connected)
-                    FROM monthly_stats
-                    WHERE month = ?
-                    GROUP BY client_name
-                    ORDER BY {sort_column} {order}
-                """
+                query = MONTHLY_STATS_BY_MONTH.format(sort_column=sort_column, order=order)
                 rows = conn.execute(query, (month,)).fetchall()
 
                 if rows:
@@ -1880,18 +1673,14 @@ def api_bw():
     period = request.args.get("period", "day")
     vnstat_bin = os.environ.get("VNSTAT_BIN", "/usr/bin/vnstat")
 
-    # Получаем список интерфейсов
-    try:
-        proc = subprocess.run(
-            [vnstat_bin, "--json"], check=True, capture_output=True, text=True
-        )
-        data = json.loads(proc.stdout)
-        interfaces = [iface["name"] for iface in data.get("interfaces", [])]
-    except subprocess.CalledProcessError:
-        interfaces = []
-    except json.JSONDecodeError:
-        interfaces = []
+    # Ответ зависит только от базы vnstat: пока она не изменилась, vnstat не вызывается
+    signature = file_signature(VNSTAT_DB_PATH)
+    version = ("bw", q_iface, period, signature) if signature else None
+    response = not_modified(version, VNSTAT_MAX_AGE)
+    if response is not None:
+        return response
 
+    interfaces = get_vnstat_interfaces()
     if not interfaces:
         return jsonify({"error": "Нет интерфейсов vnstat", "iface": None}), 500
 
@@ -2003,22 +1792,41 @@ def api_bw():
 
     server_time_utc = datetime.now(timezone.utc).isoformat()
 
-    return jsonify(
-        {
+    return conditional_json(
+        version,
+        VNSTAT_MAX_AGE,
+        lambda: {
             "iface": iface,
             "labels": labels,
             "utc_labels": utc_labels,
             "rx_mbps": rx_mbps,
             "tx_mbps": tx_mbps,
             "server_time": server_time_utc,
-        }
+        },
     )
 
 
+def get_vnstat_interfaces():
+    """Интерфейсы, которые ведёт vnstat."""
+    vnstat_bin = os.environ.get("VNSTAT_BIN", "/usr/bin/vnstat")
+    try:
+        proc = subprocess.run(
+            [vnstat_bin, "--json"], check=True, capture_output=True, text=True
+        )
+        data = json.loads(proc.stdout)
+        return [iface["name"] for iface in data.get("interfaces", [])]
+    except (OSError, subprocess.CalledProcessError, json.JSONDecodeError):
+        return []
+
+
 @app.route("/api/interfaces")
 def api_interfaces():
-    interfaces = get_vnstat_interfaces()
-    return jsonify({"interfaces": interfaces})
+    signature = file_signature(VNSTAT_DB_PATH)
+    return conditional_json(
+        ("interfaces", signature) if signature else None,
+        VNSTAT_MAX_AGE,
+        lambda: {"interfaces": get_vnstat_interfaces()},
+    )
 
 @app.route("/api/cpu")
 def api_cpu():
@@ -2036,17 +1844,26 @@ def api_cpu():
     }
     max_points = targets.get(period, LIVE_POINTS)
 
-    mem_rows = list(cpu_history)
-
     # ----------------- LIVE -----------------
     if period == "live":
-        # просто последние N точек без группировки
-        last = mem_rows[-LIVE_POINTS:] if len(mem_rows) > LIVE_POINTS else mem_rows
-
-        data = [
-            {"timestamp": r["timestamp"], "cpu": r["cpu"], "ram": r["ram"]}
-            for r in last
-        ]
+        # просто последние N точек без группировки, сразу из столбцов
+        series = get_cpu_series(LIVE_POINTS)
+        # Ряд пополняется раз в HISTORY_INTERVAL: версия — время последней точки
+        timestamps = series["timestamp"]
+        version = ("live", timestamps[-1] if timestamps else None, len(timestamps))
+        return conditional_json(
+            version,
+            HISTORY_INTERVAL,
+            lambda: {
+                "utc_labels": [
+                    datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    for ts in timestamps
+                ],
+                "cpu_percent": [round(v, 2) for v in series["cpu"]],
+                "ram_percent": [round(v, 2) for v in series["ram"]],
+                "period": period,
+            },
+        )
 
     # ----------------- Остальные периоды -----------------
     else:
@@ -2067,62 +1884,60 @@ def api_cpu():
             bucket = "minute"
             cutoff = now - timedelta(hours=1)
 
-        mem_candidates = [
-            r for r in mem_rows if r["timestamp"] >= cutoff
-        ]  # Данные из памяти за период
-        need_db = True  # Если данных в памяти недостаточно, берём из БД
-        if need_db:
-            try:
-                conn = sqlite3.connect(app.config["SYSTEM_STATS_PATH"])
-                cur = conn.cursor()
-
-                cur.execute(
-                    """
-                    SELECT timestamp, cpu_percent, ram_percent
-                    FROM system_stats
-                    WHERE timestamp >= ?
-                    ORDER BY timestamp ASC
-                """,
-                    (cutoff.strftime("%Y-%m-%d %H:%M:%S"),),
-                )
-
-                rows = cur.fetchall()
-                conn.close()
-
-                source_rows = [
-                    {
-                        "timestamp": datetime.strptime(ts, "%Y-%m-%d %H:%M:%S"),
-                        "cpu": cpu,
-                        "ram": ram,
-                    }
-                    for ts, cpu, ram in rows
-                ]
+        # Агрегаты меняются только при записи сборщика в базу и смене первого
+        # интервала среза; пока ни то ни другое не произошло, запрос не выполняется
+        signature = db_signature(app.config["SYSTEM_STATS_PATH"])
+        version = None
+        if signature is not None:
+            version = (period, signature, bucket_start(cutoff.timestamp(), bucket))
+        response = not_modified(version, DB_SAVE_INTERVAL)
+        if response is not None:
+            return response
 
-            except Exception as e:
-                print("[DB ERROR] api_cpu:", e)
-                source_rows = mem_candidates
-        else:
-            source_rows = mem_candidates
+        try:
+            # Готовые агрегаты нужного разрешения, без разбора сырых записей
+            table = ROLLUP_TABLES[bucket][0]
+            conn = get_connection(app.config["SYSTEM_STATS_PATH"], readonly=True)
+            cur = conn.cursor()
+            cur.execute(
+                SYSTEM_ROLLUP_SERIES.format(table=table),
+                (bucket_start(cutoff.timestamp(), bucket),),
+            )
+            rows = cur.fetchall()
 
-        # Группировка по bucket (minute/hour/day)
-        grouped = group_rows(source_rows, interval=bucket)
-        data = resample_to_n(grouped, max_points)
+            data = resample_to_n(
+                [
+                    {"timestamp": datetime.fromtimestamp(ts), "cpu": cpu, "ram": ram}
+                    for ts, cpu, ram in rows
+                ],
+                max_points,
+            )
+        except Exception as e:
+            print("[DB ERROR] api_cpu:", e)
+            # Данные из памяти за период; от базы они не зависят — без ETag
+            version = None
+            grouped = group_rows(get_cpu_history(since=cutoff), interval=bucket)
+            data = resample_to_n(grouped, max_points)
 
     utc_labels = [
         d["timestamp"].astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
         for d in data
     ]
 
-    return jsonify(
-        {
+    return conditional_json(
+        version,
+        DB_SAVE_INTERVAL,
+        lambda: {
             "utc_labels": utc_labels,
             "cpu_percent": [round(d["cpu"], 2) for d in data],
             "ram_percent": [round(d["ram"], 2) for d in data],
             "period": period,
-        }
+        },
     )
 
 
 if __name__ == "__main__":
     add_admin()
+    # Без supervisor сборщик метрик работает в потоках этого процесса
+    start_in_background()
     app.run(debug=False, host="0.0.0.0", port=1234)
\ No newline at end of file
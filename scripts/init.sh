@@ -21,6 +21,8 @@ HTTPS_LE_DIR="$HTTPS_DIR/letsencrypt"
 DEFAULT_PORT=1234
 ENV_FILE="$ROOT_DIR/src/data/.env"
 SERVICE_FILE="/etc/supervisord.conf"
+# gthread: поток на соединение, чтобы открытые /api/stream не занимали воркеры целиком
+GUNICORN_OPTS="-w 4 -k gthread --threads 32"
 VNSTAT_CONF_FILE="/etc/vnstat.conf"
 NEW_DATABASE_DIR="$DB_DIR/vnstat"
 
@@ -74,7 +76,7 @@ update_service_ip() {
         flask_port=$DEFAULT_PORT
     fi
     if [[ -f "$SERVICE_FILE" ]]; then
-        sed -i "s|command=gunicorn -w 4 main:app -b .*:[0-9]*|command=gunicorn -w 4 main:app -b $new_ip:$flask_port|" "$SERVICE_FILE"
+        sed -i "s|command=gunicorn .*main:app -b .*:[0-9]*|command=gunicorn $GUNICORN_OPTS main:app -b $new_ip:$flask_port|" "$SERVICE_FILE"
         echo -e "${GREEN}Привязка сервиса обновлена $new_ip:$flask_port${RESET}"
     fi
 }
@@ -355,7 +357,7 @@ chmod=0700
 serverurl=unix:///var/run/supervisor.sock
 
 [program:gunicorn]
-command=gunicorn -w 4 main:app -b $GUNICORN_BIND
+command=gunicorn $GUNICORN_OPTS main:app -b $GUNICORN_BIND
 directory=$ROOT_DIR
 autostart=true
 autorestart=true
@@ -366,8 +368,21 @@ stderr_logfile_maxbytes=10MB
 stdout_logfile_backups=5
 stderr_logfile_backups=5
 
+[program:collector]
+command=/usr/local/bin/python $ROOT_DIR/src/collector.py
+directory=$ROOT_DIR/src
+autostart=true
+autorestart=true
+priority=10
+stdout_logfile=$LOGS_DIR/collector.stdout.log
+stderr_logfile=$LOGS_DIR/collector.stderr.log
+stdout_logfile_maxbytes=10MB
+stderr_logfile_maxbytes=10MB
+stdout_logfile_backups=5
+stderr_logfile_backups=5
+
 [program:logs]
-command=/bin/sh -c "sleep 30 && while true; do /usr/local/bin/python $ROOT_DIR/src/logs.py; sleep 30; done"
+command=/usr/local/bin/python $ROOT_DIR/src/logs.py --watch
 directory=$ROOT_DIR/src
 autostart=true
 autorestart=true
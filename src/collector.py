@@ -0,0 +1,488 @@
+"""
+Сборщик системных метрик.
+
+Запускается отдельной программой supervisor и единолично отвечает за опрос
+psutil, историю загрузки ЦП/ОЗУ, запись средних значений в system_stats.db
+и скорости клиентов OpenVPN (см. ovpn_rates).
+Воркеры gunicorn не опрашивают систему сами, а получают готовый снимок
+через локальный Unix-сокет (см. collector_request).
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from datetime import datetime, timedelta
+from statistics import mean
+from typing import NamedTuple
+
+import psutil
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from src.config import Config
+from src.db import get_connection
+from src.migrations import migrate
+from src.ovpn_rates import RateTracker
+from src.ovpn_management import ManagementSource
+from src.ovpn_sources import get_status_sources
+from src.ovpn_status import (
+    is_management,
+    local_sources,
+    read_all,
+    read_status,
+    register_source,
+    status_to_dict,
+)
+from src.queries import SYSTEM_STATS_CLEAN
+from src.timeseries import TimeSeries
+
+SOCKET_PATH = Config.COLLECTOR_SOCKET
+SYSTEM_STATS_PATH = Config.SYSTEM_STATS_PATH
+
+SAMPLE_INTERVAL = Config.SAMPLE_INTERVAL  # период обновления снимка, секунды
+HISTORY_INTERVAL = 10  # точка в историю ЦП/ОЗУ раз в 10 секунд
+DB_SAVE_INTERVAL = 300  # запись в БД каждые 5 минут
+MAX_HISTORY_SECONDS = 7 * 24 * 3600  # сколько секунд хранить в памяти
+REQUEST_TIMEOUT = 2  # таймаут обращения воркера к сборщику
+RAW_RETENTION_DAYS = 7
+
+# Агрегаты system_stats: таблица -> срок хранения в днях
+ROLLUP_TABLES = {
+    "minute": ("system_stats_minute", 7),
+    "hour": ("system_stats_hour", 90),
+    "day": ("system_stats_day", 730),
+}
+
+# Состояние сборщика (существует только в процессе сборщика)
+system_snapshot = None
+last_rollup_timestamp = 0.0
+ovpn_rates = RateTracker()
+cpu_history = TimeSeries(
+    MAX_HISTORY_SECONDS // HISTORY_INTERVAL + 1,
+    fields=("cpu", "ram"),
+    max_age=MAX_HISTORY_SECONDS,
+)
+
+
+# ---------Сбор метрик----------
+def format_bytes(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
+
+
+ROUTE_PATH = "/proc/net/route"
+UPTIME_PATH = "/proc/uptime"
+RTF_UP = 0x0001
+SKIPPED_INTERFACES = ("lo", "docker", "veth", "br-")
+
+
+def get_default_interface():
+    """Интерфейс маршрута по умолчанию из /proc/net/route."""
+    try:
+        with open(ROUTE_PATH, "r", encoding="utf-8") as f:
+            next(f, None)  # заголовок
+            for line in f:
+                fields = line.split()
+                # Iface, Destination, Gateway, Flags, ...
+                if (
+                    len(fields) > 3
+                    and fields[1] == "00000000"
+                    and int(fields[3], 16) & RTF_UP
+                ):
+                    return fields[0]
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}")
+    return None
+
+
+def get_uptime_seconds():
+    """Время работы системы в секундах из /proc/uptime."""
+    try:
+        with open(UPTIME_PATH, "r", encoding="utf-8") as f:
+            return int(float(f.read().split()[0]))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def split_uptime(seconds):
+    minutes = seconds // 60
+    years, minutes = divmod(minutes, 365 * 24 * 60)
+    weeks, minutes = divmod(minutes, 7 * 24 * 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    return years, weeks, days, hours, minutes
+
+
+def format_uptime_seconds(seconds):
+    """Время работы в виде "1 г. 2 нед. 3 дн. 4 ч. 5 мин."."""
+    years, weeks, days, hours, minutes = split_uptime(seconds)
+    result = []
+    if years > 0:
+        result.append(f"{years} г.")
+    if weeks > 0:
+        result.append(f"{weeks} нед.")
+    if days > 0:
+        result.append(f"{days} дн.")
+    if hours > 0:
+        result.append(f"{hours} ч.")
+    if minutes > 0:
+        result.append(f"{minutes} мин.")
+    return " ".join(result)
+
+
+def count_online_clients(file_paths):
+    results = {}
+
+    # Подсчёт OpenVPN по общему снимку статус-файлов
+    results["OpenVPN"] = sum(len(status.clients) for status in read_all(file_paths))
+    return results
+
+
+class SystemSnapshot(NamedTuple):
+    """Опубликованный снимок; после публикации не изменяется."""
+
+    version: int
+    timestamp: float
+    cpu_load: float
+    memory_used: int
+    memory_total: int
+    memory_percent: float
+    disk_used: int
+    disk_total: int
+    network_load: dict
+    uptime: str
+    network_interface: str
+    rx_bytes: object
+    tx_bytes: object
+    vpn_clients: dict
+
+
+class Sampler:
+    """
+    Опрос системы без пауз: загрузка ЦП и скорости сети считаются по разнице
+    с предыдущим опросом, а не через sleep между двумя замерами.
+    """
+
+    def __init__(self):
+        self.version = 0
+        # Первый вызов cpu_percent(None) только запоминает точку отсчёта
+        psutil.cpu_percent(interval=None)
+        self.prev_net = psutil.net_io_counters(pernic=True)
+        self.prev_time = time.monotonic()
+
+    def network_load(self, net_io, elapsed):
+        network_data = {}
+        for interface, counters in net_io.items():
+            prev = self.prev_net.get(interface)
+            if prev is None or interface.startswith(SKIPPED_INTERFACES):
+                continue
+
+            sent_speed = (counters.bytes_sent - prev.bytes_sent) * 8 / 1e6 / elapsed
+            recv_speed = (counters.bytes_recv - prev.bytes_recv) * 8 / 1e6 / elapsed
+
+            if sent_speed > 0 or recv_speed > 0:
+                network_data[interface] = {
+                    "sent_speed": round(sent_speed, 2),
+                    "recv_speed": round(recv_speed, 2),
+                }
+        return network_data
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = max(now - self.prev_time, 1e-6)
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage("/")
+        net_io = psutil.net_io_counters(pernic=True)
+        network_load = self.network_load(net_io, elapsed)
+        self.prev_net, self.prev_time = net_io, now
+
+        interface = get_default_interface()
+        # Проверяем, чтобы интерфейс не начинался с lo, docker, veth, br-
+        if interface and not interface.startswith(SKIPPED_INTERFACES):
+            counters = net_io.get(interface)
+        else:
+            counters = None
+
+        uptime_seconds = get_uptime_seconds()
+        self.version += 1
+        return SystemSnapshot(
+            version=self.version,
+            timestamp=time.time(),
+            cpu_load=cpu_percent,
+            memory_used=memory.used // (1024**2),
+            memory_total=memory.total // (1024**2),
+            memory_percent=memory.percent,
+            disk_used=disk.used // (1024**3),
+            disk_total=disk.total // (1024**3),
+            network_load=network_load,
+            uptime=(
+                format_uptime_seconds(uptime_seconds)
+                if uptime_seconds is not None
+                else "Не удалось получить время работы"
+            ),
+            network_interface=interface or "Не найдено",
+            rx_bytes=format_bytes(counters.bytes_recv) if counters else 0,
+            tx_bytes=format_bytes(counters.bytes_sent) if counters else 0,
+            vpn_clients=count_online_clients(get_status_sources()),
+        )
+
+
+def record_history(snapshot):
+    """Добавляет точку в историю загрузки ЦП/ОЗУ."""
+    cpu_history.append(snapshot.timestamp, snapshot.cpu_load, snapshot.memory_percent)
+
+
+# ---------Запись в БД----------
+def bucket_start(timestamp, interval):
+    """Начало интервала (минута/час/сутки по местному времени) в секундах эпохи."""
+    if interval == "minute":
+        return int(timestamp // 60 * 60)
+    dt = datetime.fromtimestamp(timestamp).replace(minute=0, second=0, microsecond=0)
+    if interval == "day":
+        dt = dt.replace(hour=0)
+    return int(dt.timestamp())
+
+
+def ensure_db():
+    """Применяет новые миграции system_stats.db: таблицы, агрегаты, индексы."""
+    migrate(get_connection(SYSTEM_STATS_PATH), "system")
+
+
+def update_rollups(cur, points):
+    """Добавляет точки (timestamp, cpu, ram) в таблицы агрегатов."""
+    for interval, (table, _) in ROLLUP_TABLES.items():
+        buckets = {}
+        for ts, cpu, ram in points:
+            key = bucket_start(ts, interval)
+            b = buckets.get(key)
+            if b is None:
+                buckets[key] = [1, cpu, cpu, cpu, ram, ram, ram]
+            else:
+                b[0] += 1
+                b[1] += cpu
+                b[2] = min(b[2], cpu)
+                b[3] = max(b[3], cpu)
+                b[4] += ram
+                b[5] = min(b[5], ram)
+                b[6] = max(b[6], ram)
+
+        cur.executemany(
+            f"""
+            INSERT INTO {table}
+                (bucket, samples, cpu_sum, cpu_min, cpu_max, ram_sum, ram_min, ram_max)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(bucket) DO UPDATE SET
+                samples = samples + excluded.samples,
+                cpu_sum = cpu_sum + excluded.cpu_sum,
+                cpu_min = MIN(cpu_min, excluded.cpu_min),
+                cpu_max = MAX(cpu_max, excluded.cpu_max),
+                ram_sum = ram_sum + excluded.ram_sum,
+                ram_min = MIN(ram_min, excluded.ram_min),
+                ram_max = MAX(ram_max, excluded.ram_max)
+            """,
+            [(key, *values) for key, values in buckets.items()],
+        )
+
+
+def save_minute_average_to_db():
+    """
+    Сохраняет средние значения CPU и RAM за последний интервал в БД и
+    добавляет новые точки истории в агрегаты.
+    """
+    global last_rollup_timestamp
+
+    now = datetime.now()
+    cutoff = now - timedelta(seconds=DB_SAVE_INTERVAL)
+    to_avg = cpu_history.range(since=cutoff.timestamp())
+    # Точки, ещё не попавшие в агрегаты
+    fresh = cpu_history.range(since=last_rollup_timestamp)
+    if not to_avg["timestamp"]:
+        return
+    cpu_avg = mean(to_avg["cpu"])
+    ram_avg = mean(to_avg["ram"])
+
+    try:
+        conn = get_connection(SYSTEM_STATS_PATH)
+        with conn:
+            write_minute_average(conn.cursor(), now, cpu_avg, ram_avg, fresh)
+        if fresh["timestamp"]:
+            # bisect_left включает границу, поэтому сдвигаем отметку чуть вперёд
+            last_rollup_timestamp = fresh["timestamp"][-1] + 1e-3
+    except Exception as e:
+        print("[DB ERROR] save_minute_average_to_db:", e)
+
+
+def write_minute_average(cur, now, cpu_avg, ram_avg, fresh):
+    # записываем timestamp = now (local)
+    cur.execute(
+        "INSERT INTO system_stats (timestamp, cpu_percent, ram_percent) VALUES (?, ?, ?)",
+        (now.strftime("%Y-%m-%d %H:%M:%S"), round(cpu_avg, 3), round(ram_avg, 3)),
+    )
+    update_rollups(cur, list(zip(fresh["timestamp"], fresh["cpu"], fresh["ram"])))
+
+    # Очищаем устаревшие записи: сырые старше 7 дней, агрегаты по своим срокам
+    cutoff_db = now - timedelta(days=RAW_RETENTION_DAYS)
+    cur.execute(SYSTEM_STATS_CLEAN, (cutoff_db.strftime("%Y-%m-%d %H:%M:%S"),))
+    for table, days in ROLLUP_TABLES.values():
+        cur.execute(
+            f"DELETE FROM {table} WHERE bucket < ?",
+            (int((now - timedelta(days=days)).timestamp()),),
+        )
+
+
+def update_system_info_loop():
+    """
+    Единственный цикл опроса: снимок раз в SAMPLE_INTERVAL, точка истории раз
+    в HISTORY_INTERVAL, среднее в БД раз в DB_SAVE_INTERVAL.
+    """
+    global system_snapshot
+
+    ensure_db()
+    sampler = Sampler()
+    last_history = last_db_save = time.monotonic()
+    next_tick = time.monotonic() + SAMPLE_INTERVAL
+
+    while True:
+        time.sleep(max(0, next_tick - time.monotonic()))
+        next_tick += SAMPLE_INTERVAL
+        started = time.monotonic()
+        if started > next_tick:
+            # Опрос отстал (например, после приостановки) — не догоняем пачкой
+            next_tick = started + SAMPLE_INTERVAL
+
+        try:
+            # Публикация — одно присваивание: читатели видят старый или новый снимок
+            system_snapshot = sampler.sample()
+        except Exception as e:
+            print("[COLLECTOR ERROR] sample:", e)
+            continue
+
+        try:
+            # Снимки кэшированы: трекер получает только новые поколения файлов
+            for status in read_all(get_status_sources()):
+                ovpn_rates.update(status)
+        except Exception as e:
+            print("[COLLECTOR ERROR] ovpn_rates:", e)
+
+        if started - last_history >= HISTORY_INTERVAL:
+            record_history(system_snapshot)
+            last_history = started
+
+        if started - last_db_save >= DB_SAVE_INTERVAL:
+            save_minute_average_to_db()
+            last_db_save = started
+
+
+# ---------Unix-сокет----------
+def get_cpu_history(limit=None, since=None):
+    """История по столбцам: {"timestamp": [...], "cpu": [...], "ram": [...]}."""
+    return cpu_history.range(since=since, limit=limit)
+
+
+def handle_command(command, args):
+    if command == "system_info":
+        snapshot = system_snapshot
+        return snapshot._asdict() if snapshot else None
+    if command == "ovpn_status":
+        # ovpn_status <источник> [известная версия]
+        path = args[0]
+        known = int(args[1]) if len(args) > 1 else 0
+        if path not in local_sources:
+            return {"error": f"Источник не обслуживается сборщиком: {path}"}
+        status = read_status(path)
+        if status.version == known:
+            return {"unchanged": True}
+        return status_to_dict(status)
+    if command == "ovpn_rates":
+        return ovpn_rates.rates(history="history" in args)
+    if command == "cpu_history":
+        # cpu_history [limit] [since]; 0 означает «без ограничения»
+        limit = int(args[0]) if args else 0
+        since = float(args[1]) if len(args) > 1 else None
+        return get_cpu_history(limit or None, since)
+    return {"error": f"Неизвестная команда: {command}"}
+
+
+class CollectorRequestHandler(socketserver.StreamRequestHandler):
+    """Одна строка запроса (команда и аргументы через пробел) -> один JSON-ответ."""
+
+    def handle(self):
+        line = self.rfile.readline().decode("utf-8").strip()
+        if not line:
+            return
+        command, *args = line.split()
+        try:
+            response = handle_command(command, args)
+        except Exception as e:
+            response = {"error": str(e)}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+
+
+class CollectorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=SOCKET_PATH):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = CollectorServer(socket_path, CollectorRequestHandler)
+    os.chmod(socket_path, 0o600)
+    server.serve_forever()
+
+
+def start_management_sources():
+    """Подключается к management-интерфейсам OpenVPN из списка источников."""
+    for path, protocol in get_status_sources():
+        if is_management(path) and path not in local_sources:
+            register_source(
+                path,
+                ManagementSource(path, protocol, Config.OVPN_MANAGEMENT_PASSWORD).start(),
+            )
+
+
+def start_in_background(socket_path=SOCKET_PATH):
+    """Запускает сборщик в потоках текущего процесса (режим python main.py)."""
+    start_management_sources()
+    threading.Thread(target=update_system_info_loop, daemon=True).start()
+    threading.Thread(target=serve, args=(socket_path,), daemon=True).start()
+
+
+# ---------Клиент для воркеров----------
+def collector_request(command, *args, socket_path=SOCKET_PATH, timeout=REQUEST_TIMEOUT):
+    """Запрашивает данные у сборщика. Возвращает None, если сборщик недоступен."""
+    line = " ".join([command, *[str(arg) for arg in args]]) + "\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(line.encode("utf-8"))
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return json.loads(b"".join(chunks).decode("utf-8")) if chunks else None
+    except (OSError, ValueError) as e:
+        print(f"[COLLECTOR] {command}: {e}")
+        return None
+
+
+def main():
+    print("Сборщик системных метрик запущен!")
+    start_management_sources()
+    threading.Thread(target=update_system_info_loop, daemon=True).start()
+    serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,47 @@ class Config:
     LOGS_DATABASE_PATH = os.path.join(BASE_DIR, "data", "databases", "openvpn_logs.db")
     WG_STATS_PATH = os.path.join(BASE_DIR, "data", "databases", "wireguard_stats.db")
     SYSTEM_STATS_PATH = os.path.join(BASE_DIR, "data", "databases", "system_stats.db")
+    # DatabaseDir из /etc/vnstat.conf (см. scripts/init.sh)
+    VNSTAT_DB_DIR = os.environ.get("VNSTAT_DB_DIR") or os.path.join(BASE_DIR, "data", "databases", "vnstat")
     ENV_PATH = os.path.join(BASE_DIR, "data", ".env")
     SETTINGS_PATH = os.path.join(BASE_DIR, "data", "settings.json")
     LEGACY_ADMIN_INFO_PATH = os.path.join(BASE_DIR, "data", "telegram_admins.json")
+    # dump (утилита wg) | netlink (пакет pyroute2 из requirements.txt); если netlink
+    # недоступен, при первом чтении в журнал пишется причина и используется dump
+    WG_BACKEND = os.environ.get("WG_BACKEND") or "dump"
+    COLLECTOR_SOCKET = os.environ.get("COLLECTOR_SOCKET") or "/tmp/openvpn-status-collector.sock"
+    SAMPLE_INTERVAL = float(os.environ.get("SAMPLE_INTERVAL", 1))
+    STREAM_INTERVAL = float(os.environ.get("STREAM_INTERVAL", 2))  # опрос для /api/stream
     PERMANENT_SESSION_LIFETIME=timedelta(minutes=5)
     REMEMBER_COOKIE_DURATION = timedelta(days=30)
     SESSION_REFRESH_EACH_REQUEST = False
+    # История подключений OpenVPN: лимит по числу записей и/или возрасту (0 — без лимита).
+    # Вытесненные записи при CONNECTION_LOGS_ARCHIVE=1 переносятся в архив
+    CONNECTION_LOGS_MAX_ROWS = int(os.environ.get("CONNECTION_LOGS_MAX_ROWS", 100))
+    CONNECTION_LOGS_MAX_AGE_DAYS = int(os.environ.get("CONNECTION_LOGS_MAX_AGE_DAYS", 0))
+    CONNECTION_LOGS_ARCHIVE = os.environ.get("CONNECTION_LOGS_ARCHIVE", "0") == "1"
+    HISTORY_DISPLAY_LIMIT = int(os.environ.get("HISTORY_DISPLAY_LIMIT", 1000))
+    SERVER_IP = os.environ.get("SERVER_IP")  # если задан, внешний IP не запрашивается
+    EXTERNAL_IP_TTL = int(os.environ.get("EXTERNAL_IP_TTL", 3600))
+    OVPN_STATUS_FILE = "/etc/openvpn/server/logs/openvpn-status.log"
+    # management://host:port или management:///путь/к/сокету вместо статус-файла
+    OVPN_MANAGEMENT = os.environ.get("OVPN_MANAGEMENT")
+    OVPN_MANAGEMENT_PASSWORD = os.environ.get("OVPN_MANAGEMENT_PASSWORD")
     LOG_FILES = [
-        ("/etc/openvpn/server/logs/openvpn-status.log", "VPN-UDP"),
+        (OVPN_MANAGEMENT or OVPN_STATUS_FILE, "VPN-UDP"),
     ]
+    # Дополнительные экземпляры OpenVPN находятся по шаблону (пустое значение отключает)
+    OVPN_STATUS_GLOB = os.environ.get("OVPN_STATUS_GLOB", "/etc/openvpn/server/logs/*status*.log")
+    # Статус-файл того же экземпляра, который заменяет management-интерфейс: по шаблону
+    # он не подхватывается, иначе клиенты экземпляра считались бы дважды
+    OVPN_STATUS_EXCLUDE = (
+        [os.environ.get("OVPN_MANAGEMENT_STATUS_FILE") or OVPN_STATUS_FILE] if OVPN_MANAGEMENT else []
+    )
+    OVPN_STATUS_STALE_AFTER = int(os.environ.get("OVPN_STATUS_STALE_AFTER", 120))
+    # История трафика WireGuard: сколько дней хранить почасовой и посуточный ряды
+    # (помесячный хранится бессрочно)
+    WG_HISTORY_HOURLY_DAYS = int(os.environ.get("WG_HISTORY_HOURLY_DAYS", 14))
+    WG_HISTORY_DAILY_DAYS = int(os.environ.get("WG_HISTORY_DAILY_DAYS", 400))
 
 class DevelopmentConfig(Config):
     DEBUG = True
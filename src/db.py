@@ -0,0 +1,158 @@
+"""
+Общий доступ к базам SQLite.
+
+Соединения кэшируются на поток и процесс: get_connection повторно отдаёт
+открытое соединение, а после fork воркера gunicorn соединения родителя не
+используются. Все соединения настраиваются одинаково: WAL, synchronous=NORMAL,
+busy_timeout (писатель и читатели ждут блокировку, а не получают "database is
+locked"), mmap_size и кэш подготовленных выражений. Обработчики запросов
+открывают базы только для чтения.
+
+Время выполнения запросов накапливается в query_stats процесса; запросы
+дольше SLOW_QUERY_MS печатаются.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 64 * 1024 * 1024
+STATEMENT_CACHE = 256
+SLOW_QUERY_MS = 200
+MAX_TRACKED_QUERIES = 500
+
+
+class QueryStats:
+    """Число вызовов, суммарное и наибольшее время запросов по тексту SQL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = {}  # (база, SQL) -> [вызовы, сумма мс, максимум мс]
+
+    def record(self, database, sql, elapsed_ms):
+        key = (database, " ".join(sql.split()))
+        with self.lock:
+            entry = self.queries.get(key)
+            if entry is None:
+                if len(self.queries) >= MAX_TRACKED_QUERIES:
+                    return
+                entry = self.queries[key] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed_ms
+            entry[2] = max(entry[2], elapsed_ms)
+        if elapsed_ms >= SLOW_QUERY_MS:
+            print(f"[DB] Медленный запрос к {database} ({elapsed_ms:.0f} мс): {key[1][:200]}")
+
+    def report(self):
+        """Запросы процесса по убыванию суммарного времени."""
+        with self.lock:
+            items = list(self.queries.items())
+        return [
+            {
+                "database": database,
+                "sql": sql,
+                "calls": calls,
+                "total_ms": round(total, 2),
+                "avg_ms": round(total / calls, 3),
+                "max_ms": round(longest, 2),
+            }
+            for (database, sql), (calls, total, longest) in sorted(
+                items, key=lambda item: item[1][1], reverse=True
+            )
+        ]
+
+
+query_stats = QueryStats()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Курсор, записывающий время execute/executemany (для SELECT — до первой строки)."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.record(sql, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.record(sql, started)
+
+
+class TimedConnection(sqlite3.Connection):
+    database = ""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def record(self, sql, started):
+        query_stats.record(self.database, sql, (time.perf_counter() - started) * 1000)
+
+
+def open_connection(path, readonly=False, check_same_thread=True):
+    """Новое настроенное соединение; readonly — только чтение (mode=ro)."""
+    if readonly:
+        conn = sqlite3.connect(
+            f"file:{path}?mode=ro",
+            uri=True,
+            factory=TimedConnection,
+            cached_statements=STATEMENT_CACHE,
+            check_same_thread=check_same_thread,
+        )
+    else:
+        conn = sqlite3.connect(
+            path,
+            factory=TimedConnection,
+            cached_statements=STATEMENT_CACHE,
+            check_same_thread=check_same_thread,
+        )
+    conn.database = os.path.basename(path)
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
+    else:
+        # Режим WAL сохраняется в файле базы; читатели не мешают писателю
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+_local = threading.local()
+# Соединения, унаследованные через fork: закрывать их в дочернем процессе
+# нельзя (это сняло бы блокировки родителя), поэтому они лишь удерживаются
+_inherited = []
+
+
+def get_connection(path, readonly=False, row_factory=None):
+    """
+    Соединение текущего потока с базой path. Закрывать его не нужно;
+    запись — в блоке `with conn:`, чтобы транзакция не осталась открытой.
+    Для каждой row_factory — своё соединение: вызов с другой фабрикой не
+    меняет строки, которые возвращает уже полученное соединение.
+    """
+    if getattr(_local, "pid", None) != os.getpid():
+        # Соединения родительского процесса после fork не используются
+        if getattr(_local, "connections", None):
+            _inherited.append(_local.connections)
+        _local.pid = os.getpid()
+        _local.connections = {}
+    key = (path, readonly, row_factory)
+    conn = _local.connections.get(key)
+    if conn is None:
+        conn = _local.connections[key] = open_connection(path, readonly)
+        conn.row_factory = row_factory
+    return conn
+
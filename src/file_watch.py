@@ -0,0 +1,127 @@
+"""
+Отслеживание изменений файлов.
+
+FileWatcher ждёт изменения набора файлов через inotify (через ctypes, без
+сторонних зависимостей), а если inotify недоступен — опрашивает mtime.
+В обоих режимах изменение подтверждается сигнатурой файла
+(inode, mtime_ns, size), поэтому лишние события не приводят к повторной
+обработке неизменившихся файлов.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+SETTLE_DELAY = 0.2  # пауза, чтобы писатель успел дописать файл
+
+
+def file_signature(path):
+    """Сигнатура файла (inode, mtime_ns, size) или None, если файла нет."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _init_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, None
+    if fd < 0:
+        return None, None
+    return libc, fd
+
+
+class FileWatcher:
+    """Ожидание изменений файлов: inotify с откатом на опрос mtime."""
+
+    def __init__(self, paths, poll_interval=5):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.poll_interval = poll_interval
+        self.signatures = {path: None for path in self.paths}
+        self.libc, self.fd = _init_inotify()
+        self.watches = {}
+
+        if self.fd is not None:
+            # Следим за каталогами: статус-файл может пересоздаваться
+            for directory in {os.path.dirname(path) for path in self.paths}:
+                wd = self.libc.inotify_add_watch(
+                    self.fd, os.fsencode(directory), WATCH_MASK
+                )
+                if wd >= 0:
+                    self.watches[wd] = directory
+            if not self.watches:
+                os.close(self.fd)
+                self.fd = None
+
+    @property
+    def mode(self):
+        return "inotify" if self.fd is not None else "polling"
+
+    def changed(self):
+        """Возвращает файлы, сигнатура которых изменилась с прошлого вызова."""
+        changed = []
+        for path in self.paths:
+            signature = file_signature(path)
+            if signature is not None and signature != self.signatures[path]:
+                changed.append(path)
+            self.signatures[path] = signature
+        return changed
+
+    def _drain_events(self):
+        """Читает накопившиеся события inotify, True если затронут один из файлов."""
+        touched = False
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, _, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            directory = self.watches.get(wd)
+            if directory and os.path.join(directory, os.fsdecode(name)) in self.signatures:
+                touched = True
+        return touched
+
+    def wait(self, timeout=None):
+        """Блокируется до изменения хотя бы одного файла или истечения timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self.changed()
+            if changed:
+                return changed
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+
+            if self.fd is None:
+                step = self.poll_interval
+                time.sleep(step if remaining is None else min(step, remaining))
+                continue
+
+            # Контрольный опрос раз в poll_interval на случай пропущенных событий
+            step = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+            readable, _, _ = select.select([self.fd], [], [], step)
+            if readable and self._drain_events():
+                # OpenVPN держит статус-файл открытым и переписывает его на месте,
+                # поэтому даём ему дописать файл, прежде чем сверять сигнатуры
+                time.sleep(SETTLE_DELAY)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
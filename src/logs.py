@@ -1,81 +1,43 @@
 import os
-import sqlite3
-import csv
+import sys
 import time
 
-from datetime import datetime, timezone
-from tzlocal import get_localzone
+from datetime import datetime, timedelta, timezone
 from config import Config
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from src.db import get_connection
+from src.file_watch import FileWatcher
+from src.migrations import migrate
+from src.ovpn_sources import get_status_sources
+from src.ovpn_status import is_management, read_all, read_status
+from src.queries import (
+    ARCHIVE_CONNECTION_LOGS,
+    CONNECTION_LOG_SESSION,
+    CONNECTION_LOGS_TRIM,
+    TRIM_BY_AGE,
+    TRIM_BY_ID,
+)
+
 # Путь к базе данных
 DB_PATH = Config.LOGS_DATABASE_PATH
-# Получаем LOG_FILES из конфигурации
-LOG_FILES = Config.LOG_FILES
+# Ограничения хранения истории подключений
+CONNECTION_LOGS_MAX_ROWS = Config.CONNECTION_LOGS_MAX_ROWS
+CONNECTION_LOGS_MAX_AGE_DAYS = Config.CONNECTION_LOGS_MAX_AGE_DAYS
+CONNECTION_LOGS_ARCHIVE = Config.CONNECTION_LOGS_ARCHIVE
+# Контрольный опрос файлов в режиме --watch (если inotify пропустил событие)
+WATCH_POLL_INTERVAL = 5
 
 
-def initialize_database():
-    """Создаёт таблицы базы данных, если их нет."""
-    conn = sqlite3.connect(DB_PATH)
-
-    # Таблица для ежемесячной статистики
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS monthly_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            client_name TEXT,
-            ip_address TEXT,
-            month TEXT,
-            total_bytes_received INTEGER,
-            total_bytes_sent INTEGER,
-            total_connections INTEGER,
-            last_connected TEXT,
-            UNIQUE(client_name, month, ip_address)
-            )
-        """
-    )
-
-    # Таблица для журналов подключений
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS connection_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            client_name TEXT,
-            local_ip TEXT,
-            real_ip TEXT,
-            connected_since DATETIME,
-            bytes_received INTEGER,
-            bytes_sent INTEGER,
-            protocol TEXT
-        )
-    """
-    )
-    # Хранит последнее состояние клиентов
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS last_client_stats (
-            client_name TEXT,
-            ip_address TEXT,
-            connected_since TEXT,
-            bytes_received INTEGER,
-            bytes_sent INTEGER,
-            PRIMARY KEY (client_name, ip_address)
-        )
-    """
-    )
+def get_db_connection():
+    """Соединение живёт всё время работы процесса (см. src.db)."""
+    return get_connection(DB_PATH)
 
-    conn.commit()
-    conn.close()
-
-
-def ensure_column_exists():
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(monthly_stats)")
-        columns = [row[1] for row in cursor.fetchall()]
-        if "last_connected" not in columns:
-            cursor.execute("ALTER TABLE monthly_stats ADD COLUMN last_connected TEXT")
-            conn.commit()
 
+def initialize_database():
+    """Применяет новые миграции схемы (см. src.migrations)."""
+    migrate(get_db_connection(), "logs")
 
 
 def mask_ip(ip_address):
@@ -95,12 +57,9 @@ def mask_ip(ip_address):
     return ip_address
 
 
-def format_date(date_string):
-    date_obj = datetime.strptime(date_string, "%Y-%m-%d %H:%M:%S")
-    server_timezone = get_localzone()
-    localized_date = date_obj.replace(tzinfo=server_timezone)
-    utc_date = localized_date.astimezone(timezone.utc)
-    return utc_date.isoformat()
+def format_date(epoch):
+    """Время подключения (секунды эпохи) в ISO-строке UTC."""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
 
 
 def format_duration(start_time):
@@ -126,44 +85,26 @@ def format_duration(start_time):
         return f"{seconds} сек."
 
 
-def parse_log_file(log_file, protocol):
-    """Читает и парсит файл лога."""
+def parse_log_file(status):
+    """Записи подключений из снимка статус-файла."""
     logs = []
-    total_received = 0
-    total_sent = 0
-    parse_count = 0
-    skipped_count = 0
-    if not os.path.exists(log_file):
-        print(f"Файл не найден: {log_file}")
-        return []
-
-    with open(log_file, newline="", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        next(reader)
-
-        for row in reader:
-            if row[0] == "CLIENT_LIST":
-                parse_count += 1
-                client_name = row[1]
-                received = int(row[5])
-                sent = int(row[6])
-                total_received += received
-                total_sent += sent
-                start_date = datetime.strptime(row[7], "%Y-%m-%d %H:%M:%S")
-                duration = format_duration(start_date)
-                logs.append(
-                    {
-                        "client_name": client_name,
-                        "real_ip": mask_ip(row[2]),
-                        "local_ip": row[3],
-                        "bytes_received": received,
-                        "connected_since": format_date(row[7]),
-                        "bytes_sent": sent,
-                        "duration": duration,
-                        "protocol": protocol,
-                    }
-                )
-                print(f"Обработано: {client_name}_{received}/{sent}")
+    protocol = status.protocol
+    for client in status.clients:
+        start_date = datetime.fromtimestamp(client.connected_since_epoch)
+        duration = format_duration(start_date)
+        logs.append(
+            {
+                "client_name": client.name,
+                "real_ip": mask_ip(client.real_address),
+                "local_ip": client.virtual_address,
+                "bytes_received": client.bytes_received,
+                "connected_since": format_date(client.connected_since_epoch),
+                "bytes_sent": client.bytes_sent,
+                "duration": duration,
+                "protocol": protocol,
+            }
+        )
+        print(f"Обработано: {client.name}_{client.bytes_received}/{client.bytes_sent}")
     return logs
 
 
@@ -172,31 +113,34 @@ def save_monthly_stats(logs):
 
     current_month = datetime.today().strftime("%b. %Y")
 
-    # previous_month_date = datetime.now().replace(day=1) - timedelta(days=1)
-    # previous_month = previous_month_date.strftime("%b. %Y")
-
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
 
         # Удаляем старые данные (оставляем только текущий месяц)
         cursor.execute("DELETE FROM monthly_stats WHERE month != ?", (current_month,))
 
-        aggregated_data = {}
-
+        # Последнее известное состояние всех клиентов одним запросом
         cursor.execute(
             """
-            INSERT INTO monthly_stats (client_name, ip_address, month, total_bytes_received, total_bytes_sent, total_connections)
-            SELECT client_name, ip_address, ?, 0, 0, 0 FROM monthly_stats
-            WHERE month != ? AND (client_name, ip_address) NOT IN 
-            (SELECT client_name, ip_address FROM monthly_stats WHERE month = ?)
-            """,
-            (current_month, current_month, current_month),
+            SELECT client_name, ip_address, connected_since, bytes_received, bytes_sent
+            FROM last_client_stats
+            """
         )
+        last_states = {(row[0], row[1]): row[2:] for row in cursor.fetchall()}
+        updated_states = {}
+        aggregated_data = {}
+        # Разобранные даты подключения: у многих клиентов они совпадают между проходами
+        parsed_dates = {}
+
+        def parse_connected_since(value):
+            if value not in parsed_dates:
+                date_obj = datetime.fromisoformat(value)
+                parsed_dates[value] = (date_obj, date_obj.strftime("%b. %Y"))
+            return parsed_dates[value]
 
         for log in logs:
             try:
-                connected_since = datetime.fromisoformat(log["connected_since"])
-                month = connected_since.strftime("%b. %Y")
+                connected_since, month = parse_connected_since(log["connected_since"])
             except (ValueError, TypeError):
                 continue
 
@@ -205,21 +149,11 @@ def save_monthly_stats(logs):
             new_bytes_received = log.get("bytes_received", 0)
             new_bytes_sent = log.get("bytes_sent", 0)
 
-            cursor.execute(
-                """
-                SELECT connected_since, bytes_received, bytes_sent 
-                FROM last_client_stats 
-                WHERE client_name = ? AND ip_address = ?
-                """,
-                (client_name, ip_address),
-            )
-            last_state = cursor.fetchone()
+            last_state = last_states.get((client_name, ip_address))
 
             if last_state:
                 last_connected_since, last_bytes_received, last_bytes_sent = last_state
-                last_connected_month = datetime.fromisoformat(
-                    last_connected_since
-                ).strftime("%b. %Y")
+                last_connected_month = parse_connected_since(last_connected_since)[1]
 
                 if last_connected_month != current_month:
                     diff_received = new_bytes_received
@@ -254,95 +188,68 @@ def save_monthly_stats(logs):
                 connected_since,
             )
 
-            cursor.execute(
-                """
-                INSERT INTO last_client_stats (client_name, ip_address, connected_since, bytes_received, bytes_sent)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(client_name, ip_address) DO UPDATE SET
-                connected_since = excluded.connected_since,
-                bytes_received = excluded.bytes_received,
-                bytes_sent = excluded.bytes_sent
-                """,
+            state = (log["connected_since"], new_bytes_received, new_bytes_sent)
+            if state != last_state:
+                last_states[(client_name, ip_address)] = state
+                updated_states[(client_name, ip_address)] = state
+
+        cursor.executemany(
+            """
+            INSERT INTO last_client_stats (client_name, ip_address, connected_since, bytes_received, bytes_sent)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(client_name, ip_address) DO UPDATE SET
+            connected_since = excluded.connected_since,
+            bytes_received = excluded.bytes_received,
+            bytes_sent = excluded.bytes_sent
+            """,
+            [
+                (client_name, ip_address, *state)
+                for (client_name, ip_address), state in updated_states.items()
+            ],
+        )
+
+        cursor.executemany(
+            """
+            INSERT INTO monthly_stats (client_name, ip_address, month, total_bytes_received, total_bytes_sent, total_connections, last_connected)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(client_name, month, ip_address) DO UPDATE SET
+            total_bytes_received = total_bytes_received + excluded.total_bytes_received,
+            total_bytes_sent = total_bytes_sent + excluded.total_bytes_sent,
+            total_connections = total_connections + excluded.total_connections,
+            last_connected = MAX(COALESCE(last_connected, ''), excluded.last_connected)
+            """,
+            [
                 (
                     client_name,
                     ip_address,
-                    log["connected_since"],
-                    new_bytes_received,
-                    new_bytes_sent,
-                ),
-            )
-
-        for (client_name, ip_address, month), data in aggregated_data.items():
-            cursor.execute(
-                """
-                SELECT total_bytes_received, total_bytes_sent, total_connections, last_connected 
-                FROM monthly_stats WHERE client_name = ? AND ip_address = ? AND month = ?
-                """,
-                (client_name, ip_address, month),
-            )
-            existing_log = cursor.fetchone()
-
-
-
-
-            if existing_log:
-                existing_bytes_received, existing_bytes_sent, existing_connections, existing_last_connected = existing_log 
-                last_connected = max(existing_last_connected or "", data["last_connected"].isoformat())
-
-                cursor.execute(
-                    """
-                    UPDATE monthly_stats
-                    SET total_bytes_received = total_bytes_received + ?, 
-                        total_bytes_sent = total_bytes_sent + ?, 
-                        total_connections = total_connections + ?,
-                        last_connected = ?
-                    WHERE client_name = ? AND ip_address = ? AND month = ?
-                    """,
-                    (
-                        data["total_bytes_received"],
-                        data["total_bytes_sent"],
-                        data["total_connections"],
-                        last_connected,
-                        client_name,
-                        ip_address,
-                        month,
-                    ),
-                )
-            else:
-                cursor.execute(
-                    """
-                    INSERT INTO monthly_stats (client_name, ip_address, month, total_bytes_received, total_bytes_sent, total_connections, last_connected)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        client_name,
-                        ip_address,
-                        month,
-                        data["total_bytes_received"],
-                        data["total_bytes_sent"],
-                        data["total_connections"],
-                        data["last_connected"].isoformat(),
-                    ),
+                    month,
+                    data["total_bytes_received"],
+                    data["total_bytes_sent"],
+                    data["total_connections"],
+                    data["last_connected"].isoformat(),
                 )
+                for (client_name, ip_address, month), data in aggregated_data.items()
+            ],
+        )
         conn.commit()
 
 
 def save_connection_logs(logs):
     """Сохраняет данные подключений в таблицу connection_logs, избегая повторных записей и добавляя только разницу в трафике."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
 
         for log in logs:
-            # Проверяем, существует ли уже запись с такими же client_name и connected_since
-            cursor.execute(
-                """
-                SELECT id, bytes_received, bytes_sent FROM connection_logs 
-                WHERE client_name = ? AND connected_since = ?
-                LIMIT 1
-                """,
-                (log["client_name"], log["connected_since"]),
-            )
-            existing_log = cursor.fetchone()
+            # Проверяем, существует ли уже запись с такими же client_name и connected_since.
+            # Активный сеанс мог уже уйти в архив при ротации — тогда обновляется архивная запись
+            for table in ("connection_logs", "connection_logs_archive"):
+                cursor.execute(
+                    CONNECTION_LOG_SESSION.format(table=table),
+                    (log["client_name"], log["connected_since"]),
+                )
+                existing_log = cursor.fetchone()
+                if existing_log is not None:
+                    break
 
             if existing_log is None:
                 # Если записи нет, добавляем новую
@@ -372,37 +279,121 @@ def save_connection_logs(logs):
                 # Если разница больше нуля, обновляем данные
                 if diff_received > 0 or diff_sent > 0:
                     cursor.execute(
-                        """
-                        UPDATE connection_logs
+                        f"""
+                        UPDATE {table}
                         SET bytes_received = bytes_received + ?, bytes_sent = bytes_sent + ?
                         WHERE id = ?
                         """,
                         (diff_received, diff_sent, existing_id),
                     )
 
-            # Удаляем старые записи, если их больше 100
-            cursor.execute(
-                """
-                DELETE FROM connection_logs
-                WHERE id NOT IN (
-                    SELECT id FROM connection_logs ORDER BY id DESC LIMIT 100
-                )
-                """
-            )
-
+        trim_connection_logs(cursor)
         conn.commit()
 
 
-def process_logs():
-    """Основная функция для обработки логов."""
-    initialize_database()
-    ensure_column_exists()
+def trim_connection_logs(cursor):
+    """Удаляет (или переносит в архив) записи сверх лимитов хранения, один раз на пакет."""
+    conditions = []
+    params = []
+
+    if CONNECTION_LOGS_MAX_ROWS > 0:
+        # Граница по id: всё, что старше последних CONNECTION_LOGS_MAX_ROWS записей
+        cursor.execute(
+            "SELECT id FROM connection_logs ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (CONNECTION_LOGS_MAX_ROWS - 1,),
+        )
+        watermark = cursor.fetchone()
+        if watermark:
+            conditions.append(TRIM_BY_ID)
+            params.append(watermark[0])
+
+    if CONNECTION_LOGS_MAX_AGE_DAYS > 0:
+        cutoff = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(
+            days=CONNECTION_LOGS_MAX_AGE_DAYS
+        )
+        conditions.append(TRIM_BY_AGE)
+        params.append(cutoff.isoformat())
+
+    if not conditions:
+        return
+
+    where = " OR ".join(conditions)
+    if CONNECTION_LOGS_ARCHIVE:
+        cursor.execute(ARCHIVE_CONNECTION_LOGS.format(where=where), params)
+    cursor.execute(CONNECTION_LOGS_TRIM.format(where=where), params)
+
+
+def ingest_logs(log_files):
+    """Разбирает указанные статус-файлы и сохраняет статистику."""
+    existing = []
+    for log_file, protocol in log_files:
+        if not is_management(log_file) and not os.path.exists(log_file):
+            print(f"Файл не найден: {log_file}")
+        else:
+            existing.append((log_file, protocol))
     all_logs = []
-    for log_file, protocol in LOG_FILES:
-        all_logs.extend(parse_log_file(log_file, protocol))
+    # Несколько экземпляров OpenVPN разбираются параллельно
+    for status in read_all(existing):
+        all_logs.extend(parse_log_file(status))
     save_monthly_stats(all_logs)
     save_connection_logs(all_logs)
 
 
+def process_logs():
+    """Основная функция для обработки логов."""
+    initialize_database()
+    ingest_logs(get_status_sources())
+
+
+def watch_logs():
+    """Постоянно работающий обработчик: разбирает статус-файл только после его изменения."""
+    initialize_database()
+
+    log_files = None
+    watcher = None
+    versions = {}
+
+    while True:
+        # Список источников пересматривается (новые экземпляры OpenVPN) —
+        # при его изменении наблюдатель пересоздаётся
+        current = get_status_sources()
+        if current != log_files:
+            log_files = current
+            protocols = {
+                os.path.abspath(path): protocol
+                for path, protocol in log_files
+                if not is_management(path)
+            }
+            # management-источники проверяются по версии снимка раз в WATCH_POLL_INTERVAL
+            management = [(path, protocol) for path, protocol in log_files if is_management(path)]
+            previous = watcher
+            watcher = FileWatcher(protocols.keys(), poll_interval=WATCH_POLL_INTERVAL)
+            if previous is not None:
+                # Уже обработанные файлы не разбираются повторно
+                for path, signature in previous.signatures.items():
+                    if path in watcher.signatures:
+                        watcher.signatures[path] = signature
+                previous.close()
+            print(f"Отслеживание статус-файлов запущено ({watcher.mode}): {len(log_files)}")
+
+        changed = watcher.wait(WATCH_POLL_INTERVAL)
+        sources = [(path, protocols[path]) for path in changed]
+        for path, protocol in management:
+            version = read_status(path, protocol).version
+            if versions.get(path) != version:
+                versions[path] = version
+                sources.append((path, protocol))
+        if not sources:
+            continue
+        try:
+            ingest_logs(sources)
+        except Exception as e:
+            print(f"Ошибка обработки {', '.join(path for path, _ in sources)}: {e}")
+            get_db_connection().rollback()
+
+
 if __name__ == "__main__":
-    process_logs()
\ No newline at end of file
+    if "--watch" in sys.argv[1:]:
+        watch_logs()
+    else:
+        process_logs()
\ No newline at end of file
@@ -0,0 +1,435 @@
+"""
+Версионные миграции баз SQLite.
+
+Схема каждой базы — список миграций; номер миграции — её позиция в списке,
+начиная с 1. Применённая версия хранится в таблице schema_version базы.
+Процесс, владеющий базой, вызывает migrate() один раз при старте (users —
+веб-приложение, logs — logs.py, wg — wg_stats.py, system — сборщик);
+применяются только новые миграции, каждая в своей транзакции под
+блокировкой записи, поэтому одновременный старт нескольких процессов безопасен.
+
+Первые миграции повторяют прежнее создание таблиц (CREATE ... IF NOT EXISTS)
+и поэтому подходят и для баз, созданных до появления schema_version.
+Применённую миграцию не меняют — изменение схемы оформляется новой.
+
+python src/migrations.py --check применяет миграции к пустым базам и
+проверяет по EXPLAIN QUERY PLAN, что частые запросы (src.queries) не читают
+таблицы целиком; то же проверяет tests/test_query_plans.py.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+# ---------users (db.db)----------
+def users_tables(cur):
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            role  TEXT NOT NULL,
+            password TEXT NOT NULL
+        )
+    """
+    )
+
+
+# ---------logs (openvpn_logs.db)----------
+def logs_tables(cur):
+    # Таблица для ежемесячной статистики
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS monthly_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_name TEXT,
+            ip_address TEXT,
+            month TEXT,
+            total_bytes_received INTEGER,
+            total_bytes_sent INTEGER,
+            total_connections INTEGER,
+            last_connected TEXT,
+            UNIQUE(client_name, month, ip_address)
+            )
+        """
+    )
+
+    # Таблица для журналов подключений
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS connection_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_name TEXT,
+            local_ip TEXT,
+            real_ip TEXT,
+            connected_since DATETIME,
+            bytes_received INTEGER,
+            bytes_sent INTEGER,
+            protocol TEXT
+        )
+    """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_connection_logs_client_since
+        ON connection_logs (client_name, connected_since)
+    """
+    )
+    # Архив записей, вытесненных из connection_logs (CONNECTION_LOGS_ARCHIVE)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS connection_logs_archive (
+            id INTEGER PRIMARY KEY,
+            client_name TEXT,
+            local_ip TEXT,
+            real_ip TEXT,
+            connected_since DATETIME,
+            bytes_received INTEGER,
+            bytes_sent INTEGER,
+            protocol TEXT
+        )
+    """
+    )
+    # Хранит последнее состояние клиентов
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS last_client_stats (
+            client_name TEXT,
+            ip_address TEXT,
+            connected_since TEXT,
+            bytes_received INTEGER,
+            bytes_sent INTEGER,
+            PRIMARY KEY (client_name, ip_address)
+        )
+    """
+    )
+
+
+def logs_last_connected(cur):
+    # В базах старых версий monthly_stats создавалась без last_connected
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(monthly_stats)")]
+    if "last_connected" not in columns:
+        cur.execute("ALTER TABLE monthly_stats ADD COLUMN last_connected TEXT")
+
+
+def logs_indexes(cur):
+    # /ovpn/stats: месяц, группировка по клиенту и суммы — всё из индекса
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_monthly_stats_month_client
+        ON monthly_stats (
+            month, client_name, total_bytes_sent, total_bytes_received, last_connected
+        )
+    """
+    )
+    # /ovpn/history (последние подключения) и ротация по возрасту
+    for table in ("connection_logs", "connection_logs_archive"):
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_since ON {table} (connected_since)"
+        )
+
+
+def logs_archive_unique(cur):
+    # Сеанс хранится один раз: либо в connection_logs, либо в архиве.
+    # Раньше активные сеансы, вытесненные ротацией, вставлялись и архивировались
+    # повторно — оставляем по одной записи с наибольшим id
+    cur.execute(
+        """
+        DELETE FROM connection_logs_archive
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM connection_logs_archive GROUP BY client_name, connected_since
+        )
+           OR EXISTS (
+            SELECT 1 FROM connection_logs AS l
+            WHERE l.client_name = connection_logs_archive.client_name
+              AND l.connected_since = connection_logs_archive.connected_since
+        )
+    """
+    )
+    cur.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_connection_logs_archive_client_since
+        ON connection_logs_archive (client_name, connected_since)
+    """
+    )
+
+
+# ---------wg (wireguard_stats.db)----------
+def wg_tables(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS wg_daily_stats (
+            date TEXT NOT NULL,
+            peer TEXT NOT NULL,
+            client TEXT NOT NULL,
+            received INTEGER NOT NULL,
+            sent INTEGER NOT NULL,
+            interface TEXT NOT NULL,
+            PRIMARY KEY (date, peer, interface)
+        )
+    """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS wg_total_stats (
+            peer TEXT NOT NULL,
+            client TEXT NOT NULL,
+            total_received INTEGER NOT NULL,
+            total_sent INTEGER NOT NULL,
+            interface TEXT NOT NULL,
+            PRIMARY KEY (peer, interface)
+        )
+    """
+    )
+
+
+def wg_last_sample(cur):
+    # Последний отсчёт счётчиков пира: от него считается следующий прирост
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS wg_last_sample (
+            peer TEXT NOT NULL,
+            interface TEXT NOT NULL,
+            sampled_at REAL NOT NULL,
+            received INTEGER NOT NULL,
+            sent INTEGER NOT NULL,
+            PRIMARY KEY (peer, interface)
+        )
+    """
+    )
+    # Переход со схемы с wg_intermediate: последние сохранённые итоги
+    # становятся отсчётом, чтобы сегодняшний трафик не учёлся повторно.
+    # Время отсчёта — момент миграции: mtime файлов базы ненадёжен (в режиме
+    # WAL файл базы обновляется лишь при контрольной точке, а -wal меняют
+    # уже предыдущие миграции), поэтому трафик за время простоя относится
+    # к интервалу первого тика
+    if cur.execute("SELECT 1 FROM wg_last_sample LIMIT 1").fetchone() is None:
+        cur.execute(
+            """
+            INSERT INTO wg_last_sample (peer, interface, sampled_at, received, sent)
+            SELECT peer, interface, ?, total_received, total_sent FROM wg_total_stats
+        """,
+            (time.time(),),
+        )
+
+
+def wg_history(cur):
+    # Почасовая, посуточная и помесячная история пиров (см. wg_history)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS wg_peers (
+            id INTEGER PRIMARY KEY,
+            peer TEXT NOT NULL,
+            interface TEXT NOT NULL,
+            UNIQUE (peer, interface)
+        )
+    """
+    )
+    for table in ("wg_traffic_hour", "wg_traffic_day", "wg_traffic_month"):
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                peer_id INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                received INTEGER NOT NULL,
+                sent INTEGER NOT NULL,
+                PRIMARY KEY (peer_id, bucket)
+            ) WITHOUT ROWID
+        """
+        )
+
+    # Накопленная wg_daily_stats переносится в суточные и месячные ряды.
+    # Дата в ней местная; модификатор utc переводит её полночь в эпоху
+    cur.execute(
+        "INSERT OR IGNORE INTO wg_peers (peer, interface) "
+        "SELECT DISTINCT peer, interface FROM wg_daily_stats"
+    )
+    for table, start in (
+        ("wg_traffic_day", "date"),
+        ("wg_traffic_month", "date, 'start of month'"),
+    ):
+        cur.execute(
+            f"""
+            INSERT INTO {table} (peer_id, bucket, received, sent)
+            SELECT p.id, CAST(strftime('%s', {start}, 'utc') AS INTEGER) / 3600,
+                   SUM(d.received), SUM(d.sent)
+            FROM wg_daily_stats AS d
+            JOIN wg_peers AS p ON p.peer = d.peer AND p.interface = d.interface
+            WHERE true  -- без WHERE ON CONFLICT разбирался бы как условие JOIN
+            GROUP BY 1, 2
+            ON CONFLICT (peer_id, bucket) DO NOTHING
+        """
+        )
+
+
+# ---------system (system_stats.db)----------
+def system_tables(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS system_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME,
+            cpu_percent REAL,
+            ram_percent REAL
+        )
+    """
+    )
+
+
+def system_rollups(cur):
+    # Агрегаты по минутам, часам и суткам (местное время); накопленные сырые
+    # записи однократно переносятся в них
+    buckets = {
+        "system_stats_minute": "CAST(strftime('%s', timestamp, 'utc') AS INTEGER) / 60 * 60",
+        "system_stats_hour": "strftime('%s', strftime('%Y-%m-%d %H:00:00', timestamp), 'utc')",
+        "system_stats_day": "strftime('%s', date(timestamp), 'utc')",
+    }
+    for table, bucket in buckets.items():
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket INTEGER PRIMARY KEY,
+                samples INTEGER NOT NULL,
+                cpu_sum REAL NOT NULL,
+                cpu_min REAL NOT NULL,
+                cpu_max REAL NOT NULL,
+                ram_sum REAL NOT NULL,
+                ram_min REAL NOT NULL,
+                ram_max REAL NOT NULL
+            )
+        """
+        )
+        cur.execute(
+            f"""
+            INSERT INTO {table}
+                (bucket, samples, cpu_sum, cpu_min, cpu_max, ram_sum, ram_min, ram_max)
+            SELECT CAST({bucket} AS INTEGER), COUNT(*),
+                   SUM(cpu_percent), MIN(cpu_percent), MAX(cpu_percent),
+                   SUM(ram_percent), MIN(ram_percent), MAX(ram_percent)
+            FROM system_stats
+            WHERE {bucket} IS NOT NULL
+            GROUP BY 1
+            ON CONFLICT (bucket) DO NOTHING
+        """
+        )
+
+
+def system_indexes(cur):
+    # Очистка сырых записей старше RAW_RETENTION_DAYS
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_system_stats_timestamp ON system_stats (timestamp)"
+    )
+
+
+MIGRATIONS = {
+    "users": [users_tables],
+    "logs": [logs_tables, logs_last_connected, logs_indexes, logs_archive_unique],
+    "wg": [wg_tables, wg_last_sample, wg_history],
+    "system": [system_tables, system_rollups, system_indexes],
+}
+
+
+def schema_version(conn):
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0  # таблицы ещё нет
+
+
+def migrate(conn, database):
+    """Применяет к соединению conn новые миграции базы database; возвращает версию."""
+    migrations = MIGRATIONS[database]
+    if schema_version(conn) >= len(migrations):
+        return len(migrations)
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    """
+    )
+    while True:
+        # Блокировка записи до проверки версии: другой процесс мог успеть раньше
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            if version >= len(migrations):
+                conn.commit()
+                return version
+            migration = migrations[version]
+            migration(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version + 1, migration.__name__, time.time()),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"[DB] {database}: применена миграция {version + 1} ({migration.__name__})")
+
+
+# ---------Проверка планов запросов----------
+# Полное чтение таблицы или индекса. Допустимо только обход индекса в нужном
+# порядке для запроса с LIMIT: тогда читается не больше LIMIT строк
+FULL_SCAN_RE = re.compile(r"^SCAN ")
+ORDERED_SCAN_RE = re.compile(r"^SCAN \w+ USING (COVERING )?INDEX ")
+
+
+def query_plan(conn, sql, params):
+    """Строки EXPLAIN QUERY PLAN запроса."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def full_scans(plan, sql):
+    """Шаги плана, читающие таблицу или индекс целиком."""
+    limited = re.search(r"\bLIMIT\b", sql, re.I)
+    return [
+        detail
+        for detail in plan
+        if FULL_SCAN_RE.match(detail) and not (limited and ORDERED_SCAN_RE.match(detail))
+    ]
+
+
+def migrated_database(directory, database):
+    """Пустая база database со всеми миграциями и статистикой ANALYZE."""
+    conn = sqlite3.connect(os.path.join(directory, f"{database}.db"))
+    migrate(conn, database)
+    conn.execute("ANALYZE")
+    return conn
+
+
+def check_query_plans():
+    """Планы частых запросов (src.queries) на пустых базах; возвращает найденные полные чтения."""
+    from src.queries import HOT_QUERIES  # pylint: disable=import-outside-toplevel
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        for database in MIGRATIONS:
+            conn = migrated_database(directory, database)
+            for name, sql, params in HOT_QUERIES:
+                if name != database:
+                    continue
+                plan = query_plan(conn, sql, params)
+                scans = full_scans(plan, sql)
+                query = " ".join(sql.split())
+                print(f"[{'SCAN' if scans else 'OK'}] {database}: {query}")
+                for detail in plan:
+                    print(f"    {detail}")
+                failures.extend((database, query, detail) for detail in scans)
+            conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    # Запуск как скрипта: src.queries импортируется из корня репозитория
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--check" in sys.argv[1:]:
+        sys.exit(1 if check_query_plans() else 0)
+    print("Использование: migrations.py --check")
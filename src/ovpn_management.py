@@ -0,0 +1,260 @@
+"""
+Management-интерфейс OpenVPN как источник данных о клиентах.
+
+ManagementSource держит постоянное подключение (TCP host:port или Unix-сокет),
+при подключении и затем раз в RESYNC_INTERVAL запрашивает `status 3`, а между
+ними поддерживает таблицу клиентов по уведомлениям >CLIENT:ESTABLISHED,
+>CLIENT:DISCONNECT, >CLIENT:ADDRESS и >BYTECOUNT_CLI. Снимок в формате
+ovpn_status строится только после изменения таблицы.
+
+OpenVPN обслуживает одно management-подключение, поэтому источник запускает
+только сборщик (см. collector.start_management_sources).
+"""
+
+import socket
+import threading
+import time
+
+from datetime import datetime
+
+from src.ovpn_status import (
+    MANAGEMENT_PREFIX,
+    OvpnClient,
+    build_status,
+    instance_name,
+    parse_client_rows,
+)
+
+BYTECOUNT_INTERVAL = 5  # период уведомлений >BYTECOUNT_CLI, секунды
+RESYNC_INTERVAL = 60  # полная сверка через `status 3`
+RECONNECT_DELAY = 5
+READ_TIMEOUT = 1
+HANDSHAKE_TIMEOUT = 10
+
+
+def parse_address(path):
+    """management://host:port -> (AF_INET, (host, port)); management:///sock -> AF_UNIX."""
+    address = path[len(MANAGEMENT_PREFIX):]
+    if address.startswith("/"):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host.strip("[]") or "127.0.0.1", int(port))
+
+
+def client_from_env(env, protocol, instance=""):
+    """Клиент из переменных >CLIENT:ENV уведомления ESTABLISHED."""
+    if env.get("trusted_ip"):
+        real_address = f"{env['trusted_ip']}:{env.get('trusted_port', '')}"
+    else:
+        real_address = f"{env.get('trusted_ip6', '')}:{env.get('trusted_port', '')}"
+    since = int(env.get("time_unix") or time.time())
+    return OvpnClient(
+        name=env.get("common_name", "UNDEF"),
+        real_address=real_address,
+        virtual_address=env.get("ifconfig_pool_remote_ip", ""),
+        bytes_received=int(env.get("bytes_received") or 0),
+        bytes_sent=int(env.get("bytes_sent") or 0),
+        connected_since=datetime.fromtimestamp(since).strftime("%Y-%m-%d %H:%M:%S"),
+        connected_since_epoch=since,
+        protocol=protocol,
+        instance=instance,
+    )
+
+
+class ManagementSource:
+    """Таблица клиентов, поддерживаемая по management-интерфейсу OpenVPN."""
+
+    def __init__(self, path, protocol="", password=None):
+        self.path = path
+        self.protocol = protocol
+        self.instance = instance_name(path)
+        self.password = password
+        self.lock = threading.Lock()
+        self.clients = {}  # CID -> OvpnClient
+        self.version = 1
+        self.updated_at = 0.0
+        self.error = "Нет подключения к management-интерфейсу"
+        self.cached = None
+        self.sock = None
+        self.buffer = b""
+
+    # ---------Снимок----------
+    def snapshot(self):
+        with self.lock:
+            if self.cached is None or self.cached.version != self.version:
+                self.cached = build_status(
+                    self.path,
+                    self.protocol,
+                    tuple(self.clients.values()),
+                    None,
+                    self.version,
+                    self.updated_at,
+                    self.error,
+                )
+            return self.cached
+
+    def _changed(self, error=None):
+        # Вызывается под self.lock
+        self.version += 1
+        self.updated_at = time.time()
+        self.error = error
+
+    # ---------Подключение----------
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        while True:
+            try:
+                self._connect()
+                self._session()
+            except (OSError, ValueError) as e:
+                print(f"[MANAGEMENT] {self.path}: {e}")
+                with self.lock:
+                    self.clients.clear()
+                    self._changed(f"Нет подключения к management-интерфейсу: {e}")
+            finally:
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+            time.sleep(RECONNECT_DELAY)
+
+    def _connect(self):
+        family, address = parse_address(self.path)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(READ_TIMEOUT)
+        self.sock.connect(address)
+        self.buffer = b""
+
+    def _send(self, command):
+        self.sock.sendall(command.encode("utf-8") + b"\n")
+
+    def _read_line(self):
+        """Следующая строка или None по таймауту чтения."""
+        while b"\n" not in self.buffer:
+            # Запрос пароля приходит без перевода строки
+            if self.buffer.startswith(b"ENTER PASSWORD:"):
+                self.buffer = self.buffer[len(b"ENTER PASSWORD:"):]
+                return "ENTER PASSWORD:"
+            try:
+                chunk = self.sock.recv(65536)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise ConnectionError("management-интерфейс закрыл соединение")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode("utf-8", "replace").rstrip("\r")
+
+    # ---------Протокол----------
+    def _handshake(self):
+        """Ждёт приветствия >INFO, при необходимости отправив пароль."""
+        deadline = time.monotonic() + HANDSHAKE_TIMEOUT
+        while time.monotonic() < deadline:
+            line = self._read_line()
+            if line is None:
+                continue
+            if line == "ENTER PASSWORD:":
+                if not self.password:
+                    raise ValueError("management-интерфейс требует пароль")
+                self._send(self.password)
+            elif line.startswith("ERROR:"):
+                raise ValueError(line)
+            elif line.startswith(">INFO:"):
+                return
+        raise ConnectionError("нет приветствия management-интерфейса")
+
+    def _session(self):
+        self._handshake()
+        self._send(f"bytecount {BYTECOUNT_INTERVAL}")
+        self._send("status 3")
+        status_rows = None  # накапливаемый ответ на status 3
+        env_event, env = None, {}
+        last_resync = time.monotonic()
+
+        while True:
+            if time.monotonic() - last_resync >= RESYNC_INTERVAL and status_rows is None:
+                self._send("status 3")
+                last_resync = time.monotonic()
+
+            line = self._read_line()
+            if line is None:
+                continue
+
+            if line.startswith(">CLIENT:ENV,"):
+                item = line[len(">CLIENT:ENV,"):]
+                if item == "END":
+                    self._client_event(env_event, env)
+                    env_event, env = None, {}
+                else:
+                    key, _, value = item.partition("=")
+                    env[key] = value
+            elif line.startswith(">CLIENT:"):
+                env_event, env = line[len(">CLIENT:"):].split(","), {}
+                if env_event[0] == "ADDRESS":
+                    self._client_address(env_event)
+                    env_event = None
+            elif line.startswith(">BYTECOUNT_CLI:"):
+                self._bytecount(line[len(">BYTECOUNT_CLI:"):].split(","))
+            elif line.startswith(">"):
+                continue  # >INFO, >HOLD и прочие уведомления
+            elif line.startswith("TITLE"):
+                status_rows = []
+            elif status_rows is not None:
+                if line == "END":
+                    self._resync(status_rows)
+                    status_rows = None
+                else:
+                    status_rows.append(line.split("\t"))
+            elif line.startswith("ERROR:"):
+                print(f"[MANAGEMENT] {self.path}: {line}")
+
+    def _resync(self, rows):
+        clients = {}
+        # В status 3 поле 10 — Client ID, по нему приходят уведомления
+        for row, client in zip(
+            [r for r in rows if r and r[0] == "CLIENT_LIST" and len(r) >= 8],
+            parse_client_rows(rows, self.protocol, self.instance),
+        ):
+            clients[row[10] if len(row) > 10 else client.name] = client
+        with self.lock:
+            if clients != self.clients or self.error:
+                self.clients = clients
+                self._changed()
+
+    def _client_event(self, event, env):
+        if not event:
+            return
+        kind, cid = event[0], event[1] if len(event) > 1 else None
+        with self.lock:
+            if kind == "ESTABLISHED":
+                self.clients[cid] = client_from_env(env, self.protocol, self.instance)
+                self._changed()
+            elif kind == "DISCONNECT" and self.clients.pop(cid, None) is not None:
+                self._changed()
+
+    def _client_address(self, event):
+        # ADDRESS,{CID},{ADDR},{PRI}
+        if len(event) < 4 or event[3] != "1":
+            return
+        with self.lock:
+            client = self.clients.get(event[1])
+            if client is not None and client.virtual_address != event[2]:
+                self.clients[event[1]] = client._replace(virtual_address=event[2])
+                self._changed()
+
+    def _bytecount(self, fields):
+        # {CID},{BYTES_IN},{BYTES_OUT}
+        if len(fields) < 3:
+            return
+        with self.lock:
+            client = self.clients.get(fields[0])
+            if client is None:
+                return
+            received, sent = int(fields[1]), int(fields[2])
+            if (received, sent) != (client.bytes_received, client.bytes_sent):
+                self.clients[fields[0]] = client._replace(
+                    bytes_received=received, bytes_sent=sent
+                )
+                self._changed()
@@ -0,0 +1,103 @@
+"""
+Скорости клиентов OpenVPN.
+
+Трекер получает каждое новое поколение статус-файла (см. ovpn_status) и по
+разнице счётчиков между соседними поколениями считает скорость каждого
+подключения. Подключение определяется тройкой (имя, реальный адрес, время
+подключения), поэтому переподключение начинает отсчёт заново. Скорости
+сглаживаются EWMA с постоянной времени RATE_TAU; короткая история хранится
+в кольцевом буфере TimeSeries. Работает в процессе сборщика, воркеры
+получают результат через его сокет.
+"""
+
+import math
+import threading
+
+from src.timeseries import TimeSeries
+
+RATE_TAU = 60  # постоянная времени сглаживания, секунды
+RATE_HISTORY_POINTS = 120  # точек истории на подключение
+
+
+class ClientRate:
+    """Состояние одного подключения."""
+
+    __slots__ = ("bytes_received", "bytes_sent", "timestamp", "rx_rate", "tx_rate", "history")
+
+    def __init__(self, client, timestamp, history_points):
+        self.bytes_received = client.bytes_received
+        self.bytes_sent = client.bytes_sent
+        self.timestamp = timestamp
+        self.rx_rate = None
+        self.tx_rate = None
+        self.history = TimeSeries(history_points, fields=("rx", "tx"))
+
+
+class RateTracker:
+    """Скорости подключений по последовательным снимкам статус-файлов."""
+
+    def __init__(self, tau=RATE_TAU, history_points=RATE_HISTORY_POINTS):
+        self.tau = tau
+        self.history_points = history_points
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.paths = {}  # путь -> (версия снимка, ключи его подключений)
+
+    def update(self, status):
+        """Учитывает снимок; повторная передача той же версии ничего не делает."""
+        previous = self.paths.get(status.path)
+        if previous is not None and previous[0] == status.version:
+            return
+        # Время записи файла точнее времени разбора
+        timestamp = status.signature[1] / 1e9 if status.signature else status.parsed_at
+
+        with self.lock:
+            keys = set()
+            for client in status.clients:
+                key = (client.name, client.real_address, client.connected_since_epoch)
+                keys.add(key)
+                state = self.clients.get(key)
+                if state is None:
+                    self.clients[key] = ClientRate(client, timestamp, self.history_points)
+                    continue
+
+                elapsed = timestamp - state.timestamp
+                if elapsed <= 0:
+                    continue
+                rx = max(client.bytes_received - state.bytes_received, 0) / elapsed
+                tx = max(client.bytes_sent - state.bytes_sent, 0) / elapsed
+                if state.rx_rate is None:
+                    state.rx_rate, state.tx_rate = rx, tx
+                else:
+                    alpha = 1 - math.exp(-elapsed / self.tau)
+                    state.rx_rate += alpha * (rx - state.rx_rate)
+                    state.tx_rate += alpha * (tx - state.tx_rate)
+                state.bytes_received = client.bytes_received
+                state.bytes_sent = client.bytes_sent
+                state.timestamp = timestamp
+                state.history.append(timestamp, state.rx_rate, state.tx_rate)
+
+            # Отключившиеся клиенты этого файла больше не отслеживаются
+            if previous is not None:
+                for key in previous[1] - keys:
+                    self.clients.pop(key, None)
+            self.paths[status.path] = (status.version, keys)
+
+    def rates(self, history=False):
+        """Список текущих скоростей (байт/с), при history — с историей по столбцам."""
+        with self.lock:
+            items = list(self.clients.items())
+        result = []
+        for (name, real_address, since), state in items:
+            entry = {
+                "name": name,
+                "real_address": real_address,
+                "connected_since": since,
+                "rx_rate": state.rx_rate or 0.0,
+                "tx_rate": state.tx_rate or 0.0,
+                "updated_at": state.timestamp,
+            }
+            if history:
+                entry["history"] = state.history.range()
+            result.append(entry)
+        return result
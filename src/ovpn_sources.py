@@ -0,0 +1,67 @@
+"""
+Список источников OpenVPN: явно заданные в Config.LOG_FILES плюс статус-файлы,
+найденные по шаблону Config.OVPN_STATUS_GLOB. Шаблон пересматривается не
+чаще раза в DISCOVERY_INTERVAL секунд, поэтому новый экземпляр OpenVPN
+подхватывается без перезапуска, а исчезнувший файл выпадает из списка.
+Статус-файлы из Config.OVPN_STATUS_EXCLUDE (экземпляр уже читается через
+management-интерфейс) по шаблону не добавляются.
+"""
+
+import glob
+import os
+import threading
+import time
+
+from src.config import Config
+from src.ovpn_status import instance_name, is_management
+
+DISCOVERY_INTERVAL = 30  # секунды
+
+
+def protocol_label(path):
+    """Подпись найденного экземпляра: antizapret-udp-status.log -> ANTIZAPRET-UDP."""
+    return instance_name(path).upper()
+
+
+class StatusSources:
+    """Источники [(путь, протокол), ...]; подписи из конфигурации имеют приоритет."""
+
+    def __init__(self, configured, pattern, exclude=(), interval=DISCOVERY_INTERVAL):
+        self.configured = list(configured)
+        self.pattern = pattern
+        self.exclude = list(exclude)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.sources = None
+        self.checked_at = 0.0
+
+    def discover(self):
+        sources = list(self.configured)
+        known = {os.path.realpath(p) for p, _ in self.configured if not is_management(p)}
+        known.update(os.path.realpath(p) for p in self.exclude)
+        for path in sorted(glob.glob(self.pattern)) if self.pattern else ():
+            real = os.path.realpath(path)
+            if real not in known and os.path.isfile(path):
+                known.add(real)
+                sources.append((path, protocol_label(path)))
+        return sources
+
+    def get(self):
+        if self.sources is None or time.monotonic() - self.checked_at >= self.interval:
+            with self.lock:
+                if self.sources is None or time.monotonic() - self.checked_at >= self.interval:
+                    sources = self.discover()
+                    if self.sources is not None and sources != self.sources:
+                        print(f"[OVPN] Источники статуса: {[p for p, _ in sources]}")
+                    self.sources = sources
+                    self.checked_at = time.monotonic()
+        return self.sources
+
+
+status_sources = StatusSources(
+    Config.LOG_FILES, Config.OVPN_STATUS_GLOB, Config.OVPN_STATUS_EXCLUDE
+)
+
+
+def get_status_sources():
+    return status_sources.get()
@@ -0,0 +1,311 @@
+"""
+Разобранные статус-файлы OpenVPN.
+
+Кэш статус-файлов — свой в каждом процессе: поколение файла (inode,
+mtime_ns, size) разбирается один раз на процесс, и потоки этого процесса
+получают один и тот же неизменяемый снимок. Каждый воркер gunicorn, сборщик,
+бот и logs.py разбирают новое поколение сами; между процессами снимки файлов
+не передаются — декодирование JSON через сокет сборщика стоило бы около
+половины разбора. Версия снимка растёт монотонно при каждом разборе и
+сравнима только внутри процесса.
+
+Источник вида management://... — это management-интерфейс OpenVPN (см.
+ovpn_management). Он допускает одно подключение, поэтому его держит сборщик,
+а остальные процессы получают снимок через сокет сборщика.
+"""
+
+import csv
+import itertools
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+
+from src.config import Config
+from src.file_watch import file_signature
+
+PARSE_WORKERS = 4
+PARSE_TIMEOUT = 2  # не ждать медленный источник дольше, секунды
+STALE_AFTER = Config.OVPN_STATUS_STALE_AFTER  # источник устарел, если не обновлялся дольше
+
+
+class OvpnClient(NamedTuple):
+    name: str
+    real_address: str
+    virtual_address: str
+    bytes_received: int  # получено сервером от клиента
+    bytes_sent: int  # отправлено сервером клиенту
+    connected_since: str  # местное время, "%Y-%m-%d %H:%M:%S"
+    connected_since_epoch: int
+    protocol: str
+    instance: str = ""  # экземпляр OpenVPN (имя статус-файла)
+
+
+class OvpnStatus(NamedTuple):
+    path: str
+    protocol: str
+    clients: Tuple[OvpnClient, ...]
+    total_received: int
+    total_sent: int
+    signature: Optional[tuple]
+    version: int
+    parsed_at: float
+    error: Optional[str] = None
+    parse_time: float = 0.0  # длительность разбора, секунды
+
+
+def _since_epoch(row):
+    # В status-version 2 восьмое поле — время подключения в секундах эпохи
+    if len(row) > 8 and row[8].isdigit():
+        return int(row[8])
+    return int(datetime.strptime(row[7], "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+def parse_client_rows(rows, protocol, instance=""):
+    """Клиенты из строк CLIENT_LIST (поля status-version 2/3)."""
+    clients = []
+    for row in rows:
+        if not row or row[0] != "CLIENT_LIST" or len(row) < 8:
+            continue
+        clients.append(
+            OvpnClient(
+                name=row[1],
+                real_address=row[2],
+                virtual_address=row[3],
+                bytes_received=int(row[5]),
+                bytes_sent=int(row[6]),
+                connected_since=row[7],
+                connected_since_epoch=_since_epoch(row),
+                protocol=protocol,
+                instance=instance,
+            )
+        )
+    return tuple(clients)
+
+
+MANAGEMENT_PREFIX = "management://"
+
+
+def is_management(path):
+    return path.startswith(MANAGEMENT_PREFIX)
+
+
+def instance_name(path):
+    """Имя экземпляра по пути: /…/antizapret-udp-status.log -> antizapret-udp."""
+    if is_management(path):
+        return path[len(MANAGEMENT_PREFIX):]
+    name = os.path.basename(path)
+    for suffix in (".log", "-status", "_status"):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            name = name[: -len(suffix)]
+    return name
+
+
+def parse_status(file, protocol, instance=""):
+    """Разбирает строки CLIENT_LIST открытого статус-файла (status-version 2 — запятые, 3 — табуляция)."""
+    first = file.readline()
+    delimiter = "\t" if "\t" in first else ","
+    return parse_client_rows(
+        csv.reader(itertools.chain([first], file), delimiter=delimiter), protocol, instance
+    )
+
+
+def build_status(
+    path, protocol, clients, signature, version, parsed_at, error=None, parse_time=0.0
+):
+    return OvpnStatus(
+        path=path,
+        protocol=protocol,
+        clients=clients,
+        total_received=sum(c.bytes_received for c in clients),
+        total_sent=sum(c.bytes_sent for c in clients),
+        signature=signature,
+        version=version,
+        parsed_at=parsed_at,
+        error=error,
+        parse_time=parse_time,
+    )
+
+
+class StatusCache:
+    """Снимки статус-файлов этого процесса, перечитываемые только при смене сигнатуры."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}  # отдельная блокировка на файл: файлы разбираются параллельно
+        self.snapshots = {}
+        self.versions = itertools.count(1)
+
+    def _path_lock(self, path):
+        with self.lock:
+            return self.locks.setdefault(path, threading.Lock())
+
+    def previous(self, path, protocol=""):
+        """Последний готовый снимок файла, не дожидаясь нового разбора."""
+        snapshot = self.snapshots.get(path)
+        if snapshot is None:
+            snapshot = build_status(
+                path, protocol, (), None, 0, time.time(), "Разбор ещё не завершён"
+            )
+        return snapshot
+
+    def get(self, path, protocol=""):
+        signature = file_signature(path)
+        snapshot = self.snapshots.get(path)
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._path_lock(path):
+            snapshot = self.snapshots.get(path)
+            if snapshot is not None and snapshot.signature == signature:
+                return snapshot
+
+            error = None
+            clients = ()
+            started = time.perf_counter()
+            if signature is not None:
+                try:
+                    with open(path, newline="", encoding="utf-8") as file:
+                        clients = parse_status(file, protocol, instance_name(path))
+                except (OSError, ValueError, IndexError) as e:
+                    print(f"Ошибка разбора статус-файла {path}: {e}")
+                    error = str(e)
+
+            snapshot = build_status(
+                path,
+                protocol,
+                clients,
+                signature,
+                next(self.versions),
+                time.time(),
+                error,
+                time.perf_counter() - started,
+            )
+            self.snapshots[path] = snapshot
+            return snapshot
+
+
+def status_to_dict(status):
+    """Снимок в виде, пригодном для JSON (клиенты — списки полей)."""
+    data = status._asdict()
+    data["clients"] = [list(client) for client in status.clients]
+    return data
+
+
+def status_from_dict(data):
+    data = dict(data)
+    data["clients"] = tuple(OvpnClient(*client) for client in data["clients"])
+    data["signature"] = tuple(data["signature"]) if data["signature"] else None
+    return OvpnStatus(**data)
+
+
+class RemoteStatus:
+    """Снимок management-источника, который держит процесс сборщика."""
+
+    def __init__(self):
+        self.snapshots = {}
+
+    def get(self, path, protocol=""):
+        # pylint: disable=import-outside-toplevel
+        from src.collector import collector_request
+
+        snapshot = self.snapshots.get(path)
+        known = snapshot.version if snapshot else 0
+        data = collector_request("ovpn_status", path, known)
+        if data and "clients" in data:
+            snapshot = status_from_dict(data)
+            self.snapshots[path] = snapshot
+        elif snapshot is None or data is None:
+            error = (data or {}).get("error") or "Сборщик недоступен"
+            return build_status(path, protocol, (), None, known, time.time(), error)
+        return snapshot
+
+
+status_cache = StatusCache()
+remote_status = RemoteStatus()
+executor = None
+# Источники, обслуживаемые в этом процессе: путь -> объект с методом snapshot()
+local_sources = {}
+
+
+def register_source(path, source):
+    local_sources[path] = source
+
+
+def read_status(path, protocol=""):
+    """Актуальный снимок одного статус-файла или management-источника."""
+    if path in local_sources:
+        return local_sources[path].snapshot()
+    if is_management(path):
+        return remote_status.get(path, protocol)
+    return status_cache.get(path, protocol)
+
+
+class MergedStatus(NamedTuple):
+    """Объединённый снимок всех экземпляров OpenVPN."""
+
+    clients: Tuple[OvpnClient, ...]
+    total_received: int
+    total_sent: int
+    versions: Tuple[int, ...]
+    sources: Tuple[OvpnStatus, ...]
+
+
+def read_all(log_files, timeout=PARSE_TIMEOUT):
+    """
+    Снимки всех источников из списка [(путь, протокол), ...]. Несколько
+    источников разбираются параллельно; если какой-то не успел за timeout,
+    вместо него возвращается его предыдущий снимок, а разбор завершается в фоне.
+    """
+    global executor
+
+    if len(log_files) < 2:
+        return [read_status(path, protocol) for path, protocol in log_files]
+
+    if executor is None:
+        executor = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix="ovpn-status")
+    futures = [
+        (path, protocol, executor.submit(read_status, path, protocol))
+        for path, protocol in log_files
+    ]
+    done, _ = wait([future for _, _, future in futures], timeout=timeout)
+    return [
+        future.result() if future in done else status_cache.previous(path, protocol)
+        for path, protocol, future in futures
+    ]
+
+
+def read_merged(log_files):
+    """Все клиенты всех источников одним снимком; клиенты помечены instance и protocol."""
+    statuses = read_all(log_files)
+    return MergedStatus(
+        clients=tuple(itertools.chain.from_iterable(s.clients for s in statuses)),
+        total_received=sum(s.total_received for s in statuses),
+        total_sent=sum(s.total_sent for s in statuses),
+        versions=tuple(s.version for s in statuses),
+        sources=tuple(statuses),
+    )
+
+
+def source_report(status, now=None):
+    """Время разбора и свежесть источника."""
+    now = time.time() if now is None else now
+    # Для файла свежесть — время его записи, для management — последнее обновление
+    updated_at = status.signature[1] / 1e9 if status.signature else status.parsed_at
+    age = now - updated_at if updated_at else None
+    return {
+        "instance": instance_name(status.path),
+        "protocol": status.protocol,
+        "path": status.path,
+        "clients": len(status.clients),
+        "version": status.version,
+        "parse_ms": round(status.parse_time * 1000, 2),
+        "updated_at": updated_at,
+        "age": round(age, 1) if age is not None else None,
+        "stale": age is None or age > STALE_AFTER,
+        "error": status.error,
+    }
@@ -0,0 +1,114 @@
+"""
+Частые запросы SQLite.
+
+Эти константы выполняются в main.py и модулях src. По ним же
+migrations.py --check и tests/test_query_plans.py проверяют, что ни один из
+запросов не читает таблицу целиком. В шаблоны с полями {…} подставляются
+только имена таблиц и столбцов из белых списков вызывающего кода.
+"""
+
+# ---------users (db.db)----------
+USER_BY_ID = "SELECT * FROM users WHERE id = ?"
+USER_BY_USERNAME = "SELECT * FROM users WHERE username = ?"
+
+# ---------logs (openvpn_logs.db)----------
+# {sort_column} и {order} — из allowed_sorts в /ovpn/stats
+MONTHLY_STATS_BY_MONTH = """
+    SELECT client_name,
+           SUM(total_bytes_sent),
+           SUM(total_bytes_received),
+           MAX(last_connected)
+    FROM monthly_stats
+    WHERE month = ?
+    GROUP BY client_name
+    ORDER BY {sort_column} {order}
+"""
+CONNECTION_HISTORY = """
+    SELECT * FROM (
+        SELECT * FROM connection_logs UNION ALL SELECT * FROM connection_logs_archive
+    )
+    ORDER BY connected_since DESC LIMIT ?
+"""
+# Для баз, в которых ещё нет архива
+CONNECTION_HISTORY_LIVE = "SELECT * FROM connection_logs ORDER BY connected_since DESC LIMIT ?"
+# {table} — connection_logs или connection_logs_archive
+CONNECTION_LOG_SESSION = """
+    SELECT id, bytes_received, bytes_sent FROM {table}
+    WHERE client_name = ? AND connected_since = ?
+    LIMIT 1
+"""
+# {where} — условия ротации через OR
+TRIM_BY_ID = "id < ?"
+TRIM_BY_AGE = "connected_since < ?"
+ARCHIVE_CONNECTION_LOGS = (
+    "INSERT OR IGNORE INTO connection_logs_archive SELECT * FROM connection_logs WHERE {where}"
+)
+CONNECTION_LOGS_TRIM = "DELETE FROM connection_logs WHERE {where}"
+
+# ---------wg (wireguard_stats.db)----------
+WG_DAILY_STATS_BY_DATE = (
+    "SELECT peer, interface, client, received, sent FROM wg_daily_stats WHERE date = ?"
+)
+WG_DAILY_STATS_CLEAN = "DELETE FROM wg_daily_stats WHERE date < ?"
+# {table} — из wg_history.HISTORY_TABLES, {peer_filter} — по ключу и, возможно, интерфейсу
+WG_PEER_FILTER = "peer = ?"
+WG_PEER_INTERFACE_FILTER = "peer = ? AND interface = ?"
+WG_PEER_HISTORY = """
+    SELECT MIN(bucket), SUM(received), SUM(sent)
+    FROM {table}
+    WHERE peer_id IN (SELECT id FROM wg_peers WHERE {peer_filter})
+      AND bucket BETWEEN ? AND ?
+    GROUP BY (bucket - ?) * ? / ?
+    ORDER BY 1
+"""
+
+# ---------system (system_stats.db)----------
+# {table} — из collector.ROLLUP_TABLES
+SYSTEM_ROLLUP_SERIES = """
+    SELECT bucket, cpu_sum / samples, ram_sum / samples
+    FROM {table}
+    WHERE bucket >= ?
+    ORDER BY bucket ASC
+"""
+SYSTEM_STATS_CLEAN = "DELETE FROM system_stats WHERE timestamp < ?"
+
+# (база, запрос, параметры) для проверки планов; шаблоны — во всех вариантах подстановки
+HOT_QUERIES = [
+    ("users", USER_BY_ID, (1,)),
+    ("users", USER_BY_USERNAME, ("admin",)),
+    *[
+        ("logs", MONTHLY_STATS_BY_MONTH.format(sort_column=column, order=order), ("Oct. 2026",))
+        for column in ("client_name", "MAX(last_connected)")
+        for order in ("ASC", "DESC")
+    ],
+    ("logs", CONNECTION_HISTORY, (1000,)),
+    ("logs", CONNECTION_HISTORY_LIVE, (1000,)),
+    *[
+        ("logs", CONNECTION_LOG_SESSION.format(table=table), ("client", "2026-10-17T00:00:00+00:00"))
+        for table in ("connection_logs", "connection_logs_archive")
+    ],
+    *[
+        ("logs", sql.format(where=where), params)
+        for sql in (ARCHIVE_CONNECTION_LOGS, CONNECTION_LOGS_TRIM)
+        for where, params in (
+            (TRIM_BY_ID, (100,)),
+            (TRIM_BY_AGE, ("2026-10-17T00:00:00+00:00",)),
+            (f"{TRIM_BY_ID} OR {TRIM_BY_AGE}", (100, "2026-10-17T00:00:00+00:00")),
+        )
+    ],
+    ("wg", WG_DAILY_STATS_BY_DATE, ("2026-10-17",)),
+    ("wg", WG_DAILY_STATS_CLEAN, ("2026-10-10",)),
+    *[
+        ("wg", WG_PEER_HISTORY.format(table=table, peer_filter=peer_filter), params + (0, 100, 0, 100, 101))
+        for table in ("wg_traffic_hour", "wg_traffic_day", "wg_traffic_month")
+        for peer_filter, params in (
+            (WG_PEER_FILTER, ("key",)),
+            (WG_PEER_INTERFACE_FILTER, ("key", "wg0")),
+        )
+    ],
+    *[
+        ("system", SYSTEM_ROLLUP_SERIES.format(table=table), (0,))
+        for table in ("system_stats_minute", "system_stats_hour", "system_stats_day")
+    ],
+    ("system", SYSTEM_STATS_CLEAN, ("2026-10-10 00:00:00",)),
+]
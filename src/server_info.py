@@ -0,0 +1,107 @@
+"""
+Сведения о сервере для шаблонов: имя хоста, внешний IP и версия.
+
+Всё вычисляется заранее: имя хоста и версия git — один раз при старте,
+внешний IP обновляется фоновым потоком раз в EXTERNAL_IP_TTL секунд.
+Пока внешний IP не получен (или api.ipify.org недоступен), отдаётся адрес
+локального интерфейса с маршрутом по умолчанию. Если задан SERVER_IP,
+внешние запросы не выполняются вовсе. Рендер страницы сеть не трогает.
+"""
+
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+from src.config import BASE_DIR, Config
+
+EXTERNAL_IP_URL = "https://api.ipify.org"
+EXTERNAL_IP_TTL = Config.EXTERNAL_IP_TTL
+RETRY_INTERVAL = 60  # повтор запроса после неудачи
+REQUEST_TIMEOUT = 10
+
+
+def get_git_version():
+    try:
+        version = (
+            subprocess.check_output(
+                ["/usr/bin/git", "describe", "--tags", "--abbrev=0"],
+                stderr=subprocess.DEVNULL,
+                cwd=BASE_DIR,
+            )
+            .strip()
+            .decode()
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        version = "unknown"
+    return version
+
+
+def get_local_ip():
+    """Адрес интерфейса с маршрутом по умолчанию (UDP connect пакетов не отправляет)."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("8.8.8.8", 80))
+            return sock.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+
+def fetch_external_ip(timeout=REQUEST_TIMEOUT):
+    """Внешний IP через api.ipify.org или None при ошибке."""
+    try:
+        response = requests.get(EXTERNAL_IP_URL, timeout=timeout)
+        if response.status_code == 200 and response.text.strip():
+            return response.text.strip()
+        print(f"[SERVER INFO] {EXTERNAL_IP_URL} вернул код {response.status_code}")
+    except requests.RequestException as e:
+        print(f"[SERVER INFO] Не удалось получить внешний IP: {e}")
+    return None
+
+
+class ServerInfo:
+    """Кэш сведений о сервере с фоновым обновлением внешнего IP."""
+
+    def __init__(self, override=None, ttl=EXTERNAL_IP_TTL):
+        self.override = override
+        self.ttl = ttl
+        self.hostname = socket.gethostname()
+        self.version = get_git_version()
+        self.server_ip = override or get_local_ip()
+        self.lock = threading.Lock()
+        self.refresher_pid = None
+
+    def _refresh_loop(self):
+        while True:
+            ip = fetch_external_ip()
+            if ip:
+                self.server_ip = ip
+            time.sleep(self.ttl if ip else RETRY_INTERVAL)
+
+    def _ensure_refresher(self):
+        # Потоки не переживают fork воркеров gunicorn, поэтому сверяем pid
+        if self.override or self.refresher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.refresher_pid != os.getpid():
+                self.refresher_pid = os.getpid()
+                threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def get(self):
+        self._ensure_refresher()
+        return {
+            "hostname": self.hostname,
+            "server_ip": self.server_ip,
+            "version": self.version,
+        }
+
+
+server_info = ServerInfo(override=Config.SERVER_IP)
+
+
+def get_server_info():
+    """Закэшированные hostname, server_ip и version."""
+    return server_info.get()
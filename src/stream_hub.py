@@ -0,0 +1,133 @@
+"""
+Рассылка обновлений панели по Server-Sent Events (/api/stream).
+
+Hub живёт в каждом воркере gunicorn: один поток раз в STREAM_INTERVAL
+опрашивает источники каналов (system, ovpn, wg) и публикует событие, только
+если версия снимка изменилась. Открытые соединения лишь ждут событий, поэтому
+N открытых панелей стоят одного опроса за интервал, а не N. Опрашиваются
+только каналы, на которые кто-то подписан.
+
+Источник канала — функция producer(known), где known — версия последнего
+опубликованного снимка. Она возвращает (версия, данные) или None, если
+снимок не изменился.
+"""
+
+import json
+import os
+import threading
+import time
+
+from src.config import Config
+
+STREAM_INTERVAL = Config.STREAM_INTERVAL  # период опроса источников, секунды
+KEEPALIVE_INTERVAL = 15  # комментарий в потоке, чтобы прокси не рвали соединение
+RETRY_MS = 5000  # пауза переподключения EventSource
+
+
+class StreamHub:
+    """Последние события каналов и ожидающие их подписчики одного процесса."""
+
+    def __init__(self, interval=STREAM_INTERVAL, keepalive=KEEPALIVE_INTERVAL):
+        self.interval = interval
+        self.keepalive = keepalive
+        self.producers = {}
+        self.versions = {}  # канал -> версия опубликованного снимка
+        self.events = {}  # канал -> (номер события, данные в JSON)
+        self.sequence = 0
+        self.subscribers = {}  # канал -> число подписчиков (только ненулевые)
+        self.condition = threading.Condition()
+        self.poller_pid = None
+
+    def register(self, channel, producer):
+        self.producers[channel] = producer
+
+    # ---------Опрос источников----------
+    def _ensure_poller(self):
+        # Потоки не переживают fork воркеров gunicorn, поэтому сверяем pid
+        if self.poller_pid == os.getpid():
+            return
+        with self.condition:
+            if self.poller_pid != os.getpid():
+                self.poller_pid = os.getpid()
+                threading.Thread(target=self._poll_loop, daemon=True).start()
+
+    def _poll_loop(self):
+        while True:
+            with self.condition:
+                while not self.subscribers:
+                    self.condition.wait()
+            started = time.monotonic()
+            self.poll()
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def poll(self):
+        with self.condition:
+            channels = list(self.subscribers)
+        for channel in channels:
+            producer = self.producers[channel]
+            try:
+                result = producer(self.versions.get(channel))
+            except Exception as e:
+                print(f"[STREAM] {channel}: {e}")
+                continue
+            if result is None:
+                continue
+            version, payload = result
+            data = json.dumps(payload, ensure_ascii=False, default=str)
+            with self.condition:
+                if channel not in self.subscribers:
+                    # Последний подписчик ушёл, пока источник опрашивался
+                    continue
+                self.versions[channel] = version
+                self.sequence += 1
+                self.events[channel] = (self.sequence, data)
+                self.condition.notify_all()
+
+    # ---------Подписчики----------
+    def _pending(self, channels, seen):
+        return [
+            (channel, self.events[channel])
+            for channel in channels
+            if channel in self.events and self.events[channel][0] != seen.get(channel)
+        ]
+
+    def subscribe(self, channels):
+        """Генератор SSE: сразу текущие снимки каналов, затем их изменения."""
+        channels = list(dict.fromkeys(c for c in channels if c in self.producers))
+        self._ensure_poller()
+        with self.condition:
+            for channel in channels:
+                self.subscribers[channel] = self.subscribers.get(channel, 0) + 1
+            self.condition.notify_all()
+        seen = {}
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                # notify_all будит и на события чужих каналов — ждём своих до срока keepalive
+                deadline = time.monotonic() + self.keepalive
+                with self.condition:
+                    pending = self._pending(channels, seen)
+                    while not pending:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                        pending = self._pending(channels, seen)
+                if not pending:
+                    yield ": keepalive\n\n"
+                    continue
+                for channel, (sequence, data) in pending:
+                    seen[channel] = sequence
+                    yield f"event: {channel}\nid: {sequence}\ndata: {data}\n\n"
+        finally:
+            with self.condition:
+                for channel in channels:
+                    self.subscribers[channel] -= 1
+                    if not self.subscribers[channel]:
+                        # Без подписчиков снимок канала устаревает — следующий начнёт с нового опроса
+                        del self.subscribers[channel]
+                        self.versions.pop(channel, None)
+                        self.events.pop(channel, None)
+
+
+stream_hub = StreamHub()
@@ -0,0 +1,87 @@
+"""
+Кольцевой буфер временного ряда.
+
+Метка времени (секунды эпохи) и каждое значение хранятся в отдельных
+предвыделенных array('d'): 8 байт на поле вместо словаря на точку.
+Добавление и вытеснение старых точек — O(1), выборка диапазона по времени —
+бинарный поиск O(log n) и копирование только нужного участка.
+"""
+
+import threading
+
+from array import array
+from bisect import bisect_left
+
+
+class _Timestamps:
+    """Последовательность меток в логическом порядке (для bisect)."""
+
+    def __init__(self, series):
+        self.series = series
+
+    def __len__(self):
+        return self.series.size
+
+    def __getitem__(self, i):
+        series = self.series
+        return series.timestamps[(series.start + i) % series.capacity]
+
+
+class TimeSeries:
+    """Потокобезопасный кольцевой буфер точек (timestamp, *fields)."""
+
+    def __init__(self, capacity, fields=("cpu", "ram"), max_age=None):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.max_age = max_age
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.columns = [array("d", bytes(8 * capacity)) for _ in self.fields]
+        self.start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+        self._view = _Timestamps(self)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, timestamp, *values):
+        with self.lock:
+            if self.size == self.capacity:
+                # Буфер заполнен — перезаписываем самую старую точку
+                self.start = (self.start + 1) % self.capacity
+                self.size -= 1
+            pos = (self.start + self.size) % self.capacity
+            self.timestamps[pos] = timestamp
+            for column, value in zip(self.columns, values):
+                column[pos] = value
+            self.size += 1
+
+            if self.max_age is not None:
+                cutoff = timestamp - self.max_age
+                while self.size and self.timestamps[self.start] < cutoff:
+                    self.start = (self.start + 1) % self.capacity
+                    self.size -= 1
+
+    def _copy(self, column, first, last):
+        """Копия логического участка [first, last) одного столбца."""
+        a = (self.start + first) % self.capacity
+        b = a + (last - first)
+        if b <= self.capacity:
+            return column[a:b].tolist()
+        return column[a:].tolist() + column[: b - self.capacity].tolist()
+
+    def range(self, since=None, until=None, limit=None):
+        """
+        Точки с since <= timestamp < until (последние limit из них) в виде
+        столбцов: {"timestamp": [...], поле: [...]}.
+        """
+        with self.lock:
+            first = 0 if since is None else bisect_left(self._view, since, 0, self.size)
+            last = self.size if until is None else bisect_left(self._view, until, 0, self.size)
+            if limit:
+                first = max(first, last - limit)
+            last = max(first, last)
+            result = {"timestamp": self._copy(self.timestamps, first, last)}
+            for name, column in zip(self.fields, self.columns):
+                result[name] = self._copy(column, first, last)
+        return result
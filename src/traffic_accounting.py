@@ -0,0 +1,93 @@
+"""
+Учёт трафика по интервалам времени.
+
+Для каждого пира хранится последний отсчёт счётчиков вместе с его временем.
+Прирост между соседними отсчётами распределяется по часам, суткам или
+месяцам (местное время) пропорционально длительности пересечения. Поэтому трафик на
+стыке суток, пропущенные тики и простой между перезапусками попадают в свои
+интервалы, и ни одна задача не обязана срабатывать в точную секунду.
+
+Если счётчик уменьшился (интерфейс или пир пересоздан), прежний отсчёт
+недействителен: текущее значение целиком считается приростом интервала
+нового отсчёта.
+"""
+
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+
+class CounterSample(NamedTuple):
+    timestamp: float  # секунды эпохи
+    received: int
+    sent: int
+
+
+def interval_start(timestamp, interval):
+    """Начало часа, суток или месяца (местное время) в секундах эпохи."""
+    if interval == "hour":
+        # Часы считаются от эпохи: однозначно и при переводе часов
+        return int(timestamp // 3600 * 3600)
+    dt = datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "month":
+        dt = dt.replace(day=1)
+    return int(dt.timestamp())
+
+
+def next_interval_start(start, interval):
+    if interval == "hour":
+        return start + 3600
+    if interval == "month":
+        dt = datetime.fromtimestamp(start)
+        year, month = divmod(dt.year * 12 + dt.month, 12)
+        return int(datetime(year, month + 1, 1).timestamp())
+    # Сутки при переходе на летнее время длятся 23 или 25 часов
+    day = datetime.fromtimestamp(start).date() + timedelta(days=1)
+    return int(datetime(day.year, day.month, day.day).timestamp())
+
+
+def counter_delta(previous, received, sent):
+    """Прирост (received, sent, сброс) относительно прежнего отсчёта."""
+    if received < previous.received or sent < previous.sent:
+        return received, sent, True
+    return received - previous.received, sent - previous.sent, False
+
+
+def split_delta(start, end, received, sent, interval="day"):
+    """
+    Распределяет прирост за [start, end) по интервалам пропорционально
+    времени: [(начало интервала, received, sent), ...]. Округление
+    накопительное, поэтому суммы частей точно равны исходным значениям.
+    """
+    if end <= start:
+        return [(interval_start(end, interval), received, sent)]
+
+    parts = []
+    duration = end - start
+    bucket = interval_start(start, interval)
+    done_received = done_sent = 0
+    while True:
+        bucket_end = next_interval_start(bucket, interval)
+        if bucket_end >= end:
+            parts.append((bucket, received - done_received, sent - done_sent))
+            return parts
+        share = (bucket_end - start) / duration
+        upto_received = round(received * share)
+        upto_sent = round(sent * share)
+        parts.append((bucket, upto_received - done_received, upto_sent - done_sent))
+        done_received, done_sent = upto_received, upto_sent
+        bucket = bucket_end
+
+
+def account(previous, sample, interval="day"):
+    """
+    Части прироста между previous и sample по интервалам и признак сброса
+    счётчиков. Без прежнего отсчёта весь счётчик относится к интервалу sample.
+    """
+    if previous is None:
+        return [(interval_start(sample.timestamp, interval), sample.received, sample.sent)], False
+    received, sent, reset = counter_delta(previous, sample.received, sample.sent)
+    if reset:
+        return [(interval_start(sample.timestamp, interval), received, sent)], True
+    if not received and not sent:
+        return [], False
+    return split_delta(previous.timestamp, sample.timestamp, received, sent, interval), False
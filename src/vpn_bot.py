@@ -25,14 +25,11 @@ from config import Config
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # pylint: disable=wrong-import-position
-from main import (
-    get_uptime,
-    format_uptime,
-    count_online_clients,
-    parse_relative_time,
-    is_peer_online,
-    read_wg_config,
-)
+from src.collector import count_online_clients, format_uptime_seconds, get_uptime_seconds
+from src.ovpn_sources import get_status_sources
+from src.ovpn_status import read_merged
+from src.wg_clients import get_client_mapping as get_wg_client_mapping
+from src.wg_reader import WireGuardError, read_wireguard
 
 # ============================================================================
 # НАСТРОЙКА ЛОГИРОВАНИЯ С РАЗДЕЛЕНИЕМ ПО УРОВНЯМ
@@ -2154,7 +2151,12 @@ async def get_server_stats():
         disk = psutil.disk_usage("/")
         disk_total = disk.total / (1024**3)
         disk_used = disk.used / (1024**3)
-        uptime = format_uptime(get_uptime())
+        uptime_seconds = get_uptime_seconds()
+        uptime = (
+            format_uptime_seconds(uptime_seconds)
+            if uptime_seconds is not None
+            else "Не удалось получить время работы"
+        )
         main_interface = get_main_interface()
         
         if main_interface:
@@ -2164,8 +2166,7 @@ async def get_server_stats():
 
         download_speed, upload_speed = await get_network_speed(main_interface, interval=1.0)
 
-        file_paths = Config.LOG_FILES
-        vpn_clients = count_online_clients(file_paths)
+        vpn_clients = count_online_clients(get_status_sources())
         openvpn_count = vpn_clients.get('OpenVPN', 0)
         clients_section = format_vpn_clients(vpn_clients)
         
@@ -2233,82 +2234,34 @@ async def get_services_status_text():
 def get_openvpn_online_clients():
     """Получает список активных клиентов OpenVPN из логов."""
     clients = set()
-    file_paths = Config.LOG_FILES
-    
-    for file_path, _ in file_paths:
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line.startswith("CLIENT_LIST"):
-                        continue
-                    parts = line.split(",")
-                    if len(parts) < 2:
-                        continue
-                    client_name = parts[1].strip()
-                    if client_name and client_name not in ["UNDEF", "Common Name"]:
-                        clients.add(client_name)
-        except FileNotFoundError:
-            logger.debug(f"Файл логов не найден: {file_path}")
-            continue
-        except Exception as e:
-            logger.error(f"Ошибка чтения {file_path}: {e}")
-
-    return sorted(clients)
 
+    for client in read_merged(get_status_sources()).clients:
+        client_name = client.name.strip()
+        if client_name and client_name not in ["UNDEF", "Common Name"]:
+            clients.add(client_name)
 
-def parse_handshake_time(raw_value: str):
-    value = (raw_value or "").strip()
-    if not value:
-        return None
-    if value.lower() == "now":
-        return datetime.datetime.now()
-    if value.lower() in ["never", "n/a", "(none)"]:
-        return None
-    if any(unit in value for unit in ["мин", "час", "сек", "minute", "hour", "second", "day", "week"]):
-        return parse_relative_time(value)
-    try:
-        return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-    except ValueError:
-        return None
-
+    return sorted(clients)
 
-def parse_wireguard_online_clients(output: str):
-    online_clients = []
-    lines = (output or "").splitlines()
-    vpn_mapping = read_wg_config("/etc/wireguard/vpn.conf")
-    antizapret_mapping = read_wg_config("/etc/wireguard/antizapret.conf")
-    client_mapping = {**vpn_mapping, **antizapret_mapping}
 
-    current_peer = None
-    for line in lines:
-        line = line.strip()
-        if line.startswith("peer:"):
-            current_peer = line.split(":", 1)[1].strip()
-            continue
-        if line.startswith("latest handshake:") and current_peer:
-            handshake_raw = line.split(":", 1)[1].strip()
-            handshake_time = parse_handshake_time(handshake_raw)
-            if handshake_time and is_peer_online(handshake_time):
-                online_clients.append(client_mapping.get(current_peer, current_peer))
-            current_peer = None
+def parse_wireguard_online_clients(snapshot):
+    # Открытый ключ -> имя клиента; get_client_mapping бота — это Telegram ID -> клиент
+    client_mapping = get_wg_client_mapping()
 
+    online_clients = [
+        client_mapping.get(peer.public_key, peer.public_key)
+        for peer in snapshot.peers
+        if peer.is_online(snapshot.taken_at)
+    ]
     return sorted(set(online_clients))
 
 
 async def get_wireguard_online_clients():
     try:
-        process = await asyncio.create_subprocess_exec(
-            "/usr/bin/wg",
-            "show",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, _ = await process.communicate()
-        if process.returncode != 0:
-            logger.warning("wg show вернул ненулевой код возврата")
-            return []
-        return parse_wireguard_online_clients(stdout.decode())
+        snapshot = await asyncio.to_thread(read_wireguard, Config.WG_BACKEND)
+        return parse_wireguard_online_clients(snapshot)
+    except WireGuardError as e:
+        logger.warning(f"Не удалось получить состояние WireGuard: {e}")
+        return []
     except Exception as e:
         logger.error(f"Ошибка получения клиентов WireGuard: {e}")
         return []
@@ -0,0 +1,86 @@
+"""
+Соответствие публичных ключей WireGuard именам клиентов.
+
+Конфигурации WireGuard разбираются один раз и кэшируются; повторный разбор
+выполняется только при изменении сигнатуры файла (inode, mtime_ns, size).
+Используется веб-приложением, wg_stats.py и ботом.
+"""
+
+import threading
+
+from src.file_watch import file_signature
+
+WG_CONFIG_FILES = ("/etc/wireguard/vpn.conf", "/etc/wireguard/antizapret.conf")
+
+
+def read_wg_config(file_path):
+    """Считывает клиентские данные из конфигурационного файла WireGuard."""
+    client_mapping = {}
+
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            current_client_name = None
+
+            for line in file:
+                line = line.strip()
+
+                # Если строка начинается с # Client =, то сохраняем имя клиента
+                if line.startswith("# Client ="):
+                    current_client_name = line.split("=", 1)[1].strip()
+
+                # Если строка начинается с [Peer], сбрасываем имя клиента
+                elif line.startswith("[Peer]"):
+                    # Проверяем, есть ли имя клиента, если нет, то оставляем 'N/A'
+                    current_client_name = current_client_name or "N/A"
+
+                # Если строка начинается с PublicKey =, сохраняем публичный ключ с именем клиента
+                elif line.startswith("PublicKey =") and current_client_name:
+                    public_key = line.split("=", 1)[1].strip()
+                    client_mapping[public_key] = current_client_name
+
+    except FileNotFoundError:
+        print(f"Конфигурационный файл {file_path} не найден.")
+    return client_mapping
+
+
+class ClientIndex:
+    """Кэш публичный ключ -> имя клиента по набору конфигураций WireGuard."""
+
+    def __init__(self, paths=WG_CONFIG_FILES):
+        self.paths = tuple(paths)
+        self.lock = threading.Lock()
+        self.signatures = {}
+        self.file_mappings = {}
+        self.merged = {}
+
+    def mapping(self):
+        """Актуальное соответствие; файлы перечитываются только после изменения."""
+        signatures = {path: file_signature(path) for path in self.paths}
+        with self.lock:
+            if signatures != self.signatures:
+                for path, signature in signatures.items():
+                    if path not in self.signatures or signature != self.signatures[path]:
+                        self.file_mappings[path] = read_wg_config(path)
+                merged = {}
+                # Как и раньше, при совпадении ключей приоритет у последнего файла
+                for path in self.paths:
+                    merged.update(self.file_mappings[path])
+                self.merged = merged
+                self.signatures = signatures
+            return self.merged
+
+    def version(self):
+        """Сигнатуры файлов, по которым построено текущее соответствие."""
+        self.mapping()
+        return tuple(self.signatures.values())
+
+    def get(self, public_key, default=None):
+        return self.mapping().get(public_key, default)
+
+
+client_index = ClientIndex()
+
+
+def get_client_mapping():
+    """Общий для процесса индекс клиентов WireGuard."""
+    return client_index.mapping()
@@ -0,0 +1,122 @@
+"""
+История трафика пиров WireGuard по часам, суткам и месяцам.
+
+Сборщик (wg_stats.py) добавляет прирост каждого тика сразу во все три
+таблицы; строки без трафика не пишутся. Для компактности пир хранится
+целым id из wg_peers, а начало интервала — номером часа от эпохи. Таблицы
+WITHOUT ROWID с ключом (peer_id, bucket), поэтому выборка ряда одного пира —
+поиск по первичному ключу без обращения к другим структурам. Таблицы
+создаёт миграция wg_history (см. src.migrations).
+
+Сутки и месяцы начинаются в местную полночь; в поясах со смещением не на
+целый час номер часа округляется вниз, а key_start восстанавливает точное
+начало интервала.
+"""
+
+import time
+
+from src.config import Config
+from src.queries import WG_PEER_FILTER, WG_PEER_HISTORY, WG_PEER_INTERFACE_FILTER
+from src.traffic_accounting import interval_start
+
+# Интервал -> (таблица, срок хранения в днях; None — бессрочно)
+HISTORY_TABLES = {
+    "hour": ("wg_traffic_hour", Config.WG_HISTORY_HOURLY_DAYS),
+    "day": ("wg_traffic_day", Config.WG_HISTORY_DAILY_DAYS),
+    "month": ("wg_traffic_month", None),
+}
+MAX_POINTS = 1000
+
+
+def bucket_key(timestamp):
+    """Номер часа от эпохи."""
+    return int(timestamp // 3600)
+
+
+def key_start(key, interval):
+    """Начало интервала в секундах эпохи по ключу строки."""
+    if interval == "hour":
+        return key * 3600
+    return interval_start(key * 3600 + 3600, interval)
+
+
+class PeerIds:
+    """Соответствие (peer, interface) -> id в wg_peers, закэшированное в процессе."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def resolve(self, cursor, keys):
+        missing = [key for key in keys if key not in self.ids]
+        if missing:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO wg_peers (peer, interface) VALUES (?, ?)", missing
+            )
+            cursor.execute("SELECT id, peer, interface FROM wg_peers")
+            self.ids = {(peer, interface): id_ for id_, peer, interface in cursor.fetchall()}
+        return self.ids
+
+    def reset(self):
+        # После отката транзакции выданные в ней id недействительны
+        self.ids = {}
+
+
+def add_traffic(cursor, interval, totals):
+    """Прибавляет прирост {(peer_id, начало интервала): [received, sent]}."""
+    cursor.executemany(
+        f"""
+        INSERT INTO {HISTORY_TABLES[interval][0]} (peer_id, bucket, received, sent)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (peer_id, bucket) DO UPDATE SET
+            received = received + excluded.received,
+            sent = sent + excluded.sent
+    """,
+        [
+            (peer_id, bucket_key(start), received, sent)
+            for (peer_id, start), (received, sent) in totals.items()
+        ],
+    )
+
+
+def clean_history(cursor, now=None):
+    """Удаляет строки старше срока хранения своей таблицы; возвращает число удалённых."""
+    now = time.time() if now is None else now
+    deleted = 0
+    for table, days in HISTORY_TABLES.values():
+        if days is not None:
+            deleted += cursor.execute(
+                f"DELETE FROM {table} WHERE bucket < ?", (bucket_key(now - days * 86400),)
+            ).rowcount
+    return deleted
+
+
+def choose_interval(start, now=None):
+    """Самое подробное разрешение, срок хранения которого покрывает start."""
+    now = time.time() if now is None else now
+    for interval, (_, days) in HISTORY_TABLES.items():
+        if days is None or start >= now - days * 86400:
+            return interval
+    return "month"
+
+
+def peer_history(conn, peer, start, end, points, interface=None):
+    """
+    Ряд трафика пира за [start, end], уменьшенный на стороне SQLite не более
+    чем до points точек: соседние интервалы суммируются. Время точки — начало
+    первого интервала группы с трафиком; интервалы без трафика пропущены.
+    """
+    interval = choose_interval(start)
+    first = bucket_key(interval_start(start, interval))
+    last = bucket_key(end)
+    span = last - first + 1
+    peer_filter = WG_PEER_INTERFACE_FILTER if interface else WG_PEER_FILTER
+    rows = conn.execute(
+        WG_PEER_HISTORY.format(table=HISTORY_TABLES[interval][0], peer_filter=peer_filter),
+        (peer, *([interface] if interface else []), first, last, first, points, span),
+    ).fetchall()
+    return {
+        "resolution": interval,
+        "timestamp": [key_start(key, interval) for key, _, _ in rows],
+        "received": [received for _, received, _ in rows],
+        "sent": [sent for _, _, sent in rows],
+    }
@@ -0,0 +1,226 @@
+"""
+Чтение состояния WireGuard.
+
+Вместо разбора человекочитаемого вывода `wg show` ("1.23 GiB received",
+"2 minutes ago") используется `wg show all dump`: точные счётчики байт и
+время последнего рукопожатия в секундах эпохи. Источник данных подключаемый:
+DumpBackend вызывает утилиту wg, NetlinkBackend читает generic netlink
+через pyroute2 (если пакет установлен).
+"""
+
+import base64
+import subprocess
+import threading
+import time
+
+from typing import NamedTuple, Optional, Tuple
+
+WG_BIN = "/usr/bin/wg"
+ONLINE_THRESHOLD = 3 * 60  # пир считается онлайн, если рукопожатие было не позже 3 минут назад
+
+
+class WireGuardError(Exception):
+    """Не удалось получить состояние WireGuard."""
+
+
+class WgInterface(NamedTuple):
+    name: str
+    public_key: str
+    listen_port: int
+
+
+class WgPeer(NamedTuple):
+    interface: str
+    public_key: str
+    endpoint: Optional[str]
+    allowed_ips: Tuple[str, ...]
+    latest_handshake: int  # секунды эпохи, 0 — рукопожатия не было
+    rx_bytes: int
+    tx_bytes: int
+    persistent_keepalive: int  # секунды, 0 — выключено
+
+    def is_online(self, now=None):
+        if not self.latest_handshake:
+            return False
+        now = time.time() if now is None else now
+        return now - self.latest_handshake < ONLINE_THRESHOLD
+
+
+class WgSnapshot(NamedTuple):
+    interfaces: Tuple[WgInterface, ...]
+    peers: Tuple[WgPeer, ...]
+    taken_at: float
+
+
+EMPTY_SNAPSHOT = WgSnapshot((), (), 0.0)
+
+
+def _optional(value):
+    return None if value in ("(none)", "off", "") else value
+
+
+def parse_dump(output, taken_at=None):
+    """Разбирает вывод `wg show all dump` (поля разделены табуляцией)."""
+    interfaces = []
+    peers = []
+
+    for line in output.splitlines():
+        fields = line.split("\t")
+        try:
+            if len(fields) == 5:
+                # interface, private-key, public-key, listen-port, fwmark
+                interfaces.append(WgInterface(fields[0], fields[2], int(fields[3])))
+            elif len(fields) == 9:
+                # interface, public-key, preshared-key, endpoint, allowed-ips,
+                # latest-handshake, transfer-rx, transfer-tx, persistent-keepalive
+                allowed_ips = _optional(fields[4])
+                keepalive = _optional(fields[8])
+                peers.append(
+                    WgPeer(
+                        interface=fields[0],
+                        public_key=fields[1],
+                        endpoint=_optional(fields[3]),
+                        allowed_ips=tuple(allowed_ips.split(",")) if allowed_ips else (),
+                        latest_handshake=int(fields[5]),
+                        rx_bytes=int(fields[6]),
+                        tx_bytes=int(fields[7]),
+                        persistent_keepalive=int(keepalive) if keepalive else 0,
+                    )
+                )
+        except ValueError:
+            # Повреждённая строка пропускается, как и строки с другим числом полей
+            continue
+
+    return WgSnapshot(
+        tuple(interfaces), tuple(peers), time.time() if taken_at is None else taken_at
+    )
+
+
+class DumpBackend:
+    """Состояние через `wg show all dump`."""
+
+    def __init__(self, wg_bin=WG_BIN):
+        self.wg_bin = wg_bin
+
+    def read(self):
+        try:
+            result = subprocess.run(
+                [self.wg_bin, "show", "all", "dump"],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            raise WireGuardError(
+                f"Команда wg show завершилась с ошибкой: {e.stderr.strip()}"
+            ) from e
+        except FileNotFoundError as e:
+            raise WireGuardError(
+                "Команда wg не найдена. Убедитесь, что WireGuard установлен и доступен в системе."
+            ) from e
+        return parse_dump(result.stdout)
+
+
+def _netlink_key(value):
+    if isinstance(value, bytes) and len(value) == 32:
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, bytes):
+        return value.decode("ascii")
+    return value or ""
+
+
+def _netlink_endpoint(value):
+    if not value:
+        return None
+    addr, port = value.get("addr"), value.get("port")
+    if not addr:
+        return None
+    return f"[{addr}]:{port}" if ":" in addr else f"{addr}:{port}"
+
+
+class NetlinkBackend:
+    """
+    Состояние через generic netlink (pyroute2), без запуска внешних процессов.
+    Сокеты IPRoute/WireGuard одни на процесс, поэтому запросы к ним идут по одному.
+    """
+
+    def __init__(self):
+        try:
+            # pylint: disable=import-outside-toplevel
+            from pyroute2 import IPRoute, WireGuard
+        except ImportError as e:
+            raise WireGuardError("Для NetlinkBackend требуется пакет pyroute2") from e
+        self.ipr = IPRoute()
+        self.wg = WireGuard()
+        self.lock = threading.Lock()
+
+    def _interface_names(self):
+        names = []
+        for link in self.ipr.get_links():
+            link_info = link.get_attr("IFLA_LINKINFO")
+            if link_info and link_info.get_attr("IFLA_INFO_KIND") == "wireguard":
+                names.append(link.get_attr("IFLA_IFNAME"))
+        return names
+
+    def read(self):
+        with self.lock:
+            return self._read()
+
+    def _read(self):
+        interfaces = []
+        peers = []
+        try:
+            for name in self._interface_names():
+                for msg in self.wg.info(name):
+                    interfaces.append(
+                        WgInterface(
+                            name,
+                            _netlink_key(msg.get_attr("WGDEVICE_A_PUBLIC_KEY")),
+                            msg.get_attr("WGDEVICE_A_LISTEN_PORT") or 0,
+                        )
+                    )
+                    for peer in msg.get_attr("WGDEVICE_A_PEERS") or []:
+                        handshake = peer.get_attr("WGPEER_A_LAST_HANDSHAKE_TIME") or {}
+                        allowed_ips = peer.get_attr("WGPEER_A_ALLOWEDIPS") or []
+                        peers.append(
+                            WgPeer(
+                                interface=name,
+                                public_key=_netlink_key(peer.get_attr("WGPEER_A_PUBLIC_KEY")),
+                                endpoint=_netlink_endpoint(peer.get_attr("WGPEER_A_ENDPOINT")),
+                                allowed_ips=tuple(
+                                    ip["addr"] for ip in allowed_ips if ip.get("addr")
+                                ),
+                                latest_handshake=handshake.get("tv_sec", 0),
+                                rx_bytes=peer.get_attr("WGPEER_A_RX_BYTES") or 0,
+                                tx_bytes=peer.get_attr("WGPEER_A_TX_BYTES") or 0,
+                                persistent_keepalive=peer.get_attr(
+                                    "WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL"
+                                )
+                                or 0,
+                            )
+                        )
+        except Exception as e:
+            raise WireGuardError(f"Ошибка чтения WireGuard через netlink: {e}") from e
+        return WgSnapshot(tuple(interfaces), tuple(peers), time.time())
+
+
+BACKENDS = {"dump": DumpBackend, "netlink": NetlinkBackend}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name="dump"):
+    """Возвращает (и кэширует) источник данных; при недоступности netlink — dump."""
+    with _backends_lock:
+        if name not in _backends:
+            try:
+                _backends[name] = BACKENDS[name]()
+            except (KeyError, WireGuardError) as e:
+                print(f"Источник WireGuard '{name}' недоступен ({e}), используется dump")
+                _backends[name] = DumpBackend()
+        return _backends[name]
+
+
+def read_wireguard(backend="dump"):
+    """Снимок состояния всех интерфейсов WireGuard. Бросает WireGuardError."""
+    return get_backend(backend).read()
@@ -103,7 +103,8 @@ function updateCpuChart(period = 'live') {
     if (!cpuChart) return;
     
     const basePath = window.basePath || '';
-    fetch(`${basePath}/api/cpu?period=${period}`)
+    // no-cache: браузер перепроверяет ответ по ETag (If-None-Match) и при 304 берёт его из кэша
+    fetch(`${basePath}/api/cpu?period=${period}`, { cache: period === 'live' ? 'no-cache' : 'default' })
         .then(r => {
             if (!r.ok) throw new Error('Network response was not ok');
             return r.json();
@@ -197,52 +198,75 @@ function toggleCpuChartVisibility() {
 }
 
 // Системная информация
+function systemBasePath() {
+    let basePath = window.basePath || '';
+    if (!basePath) {
+        const path = window.location.pathname;
+        if (path.includes('/status')) {
+            basePath = '/status';
+        }
+    }
+    return basePath;
+}
+
 async function updateSystemInfo() {
     try {
+        const response = await fetch(systemBasePath() + '/api/system_info', { cache: 'no-cache' });
+        renderSystemInfo(await response.json());
+    } catch (error) {
+        console.error('Ошибка при загрузке данных:', error);
+    }
+}
 
-        let basePath = window.basePath || '';
-        if (!basePath) {
-            const path = window.location.pathname;
-            if (path.includes('/status')) {
-                basePath = '/status';
-            }
+// Обновления по /api/stream; без поддержки EventSource — опрос раз в 5 секунд
+function startSystemInfoUpdates() {
+    if (!window.EventSource) {
+        updateSystemInfo();
+        setInterval(updateSystemInfo, 5000);
+        return;
+    }
+    const source = new EventSource(systemBasePath() + '/api/stream?channels=system');
+    source.addEventListener('system', event => {
+        try {
+            renderSystemInfo(JSON.parse(event.data));
+        } catch (error) {
+            console.error('Ошибка при обработке данных:', error);
         }
-        const response = await fetch(basePath + '/api/system_info');
-        const data = await response.json();
-        const cpuElement = document.getElementById('cpu_load');
-        const memoryElement = document.getElementById('memory_used');
-        const diskElement = document.getElementById('disk_used');
-        const networkElement = document.getElementById('network_load');
-        const uptimeElement = document.getElementById('server_uptime');
-        const interfaceElement = document.getElementById('network_interface');
-        const rxElement = document.getElementById('rx_bytes');
-        const txElement = document.getElementById('tx_bytes');
-        const vpnClientsElement = document.getElementById('vpn_clients');
-        const openvpn = data.vpn_clients?.OpenVPN ?? 0;
+    });
+}
+
+function renderSystemInfo(data) {
+    const basePath = systemBasePath();
+    const cpuElement = document.getElementById('cpu_load');
+    const memoryElement = document.getElementById('memory_used');
+    const diskElement = document.getElementById('disk_used');
+    const networkElement = document.getElementById('network_load');
+    const uptimeElement = document.getElementById('server_uptime');
+    const interfaceElement = document.getElementById('network_interface');
+    const rxElement = document.getElementById('rx_bytes');
+    const txElement = document.getElementById('tx_bytes');
+    const vpnClientsElement = document.getElementById('vpn_clients');
+    const openvpn = data.vpn_clients?.OpenVPN ?? 0;
 //        const wireguard = data.vpn_clients?.WireGuard ?? 0;
-        const vpnHtml = `<a class="text-decoration-none" href="${basePath}/ovpn">&#128279; <b>OpenVPN</b></a>: ${openvpn} шт.`;
+    const vpnHtml = `<a class="text-decoration-none" href="${basePath}/ovpn">&#128279; <b>OpenVPN</b></a>: ${openvpn} шт.`;
 //        const vpnHtml = `<a class="text-decoration-none" href="${basePath}/ovpn">&#128279; <b>OpenVPN</b></a>: ${openvpn} шт.<br>
 //                     <a class="text-decoration-none" href="${basePath}/wg">&#128279; <b>WireGuard</b></a>: ${wireguard} шт.`;
 
-        if (cpuElement.textContent !== data.cpu_load) cpuElement.textContent = data.cpu_load;
-        if (memoryElement.textContent !== data.memory_used) memoryElement.textContent = data.memory_used;
-        if (diskElement.textContent !== data.disk_used) diskElement.textContent = data.disk_used;
-        if (uptimeElement.textContent !== data.uptime) uptimeElement.textContent = data.uptime;
+    if (cpuElement.textContent !== data.cpu_load) cpuElement.textContent = data.cpu_load;
+    if (memoryElement.textContent !== data.memory_used) memoryElement.textContent = data.memory_used;
+    if (diskElement.textContent !== data.disk_used) diskElement.textContent = data.disk_used;
+    if (uptimeElement.textContent !== data.uptime) uptimeElement.textContent = data.uptime;
 
-        if (interfaceElement.textContent !== data.network_interface) interfaceElement.textContent = data.network_interface;
-        if (rxElement.textContent !== data.rx_bytes.toLocaleString()) rxElement.textContent = data.rx_bytes.toLocaleString();
-        if (txElement.textContent !== data.tx_bytes.toLocaleString()) txElement.textContent = data.tx_bytes.toLocaleString();
+    if (interfaceElement.textContent !== data.network_interface) interfaceElement.textContent = data.network_interface;
+    if (rxElement.textContent !== data.rx_bytes.toLocaleString()) rxElement.textContent = data.rx_bytes.toLocaleString();
+    if (txElement.textContent !== data.tx_bytes.toLocaleString()) txElement.textContent = data.tx_bytes.toLocaleString();
 
-        let networkHtml = '';
-        for (const [iface, stats] of Object.entries(data.network_load)) {
-            networkHtml += `<p><b>${iface}</b>: Передача: ${stats.sent_speed} Мбит/с, Прием: ${stats.recv_speed} Мбит/с</p>`;
-        }
-        if (networkElement.innerHTML !== networkHtml) networkElement.innerHTML = networkHtml;
-        if (vpnClientsElement.innerHTML !== vpnHtml) vpnClientsElement.innerHTML = vpnHtml;
-
-    } catch (error) {
-        console.error('Ошибка при загрузке данных:', error);
+    let networkHtml = '';
+    for (const [iface, stats] of Object.entries(data.network_load)) {
+        networkHtml += `<p><b>${iface}</b>: Передача: ${stats.sent_speed} Мбит/с, Прием: ${stats.recv_speed} Мбит/с</p>`;
     }
+    if (networkElement.innerHTML !== networkHtml) networkElement.innerHTML = networkHtml;
+    if (vpnClientsElement.innerHTML !== vpnHtml) vpnClientsElement.innerHTML = vpnHtml;
 }
 
 // График vnstat
@@ -566,6 +590,5 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    updateSystemInfo();
-    setInterval(updateSystemInfo, 5000);
+    startSystemInfoUpdates();
 });
\ No newline at end of file
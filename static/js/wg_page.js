@@ -1,5 +1,35 @@
 let autoRefreshEnabled = false;
 let refreshInterval = null;
+let statsStream = null;
+
+// Сокращённая запись времени с последнего рукопожатия: "1 дн. 2 ч. 5 сек."
+function formatHandshakeAge(epoch) {
+    if (!epoch) return 'N/A';
+    let seconds = Math.max(0, Math.floor(Date.now() / 1000 - epoch));
+    if (seconds === 0) return 'Now';
+
+    const units = [
+        ["г.", 365 * 24 * 3600],
+        ["дн.", 24 * 3600],
+        ["ч.", 3600],
+        ["мин.", 60],
+        ["сек.", 1],
+    ];
+    const parts = [];
+    for (const [abbreviation, size] of units) {
+        const value = Math.floor(seconds / size);
+        seconds %= size;
+        if (value) parts.push(`${value} ${abbreviation}`);
+    }
+    return parts.join(' ');
+}
+
+// Возраст рукопожатий идёт без запросов к серверу: данные приходят только при изменениях
+function refreshHandshakeAges() {
+    document.querySelectorAll("#wg-stats-container td[data-handshake]").forEach(td => {
+        td.textContent = formatHandshakeAge(Number(td.dataset.handshake));
+    });
+}
 
 document.addEventListener("DOMContentLoaded", () => {
     const autoRefreshToggle = document.getElementById("auto-refresh-toggle");
@@ -17,6 +47,7 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 
     onlineOnlyToggle.checked = localStorage.getItem("showOnlineOnly") === "true";
+    setInterval(refreshHandshakeAges, 1000);
 
     // Применяем фильтр сразу при загрузке, чтобы убрать моргание
     updateStats().then(() => {
@@ -34,6 +65,16 @@ document.addEventListener("DOMContentLoaded", () => {
 
 function startAutoRefresh() {
     stopAutoRefresh();
+    // Обновления по /api/stream приходят только при изменении данных
+    if (window.EventSource) {
+        const basePath = window.basePath || '';
+        statsStream = new EventSource(`${basePath}/api/stream?channels=wg`);
+        statsStream.addEventListener("wg", event => {
+            renderStats(JSON.parse(event.data));
+            applyOnlineFilter();
+        });
+        return;
+    }
     refreshInterval = setInterval(async () => {
         await updateStats();
         applyOnlineFilter();
@@ -42,6 +83,10 @@ function startAutoRefresh() {
 }
 
 function stopAutoRefresh() {
+    if (statsStream) {
+        statsStream.close();
+        statsStream = null;
+    }
     if (refreshInterval) {
         clearInterval(refreshInterval);
         refreshInterval = null;
@@ -55,61 +100,64 @@ async function updateStats() {
             method: "GET",
             headers: {
                 "X-No-Session-Refresh": "true",
-                "Content-Type": "application/json",
-                "Cache-Control": "no-cache"
+                "Content-Type": "application/json"
             },
+            // Перепроверка по ETag: при 304 браузер отдаёт закэшированный ответ
+            cache: "no-cache",
             credentials: "same-origin"
         });
 
-        const data = await response.json();
-
-        data.forEach(interface => {
-            const tbody = document.getElementById(`tbody-${interface.interface}`);
-            if (!tbody) return;
-
-            tbody.innerHTML = "";
-
-            interface.peers.forEach((peer, index) => {
-                const tr = document.createElement("tr");
-                tr.className = peer.online ? "traffic-online" : "traffic-offline wg_table";
-
-                tr.innerHTML = `
-                    <td>
-                        <div class="d-flex flex-column align-items-center">
-                            <span>
-                            <small class="${peer.online ? 'text-success' : 'traffic-offline'}">
-                                ${peer.online ? 'Онлайн' : 'Офлайн'}
-                            </small>
-                        </div>
-                    </td>
-                    <td title="Peer: ${peer.masked_peer}">${peer.client}</td>
-                    <td >${peer.endpoint || 'N/A'}</td>
-                    <td >
-                        ${peer.visible_ips.map(ip => `<span>${ip}</span>`).join(', ')}
-                        ${peer.hidden_ips && peer.hidden_ips.length > 0 ? `
-                            <div class="hidden-ips" style="display:none;">
-                                ${peer.hidden_ips.map(ip => `<span>${ip}</span>`).join(', ')}
-                            </div>
-                            <a href="#" class="btn btn-link p-0 small" onclick="toggleIps(${index}); return false;">
-                                Показать все
-                            </a>
-                        ` : ''}
-                    </td>
-                    <td >${peer.latest_handshake || 'N/A'}</td>
-                    <td >${peer.daily_received || '0.0'}</td>
-                    <td >${peer.daily_sent || '0.0'}</td>
-                    <td>${peer.received || '0.0'}</td>
-                    <td>${peer.sent || '0.0'}</td>
-                `;
-
-                tbody.appendChild(tr);
-            });
-        });
+        renderStats(await response.json());
     } catch (error) {
         console.error("Ошибка при обновлении данных:", error);
     }
 }
 
+function renderStats(data) {
+    data.forEach(interface => {
+        const tbody = document.getElementById(`tbody-${interface.interface}`);
+        if (!tbody) return;
+
+        tbody.innerHTML = "";
+
+        interface.peers.forEach((peer, index) => {
+            const tr = document.createElement("tr");
+            tr.className = peer.online ? "traffic-online" : "traffic-offline wg_table";
+
+            tr.innerHTML = `
+                <td>
+                    <div class="d-flex flex-column align-items-center">
+                        <span>
+                        <small class="${peer.online ? 'text-success' : 'traffic-offline'}">
+                            ${peer.online ? 'Онлайн' : 'Офлайн'}
+                        </small>
+                    </div>
+                </td>
+                <td title="Peer: ${peer.masked_peer}">${peer.client}</td>
+                <td >${peer.endpoint || 'N/A'}</td>
+                <td >
+                    ${peer.visible_ips.map(ip => `<span>${ip}</span>`).join(', ')}
+                    ${peer.hidden_ips && peer.hidden_ips.length > 0 ? `
+                        <div class="hidden-ips" style="display:none;">
+                            ${peer.hidden_ips.map(ip => `<span>${ip}</span>`).join(', ')}
+                        </div>
+                        <a href="#" class="btn btn-link p-0 small" onclick="toggleIps(${index}); return false;">
+                            Показать все
+                        </a>
+                    ` : ''}
+                </td>
+                <td data-handshake="${peer.latest_handshake_at || 0}">${formatHandshakeAge(peer.latest_handshake_at)}</td>
+                <td >${peer.daily_received || '0.0'}</td>
+                <td >${peer.daily_sent || '0.0'}</td>
+                <td>${peer.received || '0.0'}</td>
+                <td>${peer.sent || '0.0'}</td>
+            `;
+
+            tbody.appendChild(tr);
+        });
+    });
+}
+
 
 function applyOnlineFilter() {
     const onlineOnlyToggle = document.getElementById("online-only-toggle");
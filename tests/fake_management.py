@@ -0,0 +1,183 @@
+"""
+Поддельный management-интерфейс OpenVPN для тестов ManagementSource.
+
+Каждое подключение обслуживается по очередному сценарию из sessions (последний
+повторяется): запрос пароля, приветствие >INFO, ответ на `status 3` с
+завершающим END. Ответы можно отдавать кусками по chunk байт с паузой pause,
+чтобы строки приходили в несколько recv.
+
+Уведомления (>CLIENT:…, >BYTECOUNT_CLI) тест отправляет сам через notify() во
+все открытые подключения; drop() обрывает их со стороны сервера.
+"""
+
+import socket
+import socketserver
+import threading
+import time
+
+GREETING = ">INFO:OpenVPN Management Interface Version 5 -- type 'help' for more info"
+HEADER = (
+    "HEADER\tCLIENT_LIST\tCommon Name\tReal Address\tVirtual Address\t"
+    "Virtual IPv6 Address\tBytes Received\tBytes Sent\tConnected Since\t"
+    "Connected Since (time_t)\tUsername\tClient ID\tPeer ID\tData Channel Cipher"
+)
+
+
+def client_row(name, cid, received=0, sent=0, since=1760000000):
+    """Строка CLIENT_LIST в формате status 3."""
+    return [
+        "CLIENT_LIST",
+        name,
+        f"203.0.113.{cid}:1194",
+        f"10.8.0.{cid + 1}",
+        "",
+        str(received),
+        str(sent),
+        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(since)),
+        str(since),
+        "UNDEF",
+        str(cid),
+        str(cid),
+        "AES-256-GCM",
+    ]
+
+
+def client_established(cid, name, received=0, sent=0, since=1760000000):
+    """Уведомление >CLIENT:ESTABLISHED с блоком >CLIENT:ENV."""
+    env = {
+        "common_name": name,
+        "trusted_ip": f"203.0.113.{cid}",
+        "trusted_port": "1194",
+        "bytes_received": str(received),
+        "bytes_sent": str(sent),
+        "time_unix": str(since),
+    }
+    return (
+        [f">CLIENT:ESTABLISHED,{cid},{cid}"]
+        + [f">CLIENT:ENV,{key}={value}" for key, value in env.items()]
+        + [">CLIENT:ENV,END"]
+    )
+
+
+def client_disconnect(cid, name):
+    return [f">CLIENT:DISCONNECT,{cid}", f">CLIENT:ENV,common_name={name}", ">CLIENT:ENV,END"]
+
+
+def client_address(cid, address, primary=1):
+    return [f">CLIENT:ADDRESS,{cid},{address},{primary}"]
+
+
+def bytecount_cli(cid, received, sent):
+    return [f">BYTECOUNT_CLI:{cid},{received},{sent}"]
+
+
+def status_response(rows):
+    lines = ["TITLE\tOpenVPN 2.6.12 x86_64-pc-linux-gnu", "TIME\t2025-10-09 12:00:00\t1760000400"]
+    lines.append(HEADER)
+    lines.extend("\t".join(row) for row in rows)
+    lines.append("GLOBAL_STATS\tMax bcast/mcast queue length\t0")
+    lines.append("END")
+    return "".join(line + "\r\n" for line in lines)
+
+
+class Session(dict):
+    """Сценарий подключения: rows, password, greet, chunk, pause, close_after_status."""
+
+    def __init__(self, rows=(), **options):
+        super().__init__(
+            rows=list(rows), password=None, greet=True, chunk=0, pause=0.0, close_after_status=False
+        )
+        self.update(options)
+
+
+class ManagementHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        chunk = self.session["chunk"] or len(data)
+        with self.write_lock:
+            for offset in range(0, len(data), chunk):
+                self.wfile.write(data[offset:offset + chunk])
+                self.wfile.flush()
+                if self.session["pause"]:
+                    time.sleep(self.session["pause"])
+
+    def handle(self):
+        self.session = self.server.next_session()
+        if self.session["password"]:
+            self.write("ENTER PASSWORD:")
+            if self.rfile.readline().strip().decode() != self.session["password"]:
+                self.write("ERROR: bad password\r\n")
+                return
+            self.write("SUCCESS: password is correct\r\n")
+        if not self.session["greet"]:
+            # Молчим, пока клиент сам не закроет соединение
+            self.rfile.read()
+            return
+        self.write(GREETING + "\r\n")
+        with self.server.lock:
+            self.server.handlers.append(self)
+        for line in self.rfile:
+            command = line.strip().decode()
+            self.server.commands.append(command)
+            if command == "status 3":
+                self.write(status_response(self.session["rows"]))
+                if self.session["close_after_status"]:
+                    return
+            elif command.startswith("bytecount"):
+                self.write("SUCCESS: bytecount interval changed\r\n")
+
+    def finish(self):
+        with self.server.lock:
+            if self in self.server.handlers:
+                self.server.handlers.remove(self)
+        super().finish()
+
+
+class FakeManagement(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, sessions):
+        super().__init__(("127.0.0.1", 0), ManagementHandler)
+        self.sessions = list(sessions)
+        self.connections = 0
+        self.commands = []
+        self.handlers = []  # подключения, прошедшие приветствие
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        return f"management://127.0.0.1:{self.server_address[1]}"
+
+    def next_session(self):
+        with self.lock:
+            session = self.sessions[min(self.connections, len(self.sessions) - 1)]
+            self.connections += 1
+            return session
+
+    def notify(self, *notifications):
+        """Отправляет строки уведомлений во все открытые подключения."""
+        text = "".join(line + "\r\n" for lines in notifications for line in lines)
+        with self.lock:
+            handlers = list(self.handlers)
+        for handler in handlers:
+            handler.write(text)
+
+    def drop(self):
+        """Обрывает открытые подключения со стороны сервера."""
+        with self.lock:
+            handlers = list(self.handlers)
+        for handler in handlers:
+            handler.request.shutdown(socket.SHUT_RDWR)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
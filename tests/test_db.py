@@ -0,0 +1,19 @@
+import sqlite3
+
+from src.db import get_connection
+
+
+def test_row_factory_per_connection(tmp_path):
+    path = str(tmp_path / "db.db")
+    rows = get_connection(path, row_factory=sqlite3.Row)
+    with rows:
+        rows.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)")
+        rows.execute("INSERT INTO users (username) VALUES ('admin')")
+
+    # Вызов без фабрики не меняет уже выданное соединение
+    plain = get_connection(path)
+    assert plain.execute("SELECT id, username FROM users").fetchone() == (1, "admin")
+    assert rows.execute("SELECT username FROM users").fetchone()["username"] == "admin"
+
+    assert get_connection(path, row_factory=sqlite3.Row) is rows
+    assert get_connection(path) is plain
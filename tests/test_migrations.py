@@ -0,0 +1,30 @@
+import sqlite3
+import time
+
+from src.migrations import MIGRATIONS, migrate, schema_version, wg_last_sample, wg_tables
+
+
+def test_migrate_is_idempotent(tmp_path):
+    for database, migrations in MIGRATIONS.items():
+        conn = sqlite3.connect(tmp_path / f"{database}.db")
+        assert migrate(conn, database) == len(migrations)
+        assert migrate(conn, database) == len(migrations)
+        assert schema_version(conn) == len(migrations)
+        conn.close()
+
+
+def test_last_sample_seeded_from_totals(tmp_path, monkeypatch):
+    conn = sqlite3.connect(tmp_path / "wireguard_stats.db")
+    wg_tables(conn.cursor())
+    conn.execute(
+        "INSERT INTO wg_total_stats (peer, client, total_received, total_sent, interface) "
+        "VALUES ('key', 'client', 10, 20, 'wg0')"
+    )
+    monkeypatch.setattr(time, "time", lambda: 1760000000.0)
+
+    wg_last_sample(conn.cursor())
+
+    assert conn.execute("SELECT peer, interface, sampled_at, received, sent FROM wg_last_sample").fetchall() == [
+        ("key", "wg0", 1760000000.0, 10, 20)
+    ]
+    conn.close()
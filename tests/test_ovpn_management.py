@@ -0,0 +1,177 @@
+import time
+
+import pytest
+
+from src import ovpn_management
+from src.ovpn_management import ManagementSource
+
+from fake_management import (
+    FakeManagement,
+    Session,
+    bytecount_cli,
+    client_address,
+    client_disconnect,
+    client_established,
+    client_row,
+)
+
+
+@pytest.fixture(autouse=True)
+def fast_timeouts(monkeypatch):
+    monkeypatch.setattr(ovpn_management, "READ_TIMEOUT", 0.05)
+    monkeypatch.setattr(ovpn_management, "RECONNECT_DELAY", 0.05)
+    monkeypatch.setattr(ovpn_management, "HANDSHAKE_TIMEOUT", 0.5)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.01)
+    raise AssertionError("условие не выполнилось за отведённое время")
+
+
+def client_names(source):
+    return sorted(client.name for client in source.snapshot().clients)
+
+
+def connected(server, source):
+    """Источник получил ответ на status 3, сервер готов слать уведомления."""
+    wait_for(lambda: source.snapshot().error is None and server.handlers)
+    return source.snapshot().version
+
+
+def clients_by_name(source):
+    return {client.name: client for client in source.snapshot().clients}
+
+
+def test_status_snapshot():
+    rows = [client_row("alice", 1, 100, 200), client_row("bob", 2, 300, 400)]
+    with FakeManagement([Session(rows)]) as server:
+        source = ManagementSource(server.path, "VPN-UDP").start()
+        wait_for(lambda: client_names(source) == ["alice", "bob"])
+
+        snapshot = source.snapshot()
+        assert snapshot.error is None
+        assert snapshot.total_received == 400
+        assert snapshot.total_sent == 600
+        assert {client.protocol for client in snapshot.clients} == {"VPN-UDP"}
+        assert snapshot.clients[0].connected_since_epoch == 1760000000
+        assert server.commands[:2] == ["bytecount 5", "status 3"]
+
+
+def test_partial_reads_and_password():
+    # Ответ приходит по 3 байта: строки, \r\n и запрос пароля разрезаны между recv
+    rows = [client_row("carol", 3, 1, 2)]
+    session = Session(rows, password="secret", chunk=3, pause=0.001)
+    with FakeManagement([session]) as server:
+        source = ManagementSource(server.path, "VPN-TCP", password="secret").start()
+        wait_for(lambda: client_names(source) == ["carol"])
+        assert source.snapshot().error is None
+
+
+def test_slow_chunks_longer_than_read_timeout():
+    rows = [client_row("dave", 4)]
+    with FakeManagement([Session(rows, chunk=40, pause=0.12)]) as server:
+        source = ManagementSource(server.path).start()
+        wait_for(lambda: client_names(source) == ["dave"], timeout=10)
+        assert server.connections == 1
+
+
+def test_reconnect_after_disconnect():
+    first = Session([client_row("alice", 1)], close_after_status=True)
+    second = Session([client_row("bob", 2)])
+    with FakeManagement([first, second]) as server:
+        source = ManagementSource(server.path).start()
+        wait_for(lambda: client_names(source) == ["bob"])
+        assert server.connections >= 2
+        assert source.snapshot().error is None
+
+
+def test_handshake_timeout_then_recovery():
+    silent = Session(greet=False)
+    with FakeManagement([silent, Session([client_row("erin", 5)])]) as server:
+        source = ManagementSource(server.path).start()
+        wait_for(lambda: "нет приветствия" in (source.snapshot().error or ""))
+        assert source.snapshot().clients == ()
+        wait_for(lambda: client_names(source) == ["erin"])
+        assert source.snapshot().error is None
+
+
+def test_wrong_password_reported():
+    with FakeManagement([Session(password="secret")]) as server:
+        source = ManagementSource(server.path, password="wrong").start()
+        wait_for(lambda: "ERROR: bad password" in (source.snapshot().error or ""))
+
+
+def test_client_notifications_update_table():
+    with FakeManagement([Session([client_row("alice", 1, 100, 200)])]) as server:
+        source = ManagementSource(server.path, "VPN-UDP").start()
+        version = connected(server, source)
+
+        server.notify(client_established(7, "frank", 10, 20))
+        wait_for(lambda: client_names(source) == ["alice", "frank"])
+        frank = clients_by_name(source)["frank"]
+        assert (frank.bytes_received, frank.bytes_sent) == (10, 20)
+        assert frank.real_address == "203.0.113.7:1194"
+        assert frank.virtual_address == ""
+        assert frank.protocol == "VPN-UDP"
+        assert source.snapshot().version > version
+        version = source.snapshot().version
+
+        server.notify(client_address(7, "10.8.0.8"))
+        wait_for(lambda: clients_by_name(source)["frank"].virtual_address == "10.8.0.8")
+        assert source.snapshot().version > version
+        version = source.snapshot().version
+
+        server.notify(bytecount_cli(7, 1500, 2500), bytecount_cli(1, 600, 700))
+        wait_for(lambda: clients_by_name(source)["alice"].bytes_received == 600)
+        snapshot = source.snapshot()
+        frank = clients_by_name(source)["frank"]
+        assert (frank.bytes_received, frank.bytes_sent) == (1500, 2500)
+        assert (snapshot.total_received, snapshot.total_sent) == (2100, 3200)
+        assert snapshot.version > version
+        version = snapshot.version
+
+        server.notify(client_disconnect(7, "frank"))
+        wait_for(lambda: client_names(source) == ["alice"])
+        assert source.snapshot().version > version
+
+
+def test_unchanged_notifications_keep_version():
+    with FakeManagement([Session([client_row("alice", 1, 100, 200)])]) as server:
+        source = ManagementSource(server.path).start()
+        version = connected(server, source)
+
+        # Те же счётчики, неосновной адрес и неизвестные CID таблицу не меняют
+        server.notify(
+            bytecount_cli(1, 100, 200),
+            client_address(1, "10.8.0.99", primary=0),
+            bytecount_cli(9, 1, 1),
+            client_disconnect(9, "ghost"),
+        )
+        # Маркер: по нему видно, что предыдущие уведомления уже обработаны
+        server.notify(bytecount_cli(1, 101, 200))
+        wait_for(lambda: clients_by_name(source)["alice"].bytes_received == 101)
+        assert source.snapshot().version == version + 1
+        assert clients_by_name(source)["alice"].virtual_address == "10.8.0.2"
+
+
+def test_reconnect_after_server_drops_socket():
+    sessions = [Session([client_row("alice", 1)]), Session([client_row("bob", 2)])]
+    with FakeManagement(sessions) as server:
+        source = ManagementSource(server.path).start()
+        connected(server, source)
+        server.notify(client_established(7, "frank"))
+        wait_for(lambda: client_names(source) == ["alice", "frank"])
+
+        server.drop()
+        # Таблица сверяется заново по status 3: клиенты прошлого подключения не остаются
+        wait_for(lambda: server.connections == 2 and client_names(source) == ["bob"])
+        version = connected(server, source)
+
+        server.notify(client_established(8, "grace"))
+        wait_for(lambda: client_names(source) == ["bob", "grace"])
+        assert source.snapshot().version > version
@@ -0,0 +1,50 @@
+from src.ovpn_sources import StatusSources
+
+MANAGEMENT = "management://127.0.0.1:7505"
+
+
+def make_status_files(directory, *names):
+    for name in names:
+        (directory / name).write_text("TITLE,OpenVPN\nEND\n", encoding="utf-8")
+    return str(directory / "*status*.log")
+
+
+def test_discovers_status_files(tmp_path):
+    pattern = make_status_files(tmp_path, "openvpn-status.log", "antizapret-udp-status.log")
+    configured = [(str(tmp_path / "openvpn-status.log"), "VPN-UDP")]
+
+    sources = StatusSources(configured, pattern).discover()
+
+    assert sources == [
+        (str(tmp_path / "openvpn-status.log"), "VPN-UDP"),
+        (str(tmp_path / "antizapret-udp-status.log"), "ANTIZAPRET-UDP"),
+    ]
+
+
+def test_management_replaces_its_status_file(tmp_path):
+    # OVPN_MANAGEMENT задан, шаблон по умолчанию: статус-файл того же экземпляра
+    # не должен добавиться вторым источником
+    pattern = make_status_files(tmp_path, "openvpn-status.log", "antizapret-udp-status.log")
+    configured = [(MANAGEMENT, "VPN-UDP")]
+
+    sources = StatusSources(configured, pattern, [str(tmp_path / "openvpn-status.log")]).discover()
+
+    assert sources == [
+        (MANAGEMENT, "VPN-UDP"),
+        (str(tmp_path / "antizapret-udp-status.log"), "ANTIZAPRET-UDP"),
+    ]
+
+
+def test_exclude_matches_symlinked_path(tmp_path):
+    pattern = make_status_files(tmp_path, "openvpn-status.log")
+    (tmp_path / "current.log").symlink_to(tmp_path / "openvpn-status.log")
+
+    sources = StatusSources([(MANAGEMENT, "VPN-UDP")], pattern, [str(tmp_path / "current.log")]).discover()
+
+    assert sources == [(MANAGEMENT, "VPN-UDP")]
+
+
+def test_empty_pattern_disables_discovery(tmp_path):
+    make_status_files(tmp_path, "openvpn-status.log")
+
+    assert StatusSources([(MANAGEMENT, "VPN-UDP")], "").discover() == [(MANAGEMENT, "VPN-UDP")]
@@ -0,0 +1,36 @@
+import io
+
+from src.ovpn_status import parse_status
+
+STATUS_V2 = """TITLE,OpenVPN 2.6.12 x86_64-pc-linux-gnu
+TIME,2025-10-09 12:00:00,1760000400
+HEADER,CLIENT_LIST,Common Name,Real Address,Virtual Address,Virtual IPv6 Address,Bytes Received,Bytes Sent,Connected Since,Connected Since (time_t),Username,Client ID,Peer ID,Data Channel Cipher
+CLIENT_LIST,alice,203.0.113.1:1194,10.8.0.2,,100,200,2025-10-09 11:53:20,1760000000,UNDEF,1,1,AES-256-GCM
+CLIENT_LIST,bob,203.0.113.2:1194,10.8.0.3,,300,400,2025-10-09 11:55:00,1760000100,UNDEF,2,2,AES-256-GCM
+HEADER,ROUTING_TABLE,Virtual Address,Common Name,Real Address,Last Ref,Last Ref (time_t)
+ROUTING_TABLE,10.8.0.2,alice,203.0.113.1:1194,2025-10-09 12:00:00,1760000400
+GLOBAL_STATS,Max bcast/mcast queue length,0
+END
+"""
+
+
+def test_status_version_2():
+    clients = parse_status(io.StringIO(STATUS_V2), "VPN-UDP", "server")
+
+    assert [client.name for client in clients] == ["alice", "bob"]
+    assert clients[0].real_address == "203.0.113.1:1194"
+    assert clients[0].virtual_address == "10.8.0.2"
+    assert (clients[1].bytes_received, clients[1].bytes_sent) == (300, 400)
+    assert clients[1].connected_since_epoch == 1760000100
+    assert {(client.protocol, client.instance) for client in clients} == {("VPN-UDP", "server")}
+
+
+def test_status_version_3_uses_tabs():
+    clients = parse_status(io.StringIO(STATUS_V2.replace(",", "\t")), "VPN-TCP")
+
+    assert [client.name for client in clients] == ["alice", "bob"]
+    assert clients[0].connected_since == "2025-10-09 11:53:20"
+
+
+def test_empty_file():
+    assert parse_status(io.StringIO(""), "VPN-UDP") == ()
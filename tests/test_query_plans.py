@@ -0,0 +1,32 @@
+import pytest
+
+from src.migrations import MIGRATIONS, full_scans, migrated_database, query_plan
+from src.queries import HOT_QUERIES
+
+
+@pytest.fixture(scope="module")
+def databases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("databases")
+    connections = {database: migrated_database(directory, database) for database in MIGRATIONS}
+    yield connections
+    for conn in connections.values():
+        conn.close()
+
+
+@pytest.mark.parametrize(
+    "database, sql, params",
+    HOT_QUERIES,
+    ids=[f"{database}-{index}" for index, (database, _, _) in enumerate(HOT_QUERIES)],
+)
+def test_hot_query_has_no_full_scan(databases, database, sql, params):
+    plan = query_plan(databases[database], sql, params)
+
+    assert full_scans(plan, sql) == [], "\n".join(plan)
+
+
+def test_full_scan_is_detected(databases):
+    # Условие по столбцу без индекса должно обнаруживаться проверкой
+    sql = "SELECT * FROM connection_logs WHERE real_ip = ?"
+    plan = query_plan(databases["logs"], sql, ("203.0.113.1",))
+
+    assert full_scans(plan, sql) == ["SCAN connection_logs"]
@@ -0,0 +1,75 @@
+import os
+
+from src.wg_reader import WgInterface, WgPeer, parse_dump
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_multiple_interfaces():
+    snapshot = parse_dump(read_fixture("wg_show_all_dump.txt"), taken_at=1760000060)
+
+    assert snapshot.taken_at == 1760000060
+    assert snapshot.interfaces == (
+        WgInterface("wg0", "U2VydmVyS2V5V2cwAAAAAAAAAAAAAAAAAAAAAAAAAAA=", 51820),
+        WgInterface("wg1", "U2VydmVyS2V5V2cxAAAAAAAAAAAAAAAAAAAAAAAAAAA=", 51821),
+    )
+    assert [(peer.interface, peer.allowed_ips) for peer in snapshot.peers] == [
+        ("wg0", ("10.8.0.2/32", "fd00::2/128")),
+        ("wg0", ()),
+        ("wg1", ("10.9.0.2/32",)),
+    ]
+
+
+def test_peer_fields():
+    snapshot = parse_dump(read_fixture("wg_show_all_dump.txt"), taken_at=1760000060)
+
+    assert snapshot.peers[0] == WgPeer(
+        interface="wg0",
+        public_key="UGVlckFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUE=",
+        endpoint="203.0.113.7:41234",
+        allowed_ips=("10.8.0.2/32", "fd00::2/128"),
+        latest_handshake=1760000000,
+        rx_bytes=123456789,
+        tx_bytes=987654321,
+        persistent_keepalive=25,
+    )
+    assert snapshot.peers[2].endpoint == "[2001:db8::1]:51000"
+    assert snapshot.peers[2].persistent_keepalive == 0
+
+
+def test_none_endpoint_and_allowed_ips():
+    peer = parse_dump(read_fixture("wg_show_all_dump.txt")).peers[1]
+
+    assert peer.endpoint is None
+    assert peer.allowed_ips == ()
+    assert peer.persistent_keepalive == 0
+
+
+def test_zero_handshake_is_offline():
+    snapshot = parse_dump(read_fixture("wg_show_all_dump.txt"), taken_at=1760000060)
+
+    assert snapshot.peers[1].latest_handshake == 0
+    assert not snapshot.peers[1].is_online(snapshot.taken_at)
+    assert snapshot.peers[0].is_online(snapshot.taken_at)
+    assert not snapshot.peers[0].is_online(1760000000 + 3 * 60)
+
+
+def test_malformed_lines_are_skipped():
+    snapshot = parse_dump(read_fixture("wg_show_all_dump_malformed.txt"), taken_at=0)
+
+    assert len(snapshot.interfaces) == 1
+    assert [peer.public_key[:10] for peer in snapshot.peers] == ["UGVlckFBQU", "UGVlckVFRU"]
+    assert snapshot.peers[1].endpoint is None
+    assert snapshot.peers[1].rx_bytes == 7
+
+
+def test_empty_output():
+    snapshot = parse_dump("", taken_at=5)
+
+    assert snapshot.interfaces == ()
+    assert snapshot.peers == ()